@@ -1,18 +1,25 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, session, url_for
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory, redirect, session, stream_with_context, url_for
 import math
 import os
 import re
 import sqlite3
 import json
 from dataclasses import asdict
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import hashlib
 import secrets
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import logging
 import bcrypt
 
+# Route all logging through the non-blocking queue handler
+from modules.logging_config import configure_logging
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Wrap the connection factory before other modules bind get_connection
+from modules.metrics import metrics, init_app as init_metrics, instrument_database, instrument_scraper
+instrument_database()
+
 # Import blueprints
 from blueprints.swimmers import swimmers_bp
 from blueprints.coaches import coaches_bp
@@ -26,43 +33,185 @@ from modules.database import (
     get_swimmers_by_team_code, assign_swimmer_to_group
 )
 from modules.time_utils import (
-    parse_time_input, format_time, format_time_precise, 
-    adjust_time_for_practice, calculate_goal_times, round_interval_to_clock
-)
-from modules.swimmer_analysis import calculate_velocities, determine_swimmer_style, analyze_race_strategy
-from modules.interval_calculator import (
-    calculate_base_time, calculate_base_interval, 
-    calculate_interval_fatigue, generate_intervals
+    parse_time_input, format_time_precise, calculate_goal_times, round_interval_to_clock
 )
+from modules.swimmer_analysis import analyze_race_strategy
+from modules.interval_calculator import calculate_interval_fatigue
+from modules.interval_engine import build_interval_response, build_group_interval_responses, load_group_times
 from modules.colorsystem import UrbanchekColorSystem
-from modules.swimming_program_builder import SwimmingProgramBuilder, TrainingPhase, TrainingGroup, Holiday, Macrocycle, Microcycle
-from modules.workout_generator import WorkoutGenerator
-from modules.workout_recommendation_engine import WorkoutRecommendationEngine
-from modules.swimcloud_scraper import SwimCloudScraper
-from modules.athlete_history import AthleteHistory
-from modules.pulse_plot import PulsePlot
-from modules.seasonal_workout_planner import SeasonalWorkoutPlanner
+from modules.color_system_batch import save_team_color_systems, get_team_pace_chart
+from modules.result_cache import (
+    ResultCache, all_cache_stats, canonical_flag, canonical_time, color_system_cache_key, interval_cache_key
+)
+from modules.plot_renderer import IMAGE_FORMATS
+from modules.mail_merge import MailMergeError, compile_template, load_group_profiles, render_messages
+from modules.pulse_trends import (
+    analyze_trends, batch_regression, count_sums_to_bpm, load_pulse_tests, pulse_count_sums
+)
+from modules.pulse_plot_batch import overlay_spec, save_pulse_test_batch, validate_pulse_entry
+from modules.services import ServiceRegistry
+from modules.request_profiler import RequestProfiler, init_app as init_profiler
+from modules.json_provider import init_app as init_json_provider
+from modules.compression import init_app as init_compression
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='static')
 app.secret_key = 'your-secret-key-change-this'  # Change this to a secure secret key
-
-# Initialize database and modules
-init_db()
-program_builder = SwimmingProgramBuilder()
-workout_generator = WorkoutGenerator(program_builder)
-recommendation_engine = WorkoutRecommendationEngine(program_builder)
-seasonal_planner = SeasonalWorkoutPlanner()
-swimcloud_scraper = SwimCloudScraper()
-athlete_history = AthleteHistory(swimcloud_scraper)
-pulse_plot = PulsePlot()
+init_json_provider(app)
+init_metrics(app)
+request_profiler = RequestProfiler()
+init_profiler(app, request_profiler)
+init_compression(app)
+
+# /swimmer/<id>/best_times also returns best times as "times" for old
+# athlete profile clients; once they read "best_times", BEST_TIMES_LEGACY_FIELDS=0
+# (or ?legacy=0 per request) drops the duplicate
+app.config['BEST_TIMES_LEGACY_FIELDS'] = os.environ.get('BEST_TIMES_LEGACY_FIELDS', '1') != '0'
+
+# Services are created (and their heavy dependencies imported) on first use.
+# Each worker process builds its own; the scraper is not thread-safe and
+# holds a browser or HTTP session, so a worker's request threads share a
+# pool of SCRAPER_POOL_SIZE scrapers, each used by one thread at a time.
+services = ServiceRegistry()
+
+@services.register('program_builder')
+def create_program_builder():
+    from modules.swimming_program_builder import SwimmingProgramBuilder
+    return SwimmingProgramBuilder()
+
+@services.register('workout_generator')
+def create_workout_generator():
+    from modules.workout_generator import WorkoutGenerator
+    return WorkoutGenerator(services.program_builder)
+
+@services.register('recommendation_engine')
+def create_recommendation_engine():
+    from modules.workout_recommendation_engine import WorkoutRecommendationEngine
+    return WorkoutRecommendationEngine(services.program_builder)
+
+@services.register('seasonal_planner')
+def create_seasonal_planner():
+    from modules.seasonal_workout_planner import SeasonalWorkoutPlanner
+    return SeasonalWorkoutPlanner()
+
+def close_scraper(scraper):
+    """End a scraper's browser or HTTP session"""
+    for name in ('close', 'quit'):
+        if callable(getattr(scraper, name, None)):
+            getattr(scraper, name)()
+            return
+    driver = getattr(scraper, 'driver', None)
+    if driver is not None:
+        driver.quit()
+
+@services.register('swimcloud_scraper', close=close_scraper,
+                   pool_size=int(os.environ.get('SCRAPER_POOL_SIZE', 2)))
+def create_swimcloud_scraper():
+    from modules.swimcloud_scraper import SwimCloudScraper
+    return instrument_scraper(SwimCloudScraper())
+
+@services.register('athlete_history', per_thread=True)
+def create_athlete_history():
+    from modules.athlete_history import AthleteHistory
+    return AthleteHistory(swimcloud_scraper)
+
+@services.register('pulse_plot_store')
+def create_pulse_plot_store():
+    from modules.pulse_plot_store import PulsePlotStore
+    return PulsePlotStore()
+
+@services.register('calendar_index')
+def create_calendar_index():
+    from modules.calendar_index import CalendarIndex
+    return CalendarIndex()
+
+@services.register('template_index')
+def create_template_index():
+    from modules.template_index import TemplateIndex
+    return TemplateIndex()
+
+@services.register('workout_history_stats')
+def create_workout_history_stats():
+    from modules.workout_history_stats import WorkoutHistoryStats
+    return WorkoutHistoryStats()
+
+@services.register('season_plans')
+def create_season_plans():
+    from modules.season_plan import SeasonPlanStore
+    return SeasonPlanStore(services.calendar_index, services.template_index)
+
+@services.register('plot_renderer', close=lambda renderer: renderer.shutdown())
+def create_plot_renderer():
+    from modules.plot_renderer import PlotRenderer
+    return PlotRenderer(max_workers=int(os.environ.get('PLOT_RENDER_WORKERS', 2)))
+
+@services.register('smtp_pool', close=lambda pool: pool.close_all())
+def create_smtp_pool():
+    from modules.smtp_pool import SMTPSessionPool
+    return SMTPSessionPool()
+
+@services.register('email_outbox', close=lambda outbox: outbox.stop())
+def create_email_outbox():
+    from modules.email_outbox import EmailOutbox
+    return EmailOutbox(services.smtp_pool)
+
+# Module-level names blueprints import from app; each builds its service on
+# first use. The pooled scraper is borrowed for each method call, and
+# pulse_plot is the database store that replaced the JSON-file PulsePlot.
+program_builder = services.proxy('program_builder')
+workout_generator = services.proxy('workout_generator')
+recommendation_engine = services.proxy('recommendation_engine')
+seasonal_planner = services.proxy('seasonal_planner')
+swimcloud_scraper = services.proxy('swimcloud_scraper')
+athlete_history = services.proxy('athlete_history')
+pulse_plot = services.proxy('pulse_plot_store')
 
 # Store scraper in app config for blueprint access
 app.config['SWIMCLOUD_SCRAPER'] = swimcloud_scraper
 
+_initialized = False
+
+def create_app():
+    """
+    Initialize the database and return the app.
+
+    Use create_app() as the WSGI entry point (gunicorn 'app:create_app()');
+    a plain "from app import app" initializes on the first request instead.
+    """
+    global _initialized
+    if not _initialized:
+        init_db()
+        enable_wal_mode()
+        _initialized = True
+    return app
+
+def enable_wal_mode():
+    """Let worker processes read the database while another one writes"""
+    from modules.database import get_connection
+    conn = get_connection()
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+    except sqlite3.OperationalError as e:
+        logger.warning('Could not enable WAL mode', extra={'error': str(e)})
+    finally:
+        conn.close()
+
+@app.before_request
+def ensure_initialized():
+    if not _initialized:
+        create_app()
+
+# Batch interval requests for more swimmers than this are streamed as NDJSON
+BATCH_STREAM_THRESHOLD = 50
+
+# Result caches for the pure calculation endpoints
+interval_cache = ResultCache('generate', maxsize=int(os.environ.get('GENERATE_CACHE_SIZE', 2048)))
+color_system_cache = ResultCache('color_system', maxsize=int(os.environ.get('COLOR_SYSTEM_CACHE_SIZE', 512)))
+
 @app.route('/search_swimmer', methods=['POST'])
 def search_swimmer():
     """Search for swimmers on SwimCloud"""
+    swimmer_name = None
     try:
         data = request.get_json()
         swimmer_name = data.get('swimmer_name', '').strip()
@@ -73,11 +222,10 @@ def search_swimmer():
                 'error': 'Swimmer name is required'
             })
 
-        print(f"Searching SwimCloud for: {swimmer_name}")
+        logger.info('Searching SwimCloud', extra={'swimmer_name': swimmer_name})
 
-        # Initialize scraper
-        from modules.swimcloud_scraper import SwimCloudScraper
-        scraper = SwimCloudScraper()
+        # Each call borrows one of this worker's pooled scraper sessions
+        scraper = swimcloud_scraper
 
         # Search for swimmer
         search_results = scraper.search_swimmer(swimmer_name)
@@ -100,7 +248,7 @@ def search_swimmer():
             })
 
     except Exception as e:
-        print(f"Error searching swimmer: {str(e)}")
+        logger.exception('SwimCloud search failed', extra={'swimmer_name': swimmer_name})
         return jsonify({
             'success': False,
             'results': [],
@@ -117,11 +265,10 @@ def scrape_swimmer_times_by_id(swimmer_id):
         team = data.get('team', '')
         year = data.get('year', '')
 
-        print(f"Scraping times for swimmer ID {swimmer_id}: {name}")
+        logger.info('Scraping swimmer times', extra={'swimcloud_id': swimmer_id, 'swimmer_name': name})
 
-        # Initialize scraper
-        from modules.swimcloud_scraper import SwimCloudScraper
-        scraper = SwimCloudScraper()
+        # Each call borrows one of this worker's pooled scraper sessions
+        scraper = swimcloud_scraper
 
         # Get times from SwimCloud
         times = scraper.get_swimmer_times(profile_url)
@@ -224,9 +371,7 @@ def scrape_swimmer_times_by_id(swimmer_id):
             })
 
     except Exception as e:
-        print(f"Error scraping swimmer times: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Scraping swimmer times failed', extra={'swimcloud_id': swimmer_id})
         return jsonify({
             'success': False,
             'error': f'Failed to scrape times: {str(e)}'
@@ -790,7 +935,7 @@ def save_coach_endpoint():
         })
 
     except Exception as e:
-        print(f"Error saving coach: {str(e)}")
+        logger.exception('Saving coach failed')
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/coach/<int:coach_id>', methods=['DELETE'])
@@ -887,8 +1032,6 @@ def assign_coach_to_group():
 @app.route('/api/remove_coach_from_group', methods=['POST'])
 def remove_coach_from_group():
     """Remove a coach from a training group"""
-    print(f"remove_coach_from_group endpoint called")
-
     conn = None
     try:
         data = request.json
@@ -898,7 +1041,7 @@ def remove_coach_from_group():
         coach_id = data.get('coach_id')
         group_name = data.get('group_name')
 
-        print(f"Received data: coach_id={coach_id}, group_name={group_name}")
+        logger.debug('Removing coach from group', extra={'coach_id': coach_id, 'group_name': group_name})
 
         if not coach_id or not group_name:
             return jsonify({"success": False, "error": "Coach ID and Group Name are required"}), 400
@@ -909,33 +1052,23 @@ def remove_coach_from_group():
         if not coach:
             return jsonify({"success": False, "error": "Coach not found"}), 404
 
-        print(f"Found coach: {coach['name']}")
-
         # Remove coach from the training group by setting coach_name to NULL
         conn = get_connection()
         cursor = conn.cursor()
 
-        # First, let's see what's actually in the database
-        cursor.execute('''
-            SELECT id, group_name, coach_name FROM training_groups 
-            WHERE group_name = ?
-        ''', (group_name,))
-
-        existing_groups = cursor.fetchall()
-        print(f"Groups with name '{group_name}':")
-        for group in existing_groups:
-            print(f"  ID: {group[0]}, Name: '{group[1]}', Coach: '{group[2]}'")
-
-        # Also check all groups for this coach
-        cursor.execute('''
-            SELECT id, group_name, coach_name FROM training_groups 
-            WHERE coach_name = ?
-        ''', (coach['name'],))
+        if logger.isEnabledFor(logging.DEBUG):
+            # Groups matching the name and groups assigned to the coach
+            cursor.execute('''
+                SELECT id, group_name, coach_name FROM training_groups 
+                WHERE group_name = ?
+            ''', (group_name,))
+            logger.debug('Groups with matching name', extra={'coach': coach['name'], 'groups': cursor.fetchall()})
 
-        coach_groups = cursor.fetchall()
-        print(f"Groups assigned to coach '{coach['name']}':")
-        for group in coach_groups:
-            print(f"  ID: {group[0]}, Name: '{group[1]}', Coach: '{group[2]}'")
+            cursor.execute('''
+                SELECT id, group_name, coach_name FROM training_groups 
+                WHERE coach_name = ?
+            ''', (coach['name'],))
+            logger.debug('Groups assigned to coach', extra={'coach': coach['name'], 'groups': cursor.fetchall()})
 
         # Update the training group to remove coach assignment
         cursor.execute('''
@@ -945,11 +1078,10 @@ def remove_coach_from_group():
         ''', (coach['name'], group_name))
 
         rows_affected = cursor.rowcount
-        print(f"Rows affected: {rows_affected}")
 
         if rows_affected > 0:
             conn.commit()
-            print("Successfully removed coach from group")
+            logger.info('Removed coach from group', extra={'coach': coach['name'], 'group_name': group_name})
             return jsonify({"success": True, "message": "Coach removed from group successfully"})
         else:
             # Check if the group exists
@@ -972,9 +1104,7 @@ def remove_coach_from_group():
                     return jsonify({"success": False, "error": f"Coach '{coach['name']}' is not assigned to group '{group_name}' (currently assigned to '{current_coach}')"})
 
     except Exception as e:
-        print(f"Error in remove_coach_from_group: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Removing coach from group failed')
         return jsonify({"success": False, "error": str(e)}), 500
 
     finally:
@@ -1074,7 +1204,10 @@ def generate():
             'g500': parse_time_input(data.get('g500', '')),
         }
 
-        goal_percentage = float(data.get('goal_percentage', 2.0))
+        # Responses are cached on the inputs rounded to 0.01 s, so they are
+        # computed from the same rounded inputs
+        times = {key: canonical_time(value) for key, value in times.items()}
+        goal_percentage = round(float(data.get('goal_percentage', 2.0)), 2)
         num_reps = int(data.get('num_reps', 3))
         base_interval_adjustment = data.get('base_interval_adjustment', 10)
         default_effort = data.get('default_effort', '90% Effort')
@@ -1090,81 +1223,64 @@ def generate():
         if goal_times['g500'] <= 0 and calculated_goal_times.get('g500', 0) > 0:
             goal_times['g500'] = calculated_goal_times['g500']
 
-        velocities = calculate_velocities(times)
-        goal_velocities = {}
-
-        if goal_times['g50'] > 0:
-            goal_velocities['50'] = 50 / goal_times['g50']
-        if goal_times['g100'] > 0:
-            goal_velocities['100'] = 100 / goal_times['g100']
-        if goal_times['g200'] > 0:
-            goal_velocities['200'] = 200 / goal_times['g200']
-        if goal_times['g500'] > 0:
-            goal_velocities['500'] = 500 / goal_times['g500']
-
-        swimmer_style, dropoff = determine_swimmer_style(velocities)
-
-        base_interval_100 = calculate_base_interval(times['t100'], swimmer_style)
-        distances = [25, 50, 75, 100, 125, 150, 175, 200, 225, 250, 275, 300, 325, 350, 375, 400, 425, 450, 475, 500]
-
-        intervals, fatigue_progressions = generate_intervals(times, distances, swimmer_style, num_reps)
-
-        actual_times = {
-            "50 yards": format_time(times['t50']) if times['t50'] > 0 else None,
-            "100 yards": format_time(times['t100']) if times['t100'] > 0 else None,
-            "200 yards": format_time(times['t200']) if times['t200'] > 0 else None,
-            "500 yards": format_time(times['t500']) if times['t500'] > 0 else None
-        }
-
-        model_predictions = {}
-        practice_predictions = {}
-
-        for distance in distances:
-            base_time = calculate_base_time(distance, times, velocities, swimmer_style)
+        cache_key = interval_cache_key(times, goal_percentage, num_reps)
+        body = interval_cache.get_or_compute(
+            cache_key, lambda: app.json.dumps(build_interval_response(times, goal_percentage, num_reps))
+        )
 
-            if base_time > 0:
-                distance_key = f"{distance} yards"
-                model_predictions[distance_key] = format_time(base_time)
-                practice_time = adjust_time_for_practice(base_time, distance)
-                practice_predictions[distance_key] = format_time(practice_time)
+        return Response(body, mimetype='application/json')
 
-        goal_predictions = {}
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        logger.exception('Generate failed')
+        return jsonify({"error": str(e), "trace": error_trace}), 400
 
-        for distance in distances:
-            base_time = calculate_base_time(distance, times, velocities, swimmer_style)
+@app.route('/generate_batch', methods=['POST'])
+def generate_batch():
+    """Generate intervals for a whole training group or a list of swimmers"""
+    try:
+        data = request.json or {}
+        training_group_id = data.get('training_group_id')
+        swimmer_ids = data.get('swimmer_ids') or []
 
-            if base_time > 0:
-                goal_time = base_time * (1 - goal_percentage/100)
-                distance_key = f"{distance} yards"
-                goal_predictions[distance_key] = format_time(goal_time)
+        if training_group_id is None and not swimmer_ids:
+            return jsonify({"success": False, "error": "training_group_id or swimmer_ids is required"}), 400
+        if training_group_id is not None and swimmer_ids:
+            return jsonify({"success": False, "error": "Send training_group_id or swimmer_ids, not both"}), 400
 
-        response = {
-            "intervals": intervals,
-            "fatigue_progressions": fatigue_progressions,
-            "actual_times": actual_times,
-            "model_predictions": model_predictions,
-            "practice_predictions": practice_predictions,
-            "goal_model": {
-                "formula": f"Goal times based on {goal_percentage}% improvement",
-                "percentage": goal_percentage
-            },
-            "goal_predictions": goal_predictions,
-            "velocity_model": {
-                "formula": f"Cubic model based on {swimmer_style} profile"
-            },
-            "swimmer_profile": {
-                "style": swimmer_style,
-                "base_interval_100": format_time(base_interval_100)
-            }
-        }
+        goal_percentage = float(data.get('goal_percentage', 2.0))
+        num_reps = int(data.get('num_reps', 3))
 
-        return jsonify(response)
+        swimmer_times = load_group_times(
+            training_group_id=int(training_group_id) if training_group_id is not None else None,
+            swimmer_ids=[int(swimmer_id) for swimmer_id in swimmer_ids]
+        )
+        results = build_group_interval_responses(swimmer_times, goal_percentage, num_reps)
+
+        # Large groups are streamed as newline-delimited JSON, one swimmer per line
+        stream = data.get('stream')
+        if stream is None:
+            stream = len(swimmer_times) > BATCH_STREAM_THRESHOLD
+        if stream:
+            def generate_lines():
+                for entry in results:
+                    yield json.dumps(entry) + '\n'
+            return Response(stream_with_context(generate_lines()), mimetype='application/x-ndjson')
+
+        swimmers = list(results)
+        return jsonify({
+            "success": True,
+            "training_group_id": training_group_id,
+            "goal_percentage": goal_percentage,
+            "num_reps": num_reps,
+            "count": len(swimmers),
+            "swimmers": swimmers
+        })
 
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"Error in generate: {str(e)}\n{error_trace}")
-        return jsonify({"error": str(e), "trace": error_trace}), 400
+        logger.exception('Batch generate failed')
+        return jsonify({"success": False, "error": str(e)}), 400
 
 # ============================================================================
 # COLOR SYSTEM API
@@ -1177,27 +1293,87 @@ def calculate_color_system():
         test_type = request.json.get('test_type', '200_test')
         minutes = int(request.json.get('minutes', 0))
         seconds = float(request.json.get('seconds', 0))
-        drag_suit = request.json.get('drag_suit', False)
+        drag_suit = canonical_flag(request.json.get('drag_suit', False))
         course = request.json.get('course', 'SCY')
         stroke = request.json.get('stroke', 'freestyle')
 
-        total_seconds = minutes * 60 + seconds
+        # Rounded as in the cache key, so a cached result matches what these inputs compute
+        total_seconds = canonical_time(minutes * 60 + seconds)
 
-        color_system = UrbanchekColorSystem()
-        results = color_system.calculate_full_system(test_type, total_seconds, drag_suit)
+        cache_key = color_system_cache_key(test_type, total_seconds, drag_suit)
+        body = color_system_cache.get_or_compute(
+            cache_key,
+            lambda: app.json.dumps(UrbanchekColorSystem().calculate_full_system(test_type, total_seconds, drag_suit))
+        )
 
-        return jsonify(results)
+        return Response(body, mimetype='application/json')
 
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"Error in calculate_color_system: {str(e)}\n{error_trace}")
+        logger.exception('Color system calculation failed')
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/color_system_batch', methods=['POST'])
+def calculate_color_system_batch():
+    """Calculate and store color system results for a whole group's test set"""
+    try:
+        data = request.json or {}
+        test_type = data.get('test_type', '200_test')
+        test_date = data.get('test_date') or datetime.now().strftime('%Y-%m-%d')
+        drag_suit = canonical_flag(data.get('drag_suit', False))
+        entries = data.get('results', [])
+
+        if not entries:
+            return jsonify({'success': False, 'error': 'No test results provided'}), 400
+        if any(not entry.get('swimmer_id') for entry in entries):
+            return jsonify({'success': False, 'error': 'Every test result needs a swimmer_id'}), 400
+
+        results = save_team_color_systems(test_type, test_date, drag_suit, entries)
+
+        return jsonify({
+            'success': True,
+            'test_type': test_type,
+            'test_date': test_date,
+            'count': len(results),
+            'results': results
+        })
+
+    except Exception as e:
+        logger.exception('Batch color system calculation failed')
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/team_pace_chart/<int:group_id>')
+def team_pace_chart(group_id):
+    """Printable pace chart from the latest color system test of every swimmer in a group"""
+    try:
+        chart_html = get_team_pace_chart(group_id)
+        if chart_html is None:
+            return jsonify({'success': False, 'error': f'No training group found with ID {group_id}'}), 404
+        return Response(chart_html, mimetype='text/html')
+    except Exception as e:
+        logger.exception('Team pace chart failed')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ============================================================================
 # PULSE PLOT API
 # ============================================================================
 
+def pulse_regression(swim_speeds, sum_heart_rates):
+    """Least-squares HR sum vs speed line, or None unless every point is valid"""
+    slopes, intercepts, _ = batch_regression([swim_speeds], [sum_heart_rates], require_all=True)
+    if not math.isfinite(slopes[0]):
+        return None
+    return {'slope': float(slopes[0]), 'intercept': float(intercepts[0])}
+
+def pulse_plot_spec(swimmer_name, test_date, swim_speeds, sum_heart_rates):
+    """Render spec for one test's pulse plot; sum_heart_rates are bpm sums"""
+    return {
+        'swimmer_name': swimmer_name,
+        'test_date': test_date,
+        'swim_speeds': swim_speeds,
+        'sum_heart_rates': sum_heart_rates,
+        'regression': pulse_regression(swim_speeds, sum_heart_rates)
+    }
+
 @app.route('/api/generate_pulse_plot', methods=['POST'])
 def generate_pulse_plot():
     """Process pulse data and generate analysis for Salo Pulse Plot Test"""
@@ -1208,6 +1384,7 @@ def generate_pulse_plot():
         test_date = data.get('test_date')
         stroke = data.get('stroke', 'freestyle')
         interval_distance = int(data.get('interval_distance', 100))
+        mode = data.get('mode', request.args.get('mode', 'image'))
 
         hr_10s = data.get('hr_10s', [])
         hr_30s = data.get('hr_30s', [])
@@ -1222,61 +1399,34 @@ def generate_pulse_plot():
 
         swim_speeds = [interval_distance / time if time > 0 else 0 for time in swim_times]
 
-        # Convert heart rate counts to actual heart rates and sum them
-        sum_heart_rates = []
-        for i in range(8):
-            try:
-                # Convert 10-second counts to heart rates (multiply by 6) then sum
-                hr_10_bpm = int(hr_10s[i]) * 6
-                hr_30_bpm = int(hr_30s[i]) * 6
-                hr_60_bpm = int(hr_60s[i]) * 6
-                hr_sum = hr_10_bpm + hr_30_bpm + hr_60_bpm
-                sum_heart_rates.append(hr_sum)
-            except (ValueError, IndexError, TypeError):
-                sum_heart_rates.append(0)
+        # Sum the 10-second counts of each interval and convert them to bpm
+        sum_heart_rates = count_sums_to_bpm(pulse_count_sums(hr_10s, hr_30s, hr_60s))
 
         import base64
-        from io import BytesIO
-        import matplotlib.pyplot as plt
-        import numpy as np
-
-        plt.figure(figsize=(10, 6))
-        plt.scatter(swim_speeds, sum_heart_rates)
-
-        if all(speed > 0 for speed in swim_speeds) and all(hr > 0 for hr in sum_heart_rates):
-            slope, intercept = np.polyfit(swim_speeds, sum_heart_rates, 1)
-            fit_line = np.poly1d((slope, intercept))
-            fit_speeds = np.linspace(min(swim_speeds), max(swim_speeds), 100)
-            plt.plot(fit_speeds, fit_line(fit_speeds), 'r--')
-            equation = f"HR Sum = {slope:.2f} × Speed + {intercept:.2f}"
-            plt.text(min(swim_speeds), max(sum_heart_rates), fontsize=10)
-
-        plt.title(f"Pulse Plot - {swimmer_name} - {test_date}")
-        plt.xlabel("Swim Speed (yards/second)")
-        plt.ylabel("Heart Rate Sum (10s + 30s + 60s)")
-        plt.grid(True)
-
-        buf = BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        plot_image = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close()
+
+        spec = pulse_plot_spec(swimmer_name, test_date, swim_speeds, sum_heart_rates)
+        regression = spec['regression']
+        if regression:
+            slope, intercept = regression['slope'], regression['intercept']
+
+        plot_key = services.plot_renderer.register(spec)
+
+        # JSON-only mode leaves drawing to the client; otherwise the image is
+        # rendered in the plot worker pool (or served from the render cache)
+        plot_image = None
+        if mode != 'json':
+            plot_image = base64.b64encode(services.plot_renderer.get_image(plot_key, 'png')).decode('utf-8')
 
         # Load historical data for comparison
         history = []
         if swimmer_id:
             try:
-                history = pulse_plot.load_history_from_db(swimmer_id)
+                history = services.pulse_plot_store.load_history(swimmer_id)
             except Exception as e:
-                print(f"Warning: Could not load historical data: {e}")
-                # Try loading from file as backup
-                try:
-                    history = pulse_plot.load_history(swimmer_name)
-                except Exception as e2:
-                    print(f"Warning: Could not load file history either: {e2}")
-
-        # Save the test results to database and file
-        save_result = pulse_plot.save_test(
+                logger.warning('Could not load pulse plot history', extra={'swimmer_id': swimmer_id, 'error': str(e)})
+
+        # Save the test results to the database
+        save_result = services.pulse_plot_store.save_test(
             swimmer_id=swimmer_id,
             swimmer_name=swimmer_name,
             test_date=test_date,
@@ -1284,13 +1434,14 @@ def generate_pulse_plot():
             hr_10s=hr_10s,
             hr_30s=hr_30s,
             hr_60s=hr_60s,
-            stroke=stroke
+            stroke=stroke,
+            interval_distance=interval_distance
         )
 
         if save_result.get('success'):
-            print(f"Successfully saved pulse plot test for {swimmer_name} on {test_date}")
+            logger.info('Saved pulse plot test', extra={'swimmer_id': swimmer_id, 'test_date': test_date})
         else:
-            print(f"Warning: Failed to save test data: {save_result.get('error')}")
+            logger.warning('Could not save pulse plot test', extra={'swimmer_id': swimmer_id, 'error': save_result.get('error')})
 
         # Enhanced Dave Salo analysis
         analysis_parts = []
@@ -1384,7 +1535,7 @@ def generate_pulse_plot():
         if training_recommendations:
             analysis += "\n\n**SPECIFIC TRAINING RECOMMENDATIONS:**\n• " + "\n• ".join(training_recommendations)
 
-        return jsonify({
+        response = {
             'success': True,
             'swimmer_name': swimmer_name,
             'test_date': test_date,
@@ -1393,19 +1544,23 @@ def generate_pulse_plot():
             'swim_times': swim_times,
             'swim_speeds': swim_speeds,
             'sum_heart_rates': sum_heart_rates,
-            'plot_image': plot_image,
+            'regression': regression,
+            'plot_key': plot_key,
+            'plot_url': url_for('pulse_plot_image', plot_key=plot_key, fmt='png'),
             'analysis': analysis,
             'save_status': save_result,
             'historical_tests_count': len(history) if history else 0,
             'message': f"Test saved successfully for {swimmer_name} on {test_date}" if save_result.get('success') else "Test completed but save failed"
-        })
+        }
+        if plot_image is not None:
+            response['plot_image'] = plot_image
+
+        return jsonify(response)
 
     except Exception as e:
-        import traceback
         error_msg = str(e)
-        print(f"Error generating pulse plot: {error_msg}")
-        print(f"Data received: {data}")
-        print(traceback.format_exc())
+        logger.exception('Generating pulse plot failed')
+        logger.debug('Pulse plot request data', extra={'data': data})
         return jsonify({
             'success': False,
             'error': error_msg,
@@ -1419,11 +1574,110 @@ def generate_pulse_plot():
             }
         }), 500
 
+@app.route('/api/generate_pulse_plot_batch', methods=['POST'])
+def generate_pulse_plot_batch():
+    """Ingest a whole group's Salo Pulse Plot test day in one request"""
+    try:
+        data = request.json or {}
+        test_date = data.get('test_date')
+        stroke = data.get('stroke', 'freestyle')
+        interval_distance = int(data.get('interval_distance', 100))
+        entries = data.get('results', [])
+
+        if not test_date:
+            return jsonify({'success': False, 'error': 'Missing test date'}), 400
+        if not entries:
+            return jsonify({'success': False, 'error': 'No swimmer results provided'}), 400
+
+        # Nothing is saved unless every swimmer's results follow the protocol
+        errors = []
+        for index, entry in enumerate(entries):
+            entry_errors = validate_pulse_entry(entry)
+            if entry_errors:
+                errors.append({
+                    'index': index,
+                    'swimmer_id': entry.get('swimmer_id'),
+                    'swimmer_name': entry.get('swimmer_name'),
+                    'errors': entry_errors
+                })
+        if errors:
+            return jsonify({
+                'success': False,
+                'error': 'Salo Pulse Plot requires 8 sets of measurements for every swimmer',
+                'invalid_results': errors
+            }), 400
+
+        results = save_pulse_test_batch(services.pulse_plot_store, test_date, stroke, interval_distance, entries)
+
+        group_name = data.get('group_name') or 'Group'
+        overlay_key = services.plot_renderer.register(
+            overlay_spec(f"Pulse Plot Overlay - {group_name} - {test_date}", results)
+        )
+
+        return jsonify({
+            'success': True,
+            'test_date': test_date,
+            'stroke': stroke,
+            'interval_distance': interval_distance,
+            'saved_count': len(results),
+            'results': results,
+            'overlay_plot_key': overlay_key,
+            'overlay_plot_url': url_for('pulse_plot_image', plot_key=overlay_key, fmt='png')
+        })
+
+    except Exception as e:
+        logger.exception('Generating pulse plot batch failed')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/pulse_plot_image/<plot_key>.<any(png, svg):fmt>')
+def pulse_plot_image(plot_key, fmt):
+    """Serve a rendered pulse plot as a raw PNG or SVG"""
+    image = services.plot_renderer.get_image(plot_key, fmt)
+    if image is None:
+        return jsonify({'success': False, 'error': 'Unknown plot'}), 404
+
+    # The key is a hash of the stored plot spec, so the image never changes;
+    # it shows an athlete's data, so only the browser may cache it
+    response = Response(image, mimetype=IMAGE_FORMATS[fmt])
+    response.set_etag(f"{plot_key}-{fmt}")
+    response.cache_control.private = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+@app.route('/api/pulse_plot_trends/<int:swimmer_id>')
+def get_pulse_plot_trends(swimmer_id):
+    """Slope and intercept trends across all of a swimmer's pulse plot tests"""
+    try:
+        tests, speeds, heart_rates = load_pulse_tests(swimmer_id=swimmer_id, stroke=request.args.get('stroke'))
+        return jsonify({
+            'success': True,
+            'swimmer_id': swimmer_id,
+            'test_count': len(tests),
+            'trends': analyze_trends(tests, speeds, heart_rates)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/pulse_plot_trends/group/<int:group_id>')
+def get_group_pulse_plot_trends(group_id):
+    """Slope and intercept trends for every swimmer in a training group"""
+    try:
+        tests, speeds, heart_rates = load_pulse_tests(group_id=group_id, stroke=request.args.get('stroke'))
+        return jsonify({
+            'success': True,
+            'group_id': group_id,
+            'test_count': len(tests),
+            'trends': analyze_trends(tests, speeds, heart_rates)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/pulse_plot_history/<int:swimmer_id>')
 def get_pulse_plot_history(swimmer_id):
     """Get pulse plot test history for a swimmer"""
     try:
-        history = pulse_plot.load_history_from_db(swimmer_id)
+        history = services.pulse_plot_store.load_history(swimmer_id)
 
         return jsonify({
             'success': True,
@@ -1460,14 +1714,17 @@ def get_swimmer_best_times_route(swimmer_id):
         best_times = get_swimmer_best_times(swimmer_id)
         all_times = get_swimmer_time_history(swimmer_id)
 
-        print(f"📊 Loading times for swimmer {swimmer_id}")
-        print(f"📋 Found {len(best_times) if best_times else 0} best times")
-        print(f"📋 Found {len(all_times) if all_times else 0} total times")
-
-        if best_times:
-            # Log first few times for debugging
-            for i, time_entry in enumerate(best_times[:3]):
-                print(f"  Best time {i+1}: {time_entry.get('event')} - {time_entry.get('time_string')} ({time_entry.get('course')})")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Loaded swimmer times', extra={
+                'swimmer_id': swimmer_id,
+                'best_times': len(best_times or ()),
+                'total_times': len(all_times or ()),
+                # First few best times as a sample
+                'sample': [
+                    f"{entry.get('event')} {entry.get('time_string')} ({entry.get('course')})"
+                    for entry in (best_times or [])[:3]
+                ]
+            })
 
         # Ensure we return an empty list instead of None
         if not best_times:
@@ -1475,19 +1732,20 @@ def get_swimmer_best_times_route(swimmer_id):
         if not all_times:
             all_times = []
 
-        return jsonify({
+        payload = {
             "success": True, 
-            "times": best_times,  # For athlete profile compatibility
             "best_times": best_times, 
             "all_times": all_times,  # All times for history display
             "count": len(best_times),
             "total_times": len(all_times),
             "swimmer_id": swimmer_id
-        })
+        }
+        legacy = request.args.get('legacy')
+        if app.config['BEST_TIMES_LEGACY_FIELDS'] if legacy is None else legacy != '0':
+            payload["times"] = best_times  # For athlete profile compatibility
+        return jsonify(payload)
     except Exception as e:
-        print(f"❌ Error getting swimmer times for {swimmer_id}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Loading swimmer times failed', extra={'swimmer_id': swimmer_id})
         return jsonify({
             "success": False, 
             "error": str(e),
@@ -1530,6 +1788,9 @@ def get_athlete_pulse_history(swimmer_id):
         rows = cursor.fetchall()
         conn.close()
 
+        swimmer = get_swimmer(swimmer_id)
+        swimmer_name = swimmer['name'] if swimmer else f'Swimmer {swimmer_id}'
+
         formatted_history = []
         for row in rows:
             try:
@@ -1552,9 +1813,16 @@ def get_athlete_pulse_history(swimmer_id):
                     test_data['speed_range'] = max(test_data['swim_speeds']) - min(test_data['swim_speeds'])
                     test_data['hr_range'] = max(test_data['sum_heart_rates']) - min(test_data['sum_heart_rates'])
 
+                    # Stored sums are pulse counts; plot them in bpm like generate_pulse_plot
+                    plot_key = services.plot_renderer.register(pulse_plot_spec(
+                        swimmer_name, test_data['test_date'], test_data['swim_speeds'],
+                        count_sums_to_bpm(test_data['sum_heart_rates'])
+                    ))
+                    test_data['plot_url'] = url_for('pulse_plot_image', plot_key=plot_key, fmt='png')
+
                 formatted_history.append(test_data)
             except (json.JSONDecodeError, ValueError) as e:
-                print(f"Error parsing pulse plot data for row: {e}")
+                logger.warning('Skipping unreadable pulse plot test', extra={'swimmer_id': swimmer_id, 'error': str(e)})
                 continue
 
         return jsonify({
@@ -1565,7 +1833,7 @@ def get_athlete_pulse_history(swimmer_id):
         })
 
     except Exception as e:
-        print(f"Error in get_athlete_pulse_history: {str(e)}")
+        logger.exception('Loading pulse plot history failed', extra={'swimmer_id': swimmer_id})
         return jsonify({
             'success': False,
             'error': str(e),
@@ -1589,19 +1857,7 @@ def delete_pulse_plot_test():
                 'error': 'Missing required parameters'
             }), 400
 
-        from modules.database import get_connection
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        # Delete from database
-        cursor.execute('''
-            DELETE FROM pulse_plot_tests 
-            WHERE swimmer_id = ? AND test_date = ? AND stroke = ?
-        ''', (swimmer_id, test_date, stroke))
-
-        deleted_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+        deleted_count = services.pulse_plot_store.delete_test(swimmer_id, test_date, stroke)
 
         if deleted_count == 0:
             return jsonify({
@@ -1609,136 +1865,299 @@ def delete_pulse_plot_test():
                 'error': 'Test not found'
             }), 404
 
-        # Also try to remove from file if it exists
-        try:
-            swimmer = get_swimmer(swimmer_id)
-            if swimmer:
-                swimmer_name = swimmer['name'].lower().replace(' ', '_')
-                file_path = os.path.join('pulse_plot_data', f"{swimmer_name}.json")
-
-                if os.path.exists(file_path):
-                    with open(file_path, 'r') as f:
-                        file_data = json.load(f)
-
-                    # Remove matching test from file
-                    updated_data = [
-                        test for test in file_data 
-                        if not (test.get('date') == test_date and test.get('stroke') == stroke)
-                    ]
-
-                    with open(file_path, 'w') as f:
-                        json.dump(updated_data, f, indent=4)
-        except Exception as file_error:
-            print(f"Warning: Could not update file: {file_error}")
-
         return jsonify({
             'success': True,
             'message': 'Test deleted successfully'
         })
 
     except Exception as e:
-        print(f"Error deleting pulse plot test: {str(e)}")
+        logger.exception('Deleting pulse plot test failed')
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
 # ============================================================================
-# EMAIL API
+# WORKOUT TEMPLATES API
 # ============================================================================
 
-def send_email_smtp(to_email, subject, content, from_email=None, from_password=None):
-    """Send email using SMTP (supports multiple providers)"""
+def _range_arg(name):
+    """A query argument given as "N" or "LOW-HIGH" -> N, (LOW, HIGH) or None"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    if '-' in value:
+        low, high = value.split('-', 1)
+        return (float(low), float(high))
+    return float(value)
+
+@app.route('/api/workout_templates/search')
+def search_workout_templates():
+    """
+    Templates matching tag, yardage and difficulty filters from the template index.
+
+    phase, group and intensity take one value; focus, stroke_focus and
+    equipment (the equipment available) take comma-separated lists;
+    yardage, main_set_yardage and difficulty take N or LOW-HIGH.
+    """
     try:
-        # Use provided values or get from config
-        if from_email and from_password:
-            sender_email = from_email
-            sender_password = from_password
-        else:
-            from email_config import get_email_config
-            sender_email, sender_password = get_email_config()
-
-        # Debug logging (remove sensitive info)
-        print(f"🔧 EMAIL DEBUG:")
-        print(f"  - EMAIL_USER exists: {bool(os.environ.get('EMAIL_USER'))}")
-        print(f"  - EMAIL_PASSWORD exists: {bool(os.environ.get('EMAIL_PASSWORD'))}")
-
-        if sender_email:
-            email_parts = sender_email.split('@')
-            if len(email_parts) >= 2:
-                print(f"  - Sender email: {sender_email[:5]}***@{email_parts[1]}")
-            else:
-                print(f"  - Sender email: {sender_email[:5]}*** (invalid format)")
-        else:
-            print(f"  - Sender email: None")
-
-        print(f"  - Has password: {bool(sender_password)}")
-
-        if not sender_email or not sender_password:
-            missing = []
-            if not sender_email:
-                missing.append("EMAIL_USER")
-            if not sender_password:
-                missing.append("EMAIL_PASSWORD")
-            error_msg = f"Missing required environment variables: {', '.join(missing)}. Please add them in the Secrets tool."
-            print(f"❌ {error_msg}")
-            return False, error_msg
-
-        # Determine SMTP settings based on email provider
-        if '@gmail.com' in sender_email:
-            smtp_server = "smtp.gmail.com"
-            smtp_port = 587
-        elif '@outlook.com' in sender_email or '@hotmail.com' in sender_email:
-            smtp_server = "smtp-mail.outlook.com"
-            smtp_port = 587
-        elif '@yahoo.com' in sender_email:
-            smtp_server = "smtp.mail.yahoo.com"
-            smtp_port = 587
+        def listed(name):
+            value = request.args.get(name)
+            return [item.strip() for item in value.split(',') if item.strip()] if value is not None else None
+
+        templates = services.template_index.query(
+            phase=request.args.get('phase'),
+            focus=listed('focus'),
+            group=request.args.get('group'),
+            intensity=request.args.get('intensity'),
+            stroke_focus=listed('stroke_focus'),
+            equipment=listed('equipment'),
+            total_yardage=_range_arg('yardage'),
+            main_set_yardage=_range_arg('main_set_yardage'),
+            difficulty=_range_arg('difficulty'),
+            limit=request.args.get('limit', type=int)
+        )
+        return jsonify({'success': True, 'count': len(templates), 'templates': templates})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.exception('Template search failed')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/workout_history', methods=['POST'])
+def record_workout_history():
+    """Record that a group did a template on a date (the history aggregates update in the same statement)"""
+    try:
+        data = request.get_json() or {}
+        if not data.get('group_name') or not data.get('template_id') or not data.get('workout_date'):
+            return jsonify({'success': False, 'error': 'group_name, template_id and workout_date are required'}), 400
+        history_id = services.workout_history_stats.record(
+            data['group_name'], data['template_id'], data['workout_date'], data.get('phase'), data.get('focus')
+        )
+        return jsonify({'success': True, 'id': history_id}), 201
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.exception('Recording workout history failed')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/workout_recommendations')
+def workout_recommendations():
+    """
+    Templates for a group ranked by its workout history.
+
+    Candidates come from the template index (group and phase, plus the
+    optional focus and yardage filters of the template search); each is
+    then scored from the group's history aggregates, penalising templates
+    done recently and focuses already heavy this week.
+    """
+    try:
+        group = request.args.get('group')
+        if not group:
+            return jsonify({'success': False, 'error': 'group is required'}), 400
+        phase = request.args.get('phase')
+        focus = request.args.get('focus')
+        on_date = request.args.get('date') or date.today().isoformat()
+        candidates = services.template_index.query(
+            phase=phase,
+            focus=[item.strip() for item in focus.split(',') if item.strip()] if focus else None,
+            group=group,
+            total_yardage=_range_arg('yardage')
+        )
+        scorer = services.workout_history_stats.scorer(group, on_date, phase)
+        ranked = scorer.rank(candidates, request.args.get('limit', 10, type=int))
+        return jsonify({
+            'success': True,
+            'group': group,
+            'date': on_date,
+            'candidates': len(candidates),
+            'recommendations': [{'score': round(score, 4), **template} for score, template in ranked]
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.exception('Workout recommendations failed')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# ============================================================================
+# SEASON PLANS API
+# ============================================================================
+
+@app.route('/api/season_plans', methods=['POST'])
+def create_season_plan():
+    """Create a season plan and plan every week"""
+    try:
+        data = request.get_json() or {}
+        if not data.get('start_date') or not data.get('num_weeks'):
+            return jsonify({'success': False, 'error': 'start_date and num_weeks are required'}), 400
+        settings = {key: value for key, value in data.items() if key not in ('start_date', 'num_weeks')}
+        plan = services.season_plans.create_plan(data['start_date'], data['num_weeks'], **settings)
+        return jsonify({'success': True, **plan}), 201
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.exception('Creating season plan failed')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/season_plans/<int:plan_id>', methods=['GET', 'PATCH', 'DELETE'])
+def season_plan(plan_id):
+    """
+    Read, edit or delete a season plan.
+
+    PATCH takes any of meet_date, holidays, phase_overrides ({week: phase}),
+    training_days, peak_volume, start_date, num_weeks, name and season_id
+    (to skip that season's holidays and pool closures), and only
+    recomputes the weeks those changes affect ("recomputed" lists them).
+    """
+    try:
+        if request.method == 'DELETE':
+            if not services.season_plans.delete_plan(plan_id):
+                return jsonify({'success': False, 'error': 'Season plan not found'}), 404
+            return jsonify({'success': True})
+        if request.method == 'PATCH':
+            plan = services.season_plans.update_plan(plan_id, **(request.get_json() or {}))
         else:
-            # Default to Gmail settings
-            smtp_server = "smtp.gmail.com"
-            smtp_port = 587
-
-        print(f"  - Using SMTP: {smtp_server}:{smtp_port}")
-
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = to_email
-        msg['Subject'] = subject
-
-        # Add content
-        msg.attach(MIMEText(content, 'plain'))
-
-        # Create SMTP session
-        print(f"  - Connecting to {smtp_server}...")
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()  # Enable TLS encryption
-
-        print(f"  - Attempting login...")
-        server.login(sender_email, sender_password)
-
-        print(f"  - Sending email...")
-        # Send email
-        text = msg.as_string()
-        server.sendmail(sender_email, to_email, text)
-        server.quit()
-
-        print(f"✅ Email sent successfully to {to_email}")
-        return True, "Email sent successfully"
-
-    except smtplib.SMTPAuthenticationError as e:
-        error_msg = f"Authentication failed: {str(e)}. Please check your email and app password."
-        print(f"❌ {error_msg}")
-        return False, error_msg
-    except smtplib.SMTPException as e:
-        error_msg = f"SMTP error: {str(e)}"
-        print(f"❌ {error_msg}")
-        return False, error_msg
+            plan = services.season_plans.get_plan(plan_id)
+        if plan is None:
+            return jsonify({'success': False, 'error': 'Season plan not found'}), 404
+        return jsonify({'success': True, **plan})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.exception('Season plan request failed', extra={'plan_id': plan_id})
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/seasons/<int:season_id>/calendar')
+def season_calendar(season_id):
+    """Every day of a season with its week, holiday and closed locations"""
+    try:
+        calendar = services.calendar_index.season(season_id)
+        if calendar is None:
+            return jsonify({'success': False, 'error': 'Season not found'}), 404
+        return jsonify({
+            'success': True,
+            'season_id': season_id,
+            'start_date': calendar.start.isoformat(),
+            'location_ids': calendar.location_ids,
+            'days': calendar.days()
+        })
+    except Exception as e:
+        logger.exception('Loading season calendar failed', extra={'season_id': season_id})
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/location_closures', methods=['GET', 'POST'])
+def location_closures():
+    """List pool closures, or add one (location_id omitted closes every location)"""
+    try:
+        if request.method == 'GET':
+            return jsonify({'success': True, 'closures': services.calendar_index.closures()})
+        data = request.get_json() or {}
+        if not data.get('start_date') or not data.get('end_date'):
+            return jsonify({'success': False, 'error': 'start_date and end_date are required'}), 400
+        closure_id = services.calendar_index.add_closure(
+            data['start_date'], data['end_date'], data.get('location_id'), data.get('reason')
+        )
+        return jsonify({'success': True, 'closure_id': closure_id}), 201
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        error_msg = f"Unexpected error: {str(e)}"
-        print(f"❌ {error_msg}")
-        return False, error_msg
+        logger.exception('Location closure request failed')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/location_closures/<int:closure_id>', methods=['DELETE'])
+def delete_location_closure(closure_id):
+    try:
+        if not services.calendar_index.remove_closure(closure_id):
+            return jsonify({'success': False, 'error': 'Closure not found'}), 404
+        return jsonify({'success': True})
+    except Exception as e:
+        logger.exception('Deleting location closure failed', extra={'closure_id': closure_id})
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# ============================================================================
+# EMAIL API
+# ============================================================================
+
+def send_email_smtp(to_email, subject, content, from_email=None, from_password=None):
+    """Send email using SMTP (supports multiple providers) over a pooled session"""
+    success, message = services.smtp_pool.send(to_email, subject, content, from_email, from_password)
+    if success:
+        logger.info('Email sent', extra={'to': to_email})
+    else:
+        logger.warning('Email failed', extra={'to': to_email, 'error': message})
+    return success, message
+
+def send_emails_bulk(messages, from_email=None, from_password=None):
+    """Send many (to_email, subject, content) messages over one SMTP session"""
+    results = services.smtp_pool.send_bulk(messages, from_email, from_password)
+    sent = sum(1 for success, _ in results if success)
+    logger.info('Bulk email send finished', extra={'sent': sent, 'total': len(results)})
+    return results
+
+def log_athlete_emails(cursor, entries):
+    """
+    Record queued athlete emails in email_log on the caller's cursor.
+
+    entries are (athlete_id, athlete_name, recipient_email, recipient_name,
+    subject, content) tuples; returns the log row ids in order. Passed to
+    EmailOutbox.enqueue_many as write_logs, so the log rows and outbox rows
+    commit together.
+    """
+    # Create email_log table if it doesn't exist
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            athlete_id INTEGER,
+            athlete_name TEXT,
+            recipient_email TEXT,
+            recipient_name TEXT,
+            subject TEXT,
+            content_length INTEGER,
+            sent_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'sent',
+            error_message TEXT
+        )
+    ''')
+
+    # Add error_message column if it doesn't exist
+    cursor.execute('PRAGMA table_info(email_log)')
+    if 'error_message' not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute('ALTER TABLE email_log ADD COLUMN error_message TEXT')
+
+    log_ids = []
+    for athlete_id, athlete_name, recipient_email, recipient_name, subject, content in entries:
+        cursor.execute('''
+            INSERT INTO email_log
+            (athlete_id, athlete_name, recipient_email, recipient_name, subject, content_length, status)
+            VALUES (?, ?, ?, ?, ?, ?, 'queued')
+        ''', (athlete_id, athlete_name, recipient_email, recipient_name, subject, len(content)))
+        log_ids.append(cursor.lastrowid)
+    return log_ids
+
+def log_coach_email(cursor, group_id, coach_email, coach_name, subject, athlete_count, content):
+    """Record a queued coach email in coach_email_log on the caller's cursor; returns [log row id]"""
+    # Create coach_email_log table if it doesn't exist
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS coach_email_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_id INTEGER,
+            coach_email TEXT,
+            coach_name TEXT,
+            subject TEXT,
+            athlete_count INTEGER,
+            content_length INTEGER,
+            sent_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'sent',
+            error_message TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        INSERT INTO coach_email_log
+        (group_id, coach_email, coach_name, subject, athlete_count, content_length, status)
+        VALUES (?, ?, ?, ?, ?, ?, 'queued')
+    ''', (group_id, coach_email, coach_name, subject, athlete_count, len(content)))
+    return [cursor.lastrowid]
 
 @app.route('/api/test_email', methods=['POST'])
 def test_email_config():
@@ -1779,7 +2198,7 @@ Swimming Training System
 
 @app.route('/api/send_athlete_email', methods=['POST'])
 def send_athlete_email():
-    """Send athlete profile information via email"""
+    """Queue athlete profile information for email delivery"""
     try:
         data = request.json
         recipient_email = data.get('recipient_email')
@@ -1807,84 +2226,123 @@ def send_athlete_email():
                 'error': 'Email content is empty. Please select information to include.'
             }), 400
 
-        print(f"📧 Attempting to send email:")
-        print(f"  - To: {recipient_email}")
-        print(f"  - Subject: {subject}")
-        print(f"  - Content length: {len(content)} characters")
-        print(f"  - Athlete: {athlete_name} (ID: {athlete_id})")
-
-        # Try to send actual email
-        email_success, email_message = send_email_smtp(recipient_email, subject, content)
-
-        status = 'sent' if email_success else 'failed'
-
-        # Log email activity
-        try:
-            from modules.database import get_connection
-            conn = get_connection()
-            cursor = conn.cursor()
-
-            # Create email_log table if it doesn't exist
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS email_log (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    athlete_id INTEGER,
-                    athlete_name TEXT,
-                    recipient_email TEXT,
-                    recipient_name TEXT,
-                    subject TEXT,
-                    content_length INTEGER,
-                    sent_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    status TEXT DEFAULT 'sent',
-                    error_message TEXT
-                )
-            ''')
-
-            # Add error_message column if it doesn't exist
-            try:
-                cursor.execute('ALTER TABLE email_log ADD COLUMN error_message TEXT')
-            except sqlite3.OperationalError:
-                pass  # Column already exists
+        outbox_id = services.email_outbox.enqueue(
+            recipient_email, subject, content, 'email_log',
+            write_logs=lambda cursor: log_athlete_emails(
+                cursor, [(athlete_id, athlete_name, recipient_email, recipient_name, subject, content)]
+            )
+        )
+        logger.info('Email queued', extra={
+            'to': recipient_email, 'subject': subject, 'content_length': len(content),
+            'athlete_id': athlete_id, 'message_id': outbox_id
+        })
 
-            # Log the email
-            cursor.execute('''
-                INSERT INTO email_log 
-                (athlete_id, athlete_name, recipient_email, recipient_name, subject, content_length, status, error_message)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (athlete_id, athlete_name, recipient_email, recipient_name, subject, len(content), status, None if email_success else email_message))
+        return jsonify({
+            'success': True,
+            'queued': True,
+            'message': f'Email to {recipient_name} queued for delivery',
+            'recipient': recipient_email,
+            'message_id': outbox_id,
+            'status_url': url_for('email_status', outbox_id=outbox_id)
+        }), 202
 
-            conn.commit()
-            conn.close()
+    except Exception as e:
+        logger.exception('Queueing email failed')
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-        except Exception as log_error:
-            print(f"Warning: Could not log email activity: {log_error}")
+@app.route('/api/send_group_mail_merge', methods=['POST'])
+def send_group_mail_merge():
+    """Render a personalized email for every athlete in a training group and queue them all"""
+    try:
+        data = request.json or {}
+        group_id = data.get('group_id')
+        subject_source = data.get('subject')
+        template_source = data.get('template')
+        preview = bool(data.get('preview'))
 
-        if email_success:
-            print(f"📧 EMAIL SENT SUCCESSFULLY")
-            print(f"To: {recipient_email} ({recipient_name})")
-            print(f"Subject: {subject}")
-            print(f"Athlete: {athlete_name} (ID: {athlete_id})")
+        if not group_id:
+            return jsonify({'success': False, 'error': 'group_id is required'}), 400
+        if not subject_source or not subject_source.strip():
+            return jsonify({'success': False, 'error': 'Please enter a subject'}), 400
+        if not template_source or not template_source.strip():
+            return jsonify({'success': False, 'error': 'Please enter an email template'}), 400
 
+        try:
+            subject_template = compile_template(subject_source, 'subject')
+            body_template = compile_template(template_source, 'template')
+            group, profiles = load_group_profiles(group_id)
+            if group is None:
+                return jsonify({'success': False, 'error': 'Training group not found'}), 404
+            messages, skipped = render_messages(profiles, subject_template, body_template, group)
+        except MailMergeError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        if preview:
             return jsonify({
                 'success': True,
-                'message': f'Email sent successfully to {recipient_name}',
-                'recipient': recipient_email
+                'preview': True,
+                'messages': messages,
+                'skipped': skipped
             })
-        else:
-            print(f"❌ EMAIL FAILED TO SEND: {email_message}")
+
+        if not messages:
             return jsonify({
                 'success': False,
-                'error': f'Failed to send email: {email_message}',
-                'fallback_message': 'Email service not configured. Please set up EMAIL_USER and EMAIL_PASSWORD environment variables.'
-            }), 500
+                'error': 'No athletes in this group have an email address',
+                'skipped': skipped
+            }), 400
+
+        outbox_ids = services.email_outbox.enqueue_many([
+            {
+                'to_email': m['to_email'],
+                'subject': m['subject'],
+                'content': m['content'],
+                'log_table': 'email_log'
+            }
+            for m in messages
+        ], write_logs=lambda cursor: log_athlete_emails(cursor, [
+            (m['athlete_id'], m['athlete_name'], m['to_email'], m['athlete_name'], m['subject'], m['content'])
+            for m in messages
+        ]))
+
+        logger.info('Mail merge queued', extra={
+            'group_name': group['group_name'], 'queued': len(messages), 'skipped': len(skipped)
+        })
+
+        return jsonify({
+            'success': True,
+            'queued': len(messages),
+            'message': f"{len(messages)} personalized emails queued for {group['group_name']}",
+            'messages': [
+                {
+                    'athlete_id': m['athlete_id'],
+                    'recipient': m['to_email'],
+                    'message_id': outbox_id,
+                    'status_url': url_for('email_status', outbox_id=outbox_id)
+                }
+                for m, outbox_id in zip(messages, outbox_ids)
+            ],
+            'skipped': skipped
+        }), 202
 
     except Exception as e:
-        print(f"Error sending email: {str(e)}")
+        logger.exception('Group mail merge failed')
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/email_status/<int:outbox_id>')
+def email_status(outbox_id):
+    """Delivery status of a queued email"""
+    status = services.email_outbox.status(outbox_id)
+    if status is None:
+        return jsonify({'success': False, 'error': 'Unknown message id'}), 404
+    return jsonify({'success': True, **status})
+
 @app.route('/coach_email')
 def coach_email_page():
     """Render the coach email page"""
@@ -1929,7 +2387,7 @@ def get_training_group_athletes(group_id):
 
 @app.route('/api/send_coach_email', methods=['POST'])
 def send_coach_email():
-    """Send training group report email to coach"""
+    """Queue a training group report email to a coach"""
     try:
         data = request.json
         recipient_email = data.get('recipient_email')
@@ -1957,69 +2415,29 @@ def send_coach_email():
                 'error': 'Email content is empty. Please select information to include.'
             }), 400
 
-        print(f"📧 Sending coach email:")
-        print(f"  - To: {recipient_email} ({recipient_name})")
-        print(f"  - Subject: {subject}")
-        print(f"  - Content length: {len(content)} characters")
-        print(f"  - Athletes: {athlete_count}")
-        print(f"  - Group ID: {group_id}")
-
-        # Send the email
-        email_success, email_message = send_email_smtp(recipient_email, subject, content)
-
-        # Log email activity
-        try:
-            from modules.database import get_connection
-            conn = get_connection()
-            cursor = conn.cursor()
-
-            # Create coach_email_log table if it doesn't exist
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS coach_email_log (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    group_id INTEGER,
-                    coach_email TEXT,
-                    coach_name TEXT,
-                    subject TEXT,
-                    athlete_count INTEGER,
-                    content_length INTEGER,
-                    sent_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    status TEXT DEFAULT 'sent',
-                    error_message TEXT
-                )
-            ''')
-
-            status = 'sent' if email_success else 'failed'
-
-            cursor.execute('''
-                INSERT INTO coach_email_log 
-                (group_id, coach_email, coach_name, subject, athlete_count, content_length, status, error_message)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (group_id, recipient_email, recipient_name, subject, athlete_count, len(content), status, None if email_success else email_message))
-
-            conn.commit()
-            conn.close()
-
-        except Exception as log_error:
-            print(f"Warning: Could not log coach email activity: {log_error}")
+        outbox_id = services.email_outbox.enqueue(
+            recipient_email, subject, content, 'coach_email_log',
+            write_logs=lambda cursor: log_coach_email(
+                cursor, group_id, recipient_email, recipient_name, subject, athlete_count, content
+            )
+        )
+        logger.info('Coach email queued', extra={
+            'to': recipient_email, 'subject': subject, 'content_length': len(content),
+            'athletes': athlete_count, 'group_id': group_id, 'message_id': outbox_id
+        })
 
-        if email_success:
-            print(f"✅ COACH EMAIL SENT SUCCESSFULLY")
-            return jsonify({
-                'success': True,
-                'message': f'Training group report sent successfully to {recipient_name}',
-                'recipient': recipient_email,
-                'athlete_count': athlete_count
-            })
-        else:
-            print(f"❌ COACH EMAIL FAILED: {email_message}")
-            return jsonify({
-                'success': False,
-                'error': f'Failed to send email: {email_message}'
-            }), 500
+        return jsonify({
+            'success': True,
+            'queued': True,
+            'message': f'Training group report to {recipient_name} queued for delivery',
+            'recipient': recipient_email,
+            'athlete_count': athlete_count,
+            'message_id': outbox_id,
+            'status_url': url_for('email_status', outbox_id=outbox_id)
+        }), 202
 
     except Exception as e:
-        print(f"Error sending coach email: {str(e)}")
+        logger.exception('Queueing coach email failed')
         return jsonify({
             'success': False,
             'error': str(e)
@@ -2035,17 +2453,16 @@ def swimmers_route():
     try:
         from modules.database import get_all_swimmers
         show_all = request.args.get('show_all', 'false').lower() == 'true'
-        swimmers = get_all_swimmers()
 
         if show_all:
             # Return JSON for API calls
-            return jsonify(swimmers)
+            return jsonify(get_all_swimmers())
         else:
             # Redirect to main swimmers page
             return redirect('/api/swimmers')
 
     except Exception as e:
-        print('Error in swimmers route:', e)
+        logger.exception('Swimmers route failed')
         return jsonify({"error": str(e)}), 500
 
 @app.route('/all_times')
@@ -2074,6 +2491,49 @@ def debug_routes():
         })
     return jsonify(routes)
 
+@app.route('/api/debug/cache_stats')
+def debug_cache_stats():
+    """Debug endpoint reporting size and hit rate of the result caches"""
+    return jsonify(all_cache_stats())
+
+@app.route('/api/debug/metrics')
+def debug_metrics():
+    """Per-route latency, SQL, scraper and cache metrics as JSON or Prometheus text (?format=prometheus)"""
+    cache_stats = all_cache_stats()
+    wants_text = request.args.get('format') == 'prometheus' or (
+        request.accept_mimetypes.best_match(['application/json', 'text/plain']) == 'text/plain'
+    )
+    if wants_text:
+        return Response(metrics.prometheus(cache_stats), mimetype='text/plain; version=0.0.4')
+    return jsonify(metrics.snapshot(cache_stats))
+
+@app.route('/api/debug/profiles')
+def debug_profiles():
+    """List stored request profiles (requires the profiler token)"""
+    if not request_profiler.authorized(request):
+        return jsonify({'success': False, 'error': 'Profiler token required'}), 403
+    return jsonify({'success': True, 'profiles': request_profiler.list_profiles()})
+
+@app.route('/api/debug/profiles/<profile_id>.<any(pstats, folded):fmt>')
+def debug_profile_download(profile_id, fmt):
+    """Download a request profile as pstats or collapsed flamegraph stacks"""
+    if not request_profiler.authorized(request):
+        return jsonify({'success': False, 'error': 'Profiler token required'}), 403
+    if fmt == 'pstats':
+        path = request_profiler.pstats_path(profile_id)
+        if path is None:
+            return jsonify({'success': False, 'error': 'Profile not found'}), 404
+        return send_from_directory(
+            os.path.abspath(os.path.dirname(path)), os.path.basename(path),
+            mimetype='application/octet-stream', as_attachment=True
+        )
+    folded = request_profiler.collapsed(profile_id)
+    if folded is None:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    return Response(folded, mimetype='text/plain', headers={
+        'Content-Disposition': f'attachment; filename={profile_id}.folded'
+    })
+
 @app.route('/api/test_database')
 def test_database():
     """Test database connection and swimmer count"""
@@ -2112,4 +2572,7 @@ def test_database():
 # ============================================================================
 
 if __name__ == '__main__':
+    create_app()
+    services.plot_renderer.start()
+    services.email_outbox.start()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
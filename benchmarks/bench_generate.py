@@ -0,0 +1,86 @@
+"""
+Micro-benchmark for the /generate distance predictions.
+
+Compares per-request CPU time of the original per-distance loops against
+modules.interval_engine.predict_distance_times.
+
+Usage: python benchmarks/bench_generate.py [--requests 2000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.time_utils import parse_time_input, format_time, adjust_time_for_practice
+from modules.swimmer_analysis import calculate_velocities, determine_swimmer_style
+from modules.interval_calculator import calculate_base_time
+from modules.interval_engine import DISTANCES, predict_distance_times
+
+SAMPLE_TIMES = {'t50': '23.45', 't100': '51.20', 't200': '1:52.80', 't500': '5:05.10'}
+
+
+def legacy_predictions(times, velocities, swimmer_style, goal_percentage):
+    """The loop /generate used before the vectorized engine"""
+    distances = DISTANCES.tolist()
+    model_predictions = {}
+    practice_predictions = {}
+
+    for distance in distances:
+        base_time = calculate_base_time(distance, times, velocities, swimmer_style)
+
+        if base_time > 0:
+            distance_key = f"{distance} yards"
+            model_predictions[distance_key] = format_time(base_time)
+            practice_time = adjust_time_for_practice(base_time, distance)
+            practice_predictions[distance_key] = format_time(practice_time)
+
+    goal_predictions = {}
+
+    for distance in distances:
+        base_time = calculate_base_time(distance, times, velocities, swimmer_style)
+
+        if base_time > 0:
+            goal_time = base_time * (1 - goal_percentage/100)
+            distance_key = f"{distance} yards"
+            goal_predictions[distance_key] = format_time(goal_time)
+
+    return {'model': model_predictions, 'practice': practice_predictions, 'goal': goal_predictions}
+
+
+def cpu_time_per_request(func, args, requests):
+    """Average CPU seconds per call"""
+    func(*args)  # warm up
+    start = time.process_time()
+    for _ in range(requests):
+        func(*args)
+    return (time.process_time() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--goal-percentage', type=float, default=2.0)
+    args = parser.parse_args()
+
+    times = {key: parse_time_input(value) for key, value in SAMPLE_TIMES.items()}
+    velocities = calculate_velocities(times)
+    swimmer_style, _ = determine_swimmer_style(velocities)
+    call_args = (times, velocities, swimmer_style, args.goal_percentage)
+
+    if legacy_predictions(*call_args) != predict_distance_times(*call_args):
+        print("WARNING: vectorized predictions differ from the legacy loop")
+
+    legacy = cpu_time_per_request(legacy_predictions, call_args, args.requests)
+    vectorized = cpu_time_per_request(predict_distance_times, call_args, args.requests)
+
+    print(f"Swimmer style: {swimmer_style}, {len(DISTANCES)} distances, {args.requests} requests")
+    print(f"  legacy loop:  {legacy * 1e6:9.1f} µs CPU/request")
+    print(f"  vectorized:   {vectorized * 1e6:9.1f} µs CPU/request")
+    print(f"  speedup:      {legacy / vectorized:9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
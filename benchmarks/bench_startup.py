@@ -0,0 +1,132 @@
+"""
+Startup-time benchmark for the Flask app.
+
+Measures, in fresh interpreters, how long `import app` takes (via
+python -X importtime), how long create_app() takes afterwards, and which
+imports dominate. With --record the run is appended to
+benchmarks/results/startup.jsonl so cold start can be tracked over time;
+each run is compared with the last recorded one.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--top 15] [--record]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'results', 'startup.jsonl')
+
+CREATE_APP_SNIPPET = (
+    "import time; start = time.perf_counter(); import {module}; imported = time.perf_counter(); "
+    "getattr({module}, 'create_app', lambda: None)(); "
+    "print((imported - start) * 1000, (time.perf_counter() - imported) * 1000)"
+)
+
+
+def parse_importtime(stderr):
+    """{module: cumulative µs} for every import reported by -X importtime"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        try:
+            _, self_us, cumulative_us, name = (part.strip() for part in line.replace('import time:', '|', 1).split('|'))
+            cumulative[name] = int(cumulative_us)
+        except ValueError:
+            continue
+    return cumulative
+
+
+def top_level_packages(cumulative, count):
+    """Largest first-level packages by cumulative import time"""
+    packages = {}
+    for name, micros in cumulative.items():
+        root = name.split('.')[0]
+        packages[root] = max(packages.get(root, 0), micros)
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def run_once(module):
+    """One cold start: (import ms, create_app ms, wall ms, importtime data)"""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CREATE_APP_SNIPPET.format(module=module)],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        errors = [line for line in completed.stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError('\n'.join(errors[-10:]))
+    import_ms, create_app_ms = (float(value) for value in completed.stdout.split()[-2:])
+    return import_ms, create_app_ms, wall_ms, parse_importtime(completed.stderr)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def last_record():
+    if not os.path.exists(HISTORY_PATH):
+        return None
+    with open(HISTORY_PATH, 'r') as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--module', default='app', help='module to import (default: app)')
+    parser.add_argument('--record', action='store_true', help=f'append the result to {os.path.relpath(HISTORY_PATH, REPO_ROOT)}')
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.runs)]
+    import_ms = statistics.median(run[0] for run in runs)
+    create_app_ms = statistics.median(run[1] for run in runs)
+    wall_ms = statistics.median(run[2] for run in runs)
+    packages = top_level_packages(runs[-1][3], args.top)
+
+    print(f"Cold start of '{args.module}' over {args.runs} runs (median)")
+    print(f"  import:        {import_ms:9.1f} ms")
+    print(f"  create_app():  {create_app_ms:9.1f} ms")
+    print(f"  interpreter:   {wall_ms:9.1f} ms wall")
+    print("Slowest imports (cumulative):")
+    for name, micros in packages:
+        print(f"  {name:30s} {micros / 1000:9.1f} ms")
+
+    previous = last_record()
+    if previous and previous.get('module') == args.module:
+        print(f"Compared with {previous['revision'] or 'previous run'} ({previous['date']}):")
+        print(f"  import:        {import_ms - previous['import_ms']:+9.1f} ms")
+        print(f"  create_app():  {create_app_ms - previous['create_app_ms']:+9.1f} ms")
+
+    if args.record:
+        os.makedirs(os.path.dirname(HISTORY_PATH), exist_ok=True)
+        with open(HISTORY_PATH, 'a') as f:
+            f.write(json.dumps({
+                'date': datetime.now().isoformat(timespec='seconds'),
+                'revision': git_revision(),
+                'module': args.module,
+                'runs': args.runs,
+                'import_ms': round(import_ms, 1),
+                'create_app_ms': round(create_app_ms, 1),
+                'wall_ms': round(wall_ms, 1),
+                'top_imports_ms': {name: round(micros / 1000, 1) for name, micros in packages}
+            }) + '\n')
+        print(f"Recorded in {os.path.relpath(HISTORY_PATH, REPO_ROOT)}")
+
+
+if __name__ == '__main__':
+    main()
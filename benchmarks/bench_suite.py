@@ -0,0 +1,282 @@
+"""
+Benchmark suite for the app's hot paths.
+
+Runs offline against a temporary copy of swimmers.db and
+swimming_team_workouts.db and the saved SwimCloud HTML fixtures. Requests
+go through Flask's test client, so routing, hooks and JSON encoding are
+included. Swimmer times and heart rates are jittered per iteration so the
+result caches don't turn the run into a cache benchmark.
+
+Each scenario reports throughput and p50/p99 latency and is compared with
+benchmarks/baseline.json; a p50 or p99 more than --tolerance slower than
+the baseline is a regression and makes the run exit with status 1.
+
+Usage: python benchmarks/bench_suite.py [--iterations 200] [--only generate,color_system]
+                                        [--save-baseline] [--tolerance 0.25]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'baseline.json')
+DATABASES = ('swimmers.db', 'swimming_team_workouts.db')
+SEARCH_FIXTURE = os.path.join(REPO_ROOT, 'swimcloud_search_results.html')
+PROFILE_FIXTURE = os.path.join(REPO_ROOT, 'debug_swimcloud_page.html')
+
+# Parse methods looked up on SwimCloudScraper for the HTML fixtures
+SEARCH_PARSERS = ('parse_search_results', '_parse_search_results')
+PROFILE_PARSERS = ('parse_swimmer_times', '_parse_swimmer_times', '_parse_times_from_html', '_extract_times_from_html')
+
+
+class Skip(Exception):
+    """A scenario can't run in this tree"""
+
+
+def check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+# ----------------------------------------------------------------------
+# Scenarios: each takes (client, context) and returns a zero-argument callable
+# ----------------------------------------------------------------------
+
+def scenario_generate(client, context):
+    rng = random.Random(1)
+
+    def run():
+        base = rng.uniform(24.0, 30.0)
+        check(client.post('/generate', json={
+            't50': f"{base:.2f}", 't100': f"{base * 2.15:.2f}",
+            't200': f"{base * 4.6:.2f}", 't500': f"{base * 12.4:.2f}",
+            'goal_percentage': 2.0, 'num_reps': 3
+        }))
+    return run
+
+
+def scenario_color_system(client, context):
+    rng = random.Random(2)
+
+    def run():
+        check(client.post('/calculate_color_system', json={
+            'test_type': '200_test', 'minutes': 2, 'seconds': round(rng.uniform(0, 40), 1), 'drag_suit': False
+        }))
+    return run
+
+
+def _pulse_payload(rng, mode):
+    # No swimmer_id: every request saves a test, and saving them under a real
+    # swimmer would grow the history the pulse_history scenario reads
+    return {
+        'swimmer_name': 'Benchmark Swimmer',
+        'test_date': f"2099-01-{rng.randint(1, 28):02d}",
+        'stroke': 'freestyle',
+        'mode': mode,
+        'swim_times': [round(80 - 2.5 * i + rng.uniform(-0.5, 0.5), 2) for i in range(8)],
+        'hr_10s': [18 + i + rng.randint(0, 2) for i in range(8)],
+        'hr_30s': [16 + i + rng.randint(0, 2) for i in range(8)],
+        'hr_60s': [13 + i + rng.randint(0, 2) for i in range(8)]
+    }
+
+
+def scenario_pulse_plot(client, context):
+    rng = random.Random(3)
+    return lambda: check(client.post('/api/generate_pulse_plot', json=_pulse_payload(rng, 'image')))
+
+
+def scenario_pulse_plot_json(client, context):
+    rng = random.Random(4)
+    return lambda: check(client.post('/api/generate_pulse_plot', json=_pulse_payload(rng, 'json')))
+
+
+def scenario_best_times(client, context):
+    return lambda: check(client.get(f"/swimmer/{context['swimmer_id']}/best_times"))
+
+
+def scenario_pulse_history(client, context):
+    return lambda: check(client.get(f"/api/athlete_pulse_history/{context['swimmer_id']}"))
+
+
+def _fixture_parser(names, fixture):
+    from modules.swimcloud_scraper import SwimCloudScraper
+    scraper = SwimCloudScraper()
+    for name in names:
+        parser = getattr(scraper, name, None)
+        if callable(parser):
+            with open(fixture, 'r', encoding='utf-8', errors='replace') as f:
+                html = f.read()
+            return lambda: parser(html)
+    raise Skip(f"SwimCloudScraper has none of {', '.join(names)}")
+
+
+def scenario_scrape_parse_search(client, context):
+    return _fixture_parser(SEARCH_PARSERS, SEARCH_FIXTURE)
+
+
+def scenario_scrape_parse_profile(client, context):
+    return _fixture_parser(PROFILE_PARSERS, PROFILE_FIXTURE)
+
+
+def scenario_save_swimmer_times(client, context):
+    from modules.database import get_connection, save_swimmer_times
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT event, time_string, meet_name, meet_date, course, time_seconds
+            FROM swimmer_times WHERE swimmer_id = ?
+        ''', (context['swimmer_id'],))
+        times = [
+            {'event': row[0], 'time': row[1], 'meet': row[2], 'date': row[3], 'course': row[4], 'time_seconds': row[5]}
+            for row in cursor.fetchall()
+        ]
+    finally:
+        conn.close()
+    if not times:
+        raise Skip('no swimmer_times rows to replay')
+    return lambda: save_swimmer_times(context['swimmer_id'], times)
+
+
+SCENARIOS = {
+    'generate': scenario_generate,
+    'color_system': scenario_color_system,
+    'pulse_plot': scenario_pulse_plot,
+    'pulse_plot_json': scenario_pulse_plot_json,
+    'best_times': scenario_best_times,
+    'pulse_history': scenario_pulse_history,
+    'scrape_parse_search': scenario_scrape_parse_search,
+    'scrape_parse_profile': scenario_scrape_parse_profile,
+    'save_swimmer_times': scenario_save_swimmer_times,
+}
+
+
+# ----------------------------------------------------------------------
+# Runner
+# ----------------------------------------------------------------------
+
+def measure(func, iterations, warmup):
+    for _ in range(warmup):
+        func()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'throughput': round(iterations / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000, 3)
+    }
+
+
+def busiest_swimmer():
+    """The swimmer with the most stored times, used by the per-swimmer scenarios"""
+    from modules.database import get_connection
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT swimmer_id FROM swimmer_times GROUP BY swimmer_id ORDER BY COUNT(*) DESC LIMIT 1')
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute('SELECT id FROM swimmers ORDER BY id LIMIT 1')
+            row = cursor.fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else 1
+
+
+def compare(results, baseline, tolerance):
+    """Scenario names whose p50 or p99 regressed past the tolerance"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p99_ms'):
+            if result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name} {metric}: {previous[metric]:.3f} -> {result[metric]:.3f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--only', help='comma-separated scenario names')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before a regression (0.25 = 25%%)')
+    parser.add_argument('--save-baseline', action='store_true', help=f'write results to {os.path.relpath(BASELINE_PATH, REPO_ROOT)}')
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    # Work on copies of the databases so the benchmark never touches real data
+    workdir = tempfile.mkdtemp(prefix='swim-bench-')
+    for database in DATABASES:
+        if os.path.exists(os.path.join(REPO_ROOT, database)):
+            shutil.copy(os.path.join(REPO_ROOT, database), workdir)
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(workdir)
+    os.environ.setdefault('METRICS_ENABLED', '0')
+
+    try:
+        import app as app_module
+        client = app_module.create_app().test_client()
+        context = {'swimmer_id': busiest_swimmer()}
+
+        results = {}
+        print(f"{'scenario':24s} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+        for name in names:
+            try:
+                func = SCENARIOS[name](client, context)
+            except Skip as e:
+                print(f"{name:24s} skipped: {e}")
+                continue
+            result = measure(func, args.iterations, args.warmup)
+            results[name] = result
+            print(f"{name:24s} {result['throughput']:>9.1f} {result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f}")
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, 'r') as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {os.path.relpath(BASELINE_PATH, REPO_ROOT)}")
+        return
+
+    if not os.path.exists(BASELINE_PATH):
+        print("No baseline yet; run with --save-baseline to record one")
+        return
+    with open(BASELINE_PATH, 'r') as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print(f"Regressions (more than {args.tolerance:.0%} slower than baseline):")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"No regressions against baseline (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
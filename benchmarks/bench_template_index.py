@@ -0,0 +1,144 @@
+"""
+Template index benchmark.
+
+Generates a synthetic workout template library (10,000 templates by
+default) with the tag vocabulary of workout_templates, then times a set of
+typical recommendation queries through TemplateIndex against a linear scan
+with the same matching rules, and checks both return the same templates.
+
+Usage: python benchmarks/bench_template_index.py [--templates 10000] [--iterations 200]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from modules.template_index import ALL_GROUPS, TemplateIndex  # noqa: E402
+
+PHASES = ['Base Training', 'Preparation/Build-up', 'Specific Training', 'Race Preparation', 'Taper']
+FOCUSES = ['Aerobic Endurance', 'Volume', 'Technique', 'Stroke Development', 'Sprint Speed', 'Power',
+           'Threshold', 'Race Pace', 'Recovery', 'Kick']
+GROUPS = ['Senior Elite', 'Senior Development', 'Age Group 1', 'Age Group 2', 'Age Group 3', 'Age Group 4']
+EQUIPMENT = ['Fins', 'Kickboard', 'Pull buoy', 'Paddles', 'Snorkel', 'Parachute']
+STROKES = ['Freestyle', 'Backstroke', 'Breaststroke', 'Butterfly', 'IM', 'All']
+INTENSITIES = ['Low', 'Low-Moderate', 'Moderate', 'High', 'Max']
+
+QUERIES = {
+    'phase+focus': dict(phase='Base Training', focus=['Aerobic Endurance', 'Volume']),
+    'group+yardage': dict(group='Age Group 2', total_yardage=3000),
+    'phase+group+difficulty': dict(phase='Specific Training', group='Senior Elite', difficulty=(6, 8)),
+    'equipment+focus': dict(focus='Sprint Speed', equipment=['Fins', 'Kickboard']),
+    'full recommendation': dict(phase='Race Preparation', focus=['Race Pace', 'Sprint Speed'], group='Senior Elite',
+                                intensity='High', total_yardage=(3500, 4500), main_set_yardage=2000,
+                                difficulty=(5, 9), equipment=['Fins', 'Paddles']),
+}
+
+
+def synthetic_templates(count, seed):
+    rng = random.Random(seed)
+    templates = []
+    for number in range(count):
+        total_min = rng.randrange(1500, 6000, 250)
+        main_min = int(total_min * rng.uniform(0.4, 0.6)) // 100 * 100
+        templates.append({
+            'template_id': f'synthetic_{number:05d}',
+            'name': f'Synthetic Template {number}',
+            'total_yardage_min': total_min,
+            'total_yardage_max': total_min + rng.randrange(500, 2000, 250),
+            'main_set_yardage_min': main_min,
+            'main_set_yardage_max': main_min + rng.randrange(250, 1500, 250),
+            'difficulty_level': rng.randint(1, 10),
+            'tags': {
+                'phase': rng.sample(PHASES, rng.randint(1, 2)),
+                'focus': rng.sample(FOCUSES, rng.randint(1, 3)),
+                'groups': [ALL_GROUPS] if rng.random() < 0.1 else rng.sample(GROUPS, rng.randint(1, 3)),
+                'equipment': rng.sample(EQUIPMENT, rng.choice([0, 0, 1, 2])),
+                'stroke_focus': rng.sample(STROKES, rng.randint(1, 2)),
+                'intensity': rng.choice(INTENSITIES)
+            }
+        })
+    return templates
+
+
+def scan_query(templates, phase=None, focus=None, group=None, intensity=None, stroke_focus=None,
+               equipment=None, total_yardage=None, main_set_yardage=None, difficulty=None):
+    """The linear scan a recommendation engine would do without the index"""
+    def any_of(template, category, values):
+        tagged = template['tags'].get(category) or []
+        tagged = tagged if isinstance(tagged, list) else [tagged]
+        values = values if isinstance(values, (list, tuple, set)) else [values]
+        return any(value in tagged for value in values)
+
+    def overlaps(low, high, value):
+        query_low, query_high = value if isinstance(value, (list, tuple)) else (value, value)
+        return low <= query_high and high >= query_low
+
+    matches = []
+    for template in templates:
+        if phase is not None and not any_of(template, 'phase', phase):
+            continue
+        if focus is not None and not any_of(template, 'focus', focus):
+            continue
+        if intensity is not None and not any_of(template, 'intensity', intensity):
+            continue
+        if stroke_focus is not None and not any_of(template, 'stroke_focus', stroke_focus):
+            continue
+        if group is not None and not any_of(template, 'groups', [group, ALL_GROUPS]):
+            continue
+        if equipment is not None and not set(template['tags'].get('equipment') or []) <= set(equipment):
+            continue
+        if total_yardage is not None and not overlaps(template['total_yardage_min'], template['total_yardage_max'],
+                                                      total_yardage):
+            continue
+        if main_set_yardage is not None and not overlaps(template['main_set_yardage_min'],
+                                                         template['main_set_yardage_max'], main_set_yardage):
+            continue
+        if difficulty is not None and not overlaps(template['difficulty_level'], template['difficulty_level'],
+                                                   difficulty):
+            continue
+        matches.append(template)
+    return matches
+
+
+def timed(func, iterations):
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--templates', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    templates = synthetic_templates(args.templates, args.seed)
+    index = TemplateIndex(check_interval=float('inf'))
+    start = time.perf_counter()
+    index.load(templates)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"{args.templates} templates, index built in {build_ms:.1f} ms ({index.stats()['tag_keys']} tag keys)")
+    print(f"{'query':24s} {'matches':>8} {'scan us':>10} {'index us':>10} {'speedup':>8}")
+
+    for name, query in QUERIES.items():
+        expected = [t['template_id'] for t in scan_query(templates, **query)]
+        actual = [t['template_id'] for t in index.query(**query)]
+        if expected != actual:
+            sys.exit(f"{name}: index returned {len(actual)} templates, scan {len(expected)}")
+        scan = timed(lambda: scan_query(templates, **query), args.iterations)
+        indexed = timed(lambda: index.query(**query), args.iterations)
+        print(f"{name:24s} {len(actual):>8} {scan * 1e6:>10.1f} {indexed * 1e6:>10.1f} {scan / indexed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
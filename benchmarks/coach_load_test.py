@@ -0,0 +1,251 @@
+"""
+Coach load test against synthetic large-team data.
+
+Serves the databases written by benchmarks/synthetic_data.py with gunicorn
+(or targets a running server with --url) and replays a realistic mix of
+coach page loads: virtual coaches log in to a random synthetic team and
+open the team dashboard, group pages, athlete pages, trend charts and the
+set generator with think time between pages.
+
+The client count is ramped through --stages; for every stage each endpoint
+reports its p50/p95 latency. An endpoint degrades at the first stage where
+its p95 exceeds --degrade-factor times its p95 at the first stage, and the
+summary lists where that happens so the slowest-scaling pages stand out.
+
+Usage: python benchmarks/coach_load_test.py [--data-dir synthetic_data]
+                                            [--stages 1,4,16,32] [--duration 20]
+                                            [--workers 2] [--threads 4] [--url http://host:port]
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from load_test import REPO_ROOT, free_port, generate_payload, percentile, start_server, stop_server  # noqa: E402
+
+TEAM_PASSWORD = 'synthetic'
+
+# Coach pages: (name, weight, requests); each request is (endpoint label, method, path template)
+PAGES = [
+    ('dashboard', 20, [
+        ('team_training_groups', 'GET', '/api/team_training_groups'),
+        ('team_coaches', 'GET', '/api/team_coaches'),
+    ]),
+    ('group', 25, [
+        ('training_group', 'GET', '/api/training_group/{group_id}'),
+        ('training_group_athletes', 'GET', '/api/training_group_athletes/{group_id}'),
+    ]),
+    ('athlete', 30, [
+        ('swimmer', 'GET', '/api/swimmer/{swimmer_id}'),
+        ('best_times', 'GET', '/swimmer/{swimmer_id}/best_times'),
+        ('athlete_pulse_history', 'GET', '/api/athlete_pulse_history/{swimmer_id}'),
+    ]),
+    ('group_trends', 10, [
+        ('pulse_plot_trends_group', 'GET', '/api/pulse_plot_trends/group/{group_id}'),
+        ('team_pace_chart', 'GET', '/api/team_pace_chart/{group_id}'),
+    ]),
+    ('generator', 15, [
+        ('generate', 'POST', '/generate'),
+    ]),
+]
+
+
+def load_teams(swimmers_db):
+    """{team_code: {group_id: [swimmer_id, ...]}} for the synthetic teams"""
+    conn = sqlite3.connect(swimmers_db)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT t.team_code, s.training_group_id, s.id
+            FROM swimmers s JOIN teams t ON t.id = s.team_id
+            WHERE t.access_password = ? AND s.training_group_id IS NOT NULL
+        ''', (TEAM_PASSWORD,))
+        teams = {}
+        for team_code, group_id, swimmer_id in cursor.fetchall():
+            teams.setdefault(team_code, {}).setdefault(group_id, []).append(swimmer_id)
+    finally:
+        conn.close()
+    return teams
+
+
+class Coach:
+    """One virtual coach: a keep-alive connection and a team session cookie"""
+
+    def __init__(self, host, port, teams, seed):
+        self.host = host
+        self.port = port
+        self.rng = random.Random(seed)
+        self.team_code = self.rng.choice(sorted(teams))
+        self.groups = teams[self.team_code]
+        self.cookie = None
+        self.conn = http.client.HTTPConnection(host, port, timeout=60)
+
+    def request(self, method, path, body=None):
+        headers = {'Content-Type': 'application/json'}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        try:
+            self.conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            raise
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        return response.status
+
+    def login(self):
+        status = self.request('POST', '/api/team_login', {'team_code': self.team_code, 'password': TEAM_PASSWORD})
+        if status != 200:
+            raise RuntimeError(f"login for {self.team_code} failed with HTTP {status}")
+
+    def page(self):
+        """A random page's requests with their paths and bodies filled in"""
+        _, _, requests = self.rng.choices(PAGES, weights=[page[1] for page in PAGES])[0]
+        group_id = self.rng.choice(sorted(self.groups))
+        swimmer_id = self.rng.choice(self.groups[group_id])
+        for label, method, template in requests:
+            body = generate_payload(self.rng, False) if method == 'POST' else None
+            yield label, method, template.format(group_id=group_id, swimmer_id=swimmer_id), body
+
+    def close(self):
+        self.conn.close()
+
+
+def coach_loop(coach, deadline, think_time, results, errors):
+    try:
+        coach.login()
+    except (OSError, http.client.HTTPException, RuntimeError) as e:
+        errors.append(('team_login', str(e)))
+        return
+    while time.monotonic() < deadline:
+        for label, method, path, body in coach.page():
+            start = time.perf_counter()
+            try:
+                status = coach.request(method, path, body)
+            except (OSError, http.client.HTTPException) as e:
+                errors.append((label, type(e).__name__))
+                continue
+            if status >= 400:
+                errors.append((label, status))
+                continue
+            results.setdefault(label, []).append(time.perf_counter() - start)
+        if think_time:
+            time.sleep(coach.rng.uniform(0, 2 * think_time))
+    coach.close()
+
+
+def run_stage(host, port, teams, clients, duration, think_time, seed):
+    """({endpoint: sorted latencies}, errors, requests/second) for one stage"""
+    results, errors = {}, []
+    deadline = time.monotonic() + duration
+    coaches = [Coach(host, port, teams, seed * 1000 + index) for index in range(clients)]
+    threads = [
+        threading.Thread(target=coach_loop, args=(coach, deadline, think_time, results, errors))
+        for coach in coaches
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    total = sum(len(latencies) for latencies in results.values())
+    return {label: sorted(latencies) for label, latencies in results.items()}, errors, total / elapsed
+
+
+def report(stages, degrade_factor):
+    labels = sorted({label for _, results, _, _ in stages for label in results})
+    print()
+    print(f"{'endpoint':26s}" + ''.join(f" {f'{clients} clients':>17}" for clients, _, _, _ in stages))
+    print(f"{'':26s}" + ''.join(f" {'p50':>8} {'p95':>8}" for _ in stages))
+    for label in labels:
+        cells = []
+        for _, results, _, _ in stages:
+            latencies = results.get(label, [])
+            cells.append(f" {percentile(latencies, 0.50) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f}")
+        print(f"{label:26s}" + ''.join(cells))
+    print(f"{'requests/s':26s}" + ''.join(f" {throughput:>17.1f}" for _, _, throughput, _ in stages))
+    print(f"{'errors':26s}" + ''.join(f" {len(errors):>17}" for _, _, _, errors in stages))
+
+    print()
+    print(f"Degradation (p95 above {degrade_factor:g}x its {stages[0][0]}-client p95):")
+    degraded = []
+    for label in labels:
+        baseline = percentile(stages[0][1].get(label, []), 0.95)
+        for clients, results, _, _ in stages[1:]:
+            p95 = percentile(results.get(label, []), 0.95)
+            if not math.isnan(baseline) and p95 > baseline * degrade_factor:
+                degraded.append((clients, -p95 / baseline, label, baseline, p95))
+                break
+    if not degraded:
+        print("  none")
+    for clients, _, label, baseline, p95 in sorted(degraded):
+        print(f"  {label:26s} at {clients:>3} clients: p95 {baseline * 1000:.1f} -> {p95 * 1000:.1f} ms")
+
+    for clients, _, _, errors in stages:
+        for label, error in sorted(set(errors), key=str)[:5]:
+            print(f"  {clients} clients: {label} failed with {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default=os.path.join(REPO_ROOT, 'synthetic_data'),
+                        help='directory with the synthetic swimmers.db and swimming_team_workouts.db')
+    parser.add_argument('--stages', default='1,4,16,32', help='comma-separated concurrent coach counts')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds per stage')
+    parser.add_argument('--think-time', type=float, default=0.0, help='mean seconds between page loads')
+    parser.add_argument('--degrade-factor', type=float, default=2.0)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--url', help='target a running server instead of starting gunicorn')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    swimmers_db = os.path.join(args.data_dir, 'swimmers.db')
+    if not os.path.exists(swimmers_db):
+        sys.exit(f"{swimmers_db} not found; run benchmarks/synthetic_data.py first")
+    teams = load_teams(swimmers_db)
+    if not teams:
+        sys.exit(f"no synthetic teams in {swimmers_db}")
+    stage_clients = [int(count) for count in args.stages.split(',')]
+
+    server = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        host, port = '127.0.0.1', free_port()
+        server = start_server(args.workers, args.threads, port, cwd=os.path.abspath(args.data_dir))
+    print(f"{len(teams)} teams, {sum(len(groups) for groups in teams.values())} groups; "
+          f"stages {args.stages} x {args.duration:.0f}s against {host}:{port}")
+
+    stages = []
+    try:
+        run_stage(host, port, teams, stage_clients[0], min(3.0, args.duration), args.think_time, 0)  # warm up
+        for index, clients in enumerate(stage_clients, 1):
+            results, errors, throughput = run_stage(host, port, teams, clients, args.duration, args.think_time,
+                                                    args.seed + index)
+            stages.append((clients, results, throughput, errors))
+            print(f"  {clients:>3} clients: {throughput:.1f} requests/s, {len(errors)} errors")
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    report(stages, args.degrade_factor)
+
+
+if __name__ == '__main__':
+    main()
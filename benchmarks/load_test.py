@@ -0,0 +1,166 @@
+"""
+Load test for the production server.
+
+Starts gunicorn (with gunicorn.conf.py) at each requested worker count,
+drives it with concurrent keep-alive clients for a fixed duration and
+reports throughput and latency percentiles, so scaling with worker count
+can be checked.
+
+Requests POST /generate with swimmer times jittered per request, so the
+result cache doesn't turn the run into a cache benchmark (use --cached to
+repeat one payload instead).
+
+Usage: python benchmarks/load_test.py [--workers 1,2,4] [--threads 4]
+                                      [--clients 16] [--duration 15]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def generate_payload(rng, cached):
+    """A /generate request body around a 50 free in 24-30 seconds"""
+    base = 27.0 if cached else rng.uniform(24.0, 30.0)
+    return {
+        't50': f"{base:.2f}",
+        't100': f"{base * 2.15:.2f}",
+        't200': f"{base * 4.6:.2f}",
+        't500': f"{base * 12.4:.2f}",
+        'goal_percentage': 2.0,
+        'num_reps': 3
+    }
+
+
+def start_server(workers, threads, port, app_module=None, cwd=None):
+    """Start gunicorn; cwd is the directory holding the databases (the repo by default)"""
+    command = [
+        sys.executable, '-m', 'gunicorn', '-c', os.path.join(REPO_ROOT, 'gunicorn.conf.py'),
+        '--workers', str(workers), '--threads', str(threads), '--bind', f'127.0.0.1:{port}',
+        '--max-requests', '0'
+    ]
+    if cwd:
+        command += ['--pythonpath', REPO_ROOT]
+    if app_module:
+        command.append(app_module)
+    server = subprocess.Popen(command, cwd=cwd or REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited:\n{server.stderr.read().decode()[-2000:]}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                # Give every worker a moment to finish booting
+                time.sleep(0.5 + 0.2 * workers)
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('gunicorn did not start within 60 seconds')
+
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def client_loop(port, path, deadline, cached, seed, latencies, errors):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while time.monotonic() < deadline:
+        body = json.dumps(generate_payload(rng, cached))
+        start = time.perf_counter()
+        try:
+            conn.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def run_load(port, path, clients, duration, cached):
+    """(requests/second, sorted latencies, error count) for one run"""
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=client_loop, args=(port, path, deadline, cached, seed, latencies, errors))
+        for seed in range(clients)
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    return len(latencies) / elapsed, sorted(latencies), len(errors)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker counts')
+    parser.add_argument('--threads', type=int, default=4, help='threads per worker')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client connections')
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per run')
+    parser.add_argument('--path', default='/generate')
+    parser.add_argument('--cached', action='store_true', help='repeat one payload (measures cache hits)')
+    parser.add_argument('--app', default=None, help='WSGI app to serve instead of app:create_app()')
+    args = parser.parse_args()
+
+    worker_counts = [int(count) for count in args.workers.split(',')]
+    print(f"POST {args.path}, {args.clients} clients, {args.threads} threads/worker, {args.duration:.0f}s per run")
+    print(f"{'workers':>7} {'req/s':>9} {'scaling':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+
+    baseline = None
+    for workers in worker_counts:
+        port = free_port()
+        server = start_server(workers, args.threads, port, args.app)
+        try:
+            run_load(port, args.path, args.clients, min(2.0, args.duration), args.cached)  # warm up
+            throughput, latencies, errors = run_load(port, args.path, args.clients, args.duration, args.cached)
+        finally:
+            stop_server(server)
+
+        baseline = baseline or throughput
+        print(
+            f"{workers:>7} {throughput:>9.1f} {throughput / baseline:>7.2f}x "
+            f"{percentile(latencies, 0.50) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f} "
+            f"{percentile(latencies, 0.99) * 1000:>8.1f} {errors:>7}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,409 @@
+"""
+Synthetic large-team data generator.
+
+Fills copies of swimmers.db and swimming_team_workouts.db with realistic
+synthetic teams: training groups and coaches per team, swimmers with
+ability-driven times across the individual SCY and LCM events, meet
+results that improve over the seasons (swimmer_times, with best_times
+derived from them), Salo pulse plot tests, and a daily calendar of workout
+assignments per group.
+
+Rows are generated with NumPy in chunks of swimmers and inserted with
+executemany, so millions of swimmer_times stay within memory.
+
+    python benchmarks/synthetic_data.py --teams 200 --swimmers-per-team 100 \\
+        --results-per-swimmer 100 --out-dir synthetic_data
+
+writes synthetic_data/swimmers.db and synthetic_data/swimming_team_workouts.db
+(the seed data plus the synthetic rows). --in-place writes into the repo's
+databases instead, after saving .bak copies. Synthetic teams use the codes
+SYN0001, SYN0002, ... with the access password "synthetic".
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SWIMMERS_DB = 'swimmers.db'
+WORKOUTS_DB = 'swimming_team_workouts.db'
+
+TEAM_PASSWORD = 'synthetic'
+GROUP_NAMES = ('Senior Elite', 'Senior 1', 'Senior 2', 'Age Group 1', 'Age Group 2', 'Age Group 3', 'Development')
+GROUP_LEVELS = ('Elite', 'Advanced', 'Advanced', 'Intermediate', 'Intermediate', 'Beginner', 'Beginner')
+
+FIRST_NAMES = (
+    'Ava', 'Ben', 'Caleb', 'Chloe', 'Daniel', 'Ella', 'Ethan', 'Grace', 'Hannah', 'Isaac', 'Jack', 'Julia',
+    'Kate', 'Liam', 'Lucy', 'Mason', 'Mia', 'Noah', 'Olivia', 'Owen', 'Riley', 'Ryan', 'Sophia', 'Zoe'
+)
+LAST_NAMES = (
+    'Adams', 'Baker', 'Brooks', 'Carter', 'Davis', 'Evans', 'Foster', 'Garcia', 'Hughes', 'Jones', 'Kim',
+    'Lopez', 'Miller', 'Nguyen', 'Parker', 'Reed', 'Smith', 'Turner', 'Walker', 'Young'
+)
+STYLES = ('Sprinter', 'Mid-Distance', 'Distance')
+GRADES = ('7th', '8th', '9th', '10th', '11th', '12th')
+MEETS = ('Winter Invitational', 'Sectionals', 'Age Group Champs', 'Dual Meet', 'Senior Champs', 'Spring Open', 'Summer Long Course')
+
+# (event name as stored in swimmer_times, course letter, distance, stroke factor vs freestyle)
+STROKE_FACTORS = {'Free': 1.0, 'Back': 1.10, 'Breast': 1.24, 'Fly': 1.07, 'IM': 1.12}
+EVENTS = [
+    (f"{distance} {course} {stroke}", course, distance, factor)
+    for course, distances in (
+        ('Y', {'Free': (50, 100, 200, 500, 1000, 1650), 'Back': (50, 100, 200), 'Breast': (50, 100, 200),
+               'Fly': (50, 100, 200), 'IM': (100, 200, 400)}),
+        ('L', {'Free': (50, 100, 200, 400, 800, 1500), 'Back': (50, 100, 200), 'Breast': (50, 100, 200),
+               'Fly': (50, 100, 200), 'IM': (200, 400)}),
+    )
+    for stroke, stroke_distances in distances.items()
+    for distance in stroke_distances
+    for factor in (STROKE_FACTORS[stroke],)
+]
+EVENT_NAMES = np.array([event[0] for event in EVENTS])
+EVENT_COURSES = np.array([event[1] for event in EVENTS])
+EVENT_DISTANCES = np.array([event[2] for event in EVENTS], dtype=float)
+EVENT_FACTORS = np.array([event[3] for event in EVENTS])
+EVENT_INDEX = {event[0]: index for index, event in enumerate(EVENTS)}
+
+# Long course meters are slower than short course yards for the same number
+LCM_FACTOR = 1.11
+# Riegel fatigue exponent
+FATIGUE_EXPONENT = 1.07
+# Yearly improvement (fraction of time) and per-swim noise
+YEARLY_IMPROVEMENT = 0.02
+SWIM_NOISE = 0.012
+
+
+def format_swim_time(seconds):
+    minutes, rest = divmod(seconds, 60)
+    return f"{int(minutes)}:{rest:05.2f}" if minutes else f"{rest:.2f}"
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA synchronous=OFF')
+    return conn
+
+
+def next_id(cursor, table, column='id'):
+    cursor.execute(f'SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}')
+    return cursor.fetchone()[0]
+
+
+def ensure_pulse_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pulse_plot_tests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            swimmer_id INTEGER,
+            test_date TEXT,
+            stroke TEXT,
+            swim_times TEXT,
+            hr_10s TEXT,
+            hr_30s TEXT,
+            hr_60s TEXT,
+            swim_speeds TEXT,
+            sum_heart_rates TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (swimmer_id) REFERENCES swimmers (id)
+        )
+    ''')
+
+
+# ----------------------------------------------------------------------
+# Teams, groups and coaches
+# ----------------------------------------------------------------------
+
+def generate_teams(conn, rng, args):
+    """Insert teams, training groups and coaches; returns [(team_id, team_name, [group_id, ...])]"""
+    cursor = conn.cursor()
+    team_id = next_id(cursor, 'teams')
+    group_id = next_id(cursor, 'training_groups')
+    coach_id = next_id(cursor, 'coaches')
+
+    teams, team_rows, group_rows, coach_rows = [], [], [], []
+    for index in range(args.teams):
+        name = f"Synthetic Aquatics {index + 1:04d}"
+        team_rows.append((team_id, name, f"SYN{index + 1:04d}", TEAM_PASSWORD, f"Head Coach {index + 1}",
+                          f"coach{index + 1}@synthetic.example"))
+        groups = []
+        for group_index in range(args.groups_per_team):
+            coach_name = f"Coach {rng.choice(LAST_NAMES)} {index + 1}-{group_index + 1}"
+            group_rows.append((group_id, team_id, GROUP_NAMES[group_index % len(GROUP_NAMES)]
+                               + ('' if group_index < len(GROUP_NAMES) else f' {group_index // len(GROUP_NAMES) + 1}'),
+                               f"Synthetic group {group_index + 1}", coach_name, '',
+                               GROUP_LEVELS[group_index % len(GROUP_LEVELS)]))
+            coach_rows.append((coach_id, coach_name, team_id, f"coach{coach_id}@synthetic.example", ''))
+            groups.append(group_id)
+            group_id += 1
+            coach_id += 1
+        teams.append((team_id, name, groups))
+        team_id += 1
+
+    cursor.executemany('''
+        INSERT INTO teams (id, team_name, team_code, access_password, coach_name, contact_email)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', team_rows)
+    cursor.executemany('''
+        INSERT INTO training_groups (id, team_id, group_name, group_description, coach_name, age_range, skill_level)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', group_rows)
+    cursor.executemany('INSERT INTO coaches (id, name, team_id, email, phone) VALUES (?, ?, ?, ?, ?)', coach_rows)
+    conn.commit()
+    return teams
+
+
+# ----------------------------------------------------------------------
+# Swimmers, results and pulse tests
+# ----------------------------------------------------------------------
+
+def swimmer_chunk(rng, first_id, assignments, args, season_start):
+    """Rows for one chunk of swimmers: (swimmers, swimmer_times, best_times, pulse_tests)"""
+    count = len(assignments)
+    ids = np.arange(first_id, first_id + count)
+    # SCY 100 free ability in seconds, faster in the higher groups
+    group_rank = np.array([rank for _, _, _, rank in assignments], dtype=float)
+    free_100 = rng.normal(52.0 + 3.0 * group_rank, 3.0, count).clip(44.0, 95.0)
+    # Per-swimmer stroke strengths around the population factors
+    stroke_skill = rng.normal(1.0, 0.03, (count, len(EVENTS)))
+    style_index = rng.integers(0, len(STYLES), count)
+
+    base = (
+        free_100[:, None] * (EVENT_DISTANCES[None, :] / 100.0) ** FATIGUE_EXPONENT
+        * EVENT_FACTORS[None, :] * stroke_skill
+        * np.where(EVENT_COURSES == 'L', LCM_FACTOR, 1.0)[None, :]
+    )
+
+    # Each swimmer races a subset of events, several times each across the seasons
+    results_per_swimmer = args.results_per_swimmer
+    event_choice = rng.integers(0, len(EVENTS), (count, results_per_swimmer))
+    # Swim dates spread over the history, with improvement over time
+    days_ago = rng.integers(0, 365 * args.history_years, (count, results_per_swimmer))
+    years_ago = days_ago / 365.0
+    swim_seconds = (
+        np.take_along_axis(base, event_choice, axis=1)
+        * (1 + YEARLY_IMPROVEMENT * years_ago)
+        * rng.normal(1.0, SWIM_NOISE, (count, results_per_swimmer))
+    ).round(2)
+    meet_choice = rng.integers(0, len(MEETS), (count, results_per_swimmer))
+
+    scraped = season_start.isoformat()
+    swimmers, times, best = [], [], []
+    for row in range(count):
+        team_id, team_name, group_id, _ = assignments[row]
+        first = FIRST_NAMES[rng.integers(len(FIRST_NAMES))]
+        last = LAST_NAMES[rng.integers(len(LAST_NAMES))]
+        name = f"{first} {last} {ids[row]}"
+        bests = {}
+        for column in range(results_per_swimmer):
+            event = int(event_choice[row, column])
+            seconds = float(swim_seconds[row, column])
+            meet_date = (season_start - timedelta(days=int(days_ago[row, column]))).strftime('%b %d, %Y')
+            record = (
+                int(ids[row]), EVENT_NAMES[event], seconds, format_swim_time(seconds),
+                MEETS[meet_choice[row, column]], meet_date, EVENT_COURSES[event], '', scraped, ''
+            )
+            times.append(record)
+            if EVENT_NAMES[event] not in bests or seconds < bests[EVENT_NAMES[event]][2]:
+                bests[EVENT_NAMES[event]] = record
+        best.extend(bests.values())
+
+        def best_free(distance):
+            record = bests.get(f"{distance} Y Free")
+            return record[3] if record else format_swim_time(float(base[row, EVENT_INDEX[f"{distance} Y Free"]]))
+
+        swimmers.append((
+            int(ids[row]), name, best_free(50), best_free(100), best_free(200), best_free(500),
+            team_name, GRADES[rng.integers(len(GRADES))], STYLES[style_index[row]],
+            f"{first.lower()}.{last.lower()}.{ids[row]}@synthetic.example", team_id, group_id
+        ))
+
+    pulse = []
+    for row in range(count):
+        for test in range(args.pulse_tests_per_swimmer):
+            test_date = season_start - timedelta(days=30 * (args.pulse_tests_per_swimmer - test))
+            fitness = 1.0 - 0.01 * test
+            # 8 x 100 descending: faster swims with rising heart rate counts
+            swim_times_100 = (free_100[row] * 1.35 * np.linspace(1.18, 1.0, 8) * rng.normal(1.0, 0.01, 8)).round(1)
+            effort = np.linspace(0.0, 1.0, 8)
+            hr_10 = (rng.normal(22, 1.0) + 8 * effort * fitness + rng.normal(0, 0.7, 8)).round().astype(int)
+            hr_30 = (hr_10 - rng.normal(3, 0.5) - rng.integers(0, 2, 8)).round().astype(int)
+            hr_60 = (hr_30 - rng.normal(3, 0.5) - rng.integers(0, 2, 8)).round().astype(int)
+            speeds = (100.0 / swim_times_100).tolist()
+            pulse.append((
+                int(ids[row]), test_date.isoformat(), 'freestyle', json.dumps(swim_times_100.tolist()),
+                json.dumps(hr_10.tolist()), json.dumps(hr_30.tolist()), json.dumps(hr_60.tolist()),
+                json.dumps(speeds), json.dumps((hr_10 + hr_30 + hr_60).tolist())
+            ))
+
+    return swimmers, times, best, pulse
+
+
+def generate_swimmers(conn, rng, teams, args, season_start):
+    cursor = conn.cursor()
+    ensure_pulse_table(cursor)
+    first_id = next_id(cursor, 'swimmers')
+
+    assignments = []
+    for team_id, team_name, groups in teams:
+        for index in range(args.swimmers_per_team):
+            rank = index % len(groups)
+            assignments.append((team_id, team_name, groups[rank], rank))
+
+    totals = {'swimmers': 0, 'swimmer_times': 0, 'best_times': 0, 'pulse_plot_tests': 0}
+    for start in range(0, len(assignments), args.chunk_size):
+        chunk = assignments[start:start + args.chunk_size]
+        swimmers, times, best, pulse = swimmer_chunk(rng, first_id + start, chunk, args, season_start)
+        cursor.executemany('''
+            INSERT INTO swimmers (id, name, t50, t100, t200, t500, team, grade, style, email, team_id, training_group_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', swimmers)
+        cursor.executemany('''
+            INSERT INTO swimmer_times
+            (swimmer_id, event, time_seconds, time_string, meet_name, meet_date, course, standard, scraped_date, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', times)
+        cursor.executemany('''
+            INSERT INTO best_times
+            (swimmer_id, event, time_seconds, time_string, meet_name, meet_date, course, standard, last_updated, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', best)
+        cursor.executemany('''
+            INSERT INTO pulse_plot_tests
+            (swimmer_id, test_date, stroke, swim_times, hr_10s, hr_30s, hr_60s, swim_speeds, sum_heart_rates)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', pulse)
+        conn.commit()
+
+        totals['swimmers'] += len(swimmers)
+        totals['swimmer_times'] += len(times)
+        totals['best_times'] += len(best)
+        totals['pulse_plot_tests'] += len(pulse)
+        print(f"  swimmers {totals['swimmers']:>8}/{len(assignments)}  times {totals['swimmer_times']:>10}", end='\r')
+    print()
+    return totals
+
+
+# ----------------------------------------------------------------------
+# Workout calendar
+# ----------------------------------------------------------------------
+
+def generate_calendar(conn, rng, teams, args, season_start):
+    """One workout group per training group and a daily assignment for each"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT template_id FROM workout_templates')
+    templates = [row[0] for row in cursor.fetchall()]
+    cursor.execute('SELECT location_id FROM locations')
+    locations = [row[0] for row in cursor.fetchall()] or [None]
+    if not templates:
+        print("  no workout templates in the workouts database; skipping the calendar")
+        return {'groups': 0, 'calendar_assignments': 0}
+
+    group_id = next_id(cursor, 'groups', 'group_id')
+    season_id = next_id(cursor, 'seasons', 'season_id')
+    first_day = season_start - timedelta(days=args.calendar_days)
+    weeks = args.calendar_days // 7 + 1
+    cursor.execute('''
+        INSERT INTO seasons (season_id, name, start_date, num_weeks, description, is_active)
+        VALUES (?, ?, ?, ?, ?, 0)
+    ''', (season_id, 'Synthetic Season', f"{first_day.year}-{first_day.month}-{first_day.day}", weeks,
+          'Generated by benchmarks/synthetic_data.py'))
+
+    group_rows, assignment_rows = [], []
+    for team_id, team_name, groups in teams:
+        for rank, _ in enumerate(groups):
+            group_rows.append((group_id, f"{team_name} {GROUP_NAMES[rank % len(GROUP_NAMES)]}",
+                               f"Synthetic group for team {team_id}", GROUP_LEVELS[rank % len(GROUP_LEVELS)],
+                               6000 - 500 * rank))
+            template_picks = rng.integers(0, len(templates), args.calendar_days)
+            location_picks = rng.integers(0, len(locations), args.calendar_days)
+            for day in range(args.calendar_days):
+                if rng.random() < 0.15:
+                    continue  # rest day
+                assignment_rows.append((
+                    group_id, templates[template_picks[day]], (first_day + timedelta(days=day)).isoformat(),
+                    '', locations[location_picks[day]], season_id
+                ))
+            group_id += 1
+
+    cursor.executemany('''
+        INSERT INTO groups (group_id, name, description, level, default_yardage) VALUES (?, ?, ?, ?, ?)
+    ''', group_rows)
+    for start in range(0, len(assignment_rows), 50000):
+        cursor.executemany('''
+            INSERT INTO calendar_assignments (group_id, template_id, date, notes, location_id, season_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', assignment_rows[start:start + 50000])
+    conn.commit()
+    return {'groups': len(group_rows), 'calendar_assignments': len(assignment_rows)}
+
+
+def prepare_databases(args):
+    """Paths of the databases to fill, copied from the seed databases unless --in-place"""
+    paths = {}
+    for name in (SWIMMERS_DB, WORKOUTS_DB):
+        source = os.path.join(REPO_ROOT, name)
+        if args.in_place:
+            shutil.copy(source, source + '.bak')
+            paths[name] = source
+        else:
+            os.makedirs(args.out_dir, exist_ok=True)
+            target = os.path.join(args.out_dir, name)
+            if os.path.exists(target) and not args.force:
+                sys.exit(f"{target} exists; use --force to overwrite it")
+            shutil.copy(source, target)
+            paths[name] = target
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--teams', type=int, default=10)
+    parser.add_argument('--groups-per-team', type=int, default=5)
+    parser.add_argument('--swimmers-per-team', type=int, default=60)
+    parser.add_argument('--results-per-swimmer', type=int, default=40, help='swimmer_times rows per swimmer')
+    parser.add_argument('--history-years', type=int, default=4)
+    parser.add_argument('--pulse-tests-per-swimmer', type=int, default=4)
+    parser.add_argument('--calendar-days', type=int, default=365, help='days of workout assignments per group')
+    parser.add_argument('--chunk-size', type=int, default=2000, help='swimmers generated per batch')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out-dir', default=os.path.join(REPO_ROOT, 'synthetic_data'))
+    parser.add_argument('--force', action='store_true', help='overwrite databases in --out-dir')
+    parser.add_argument('--in-place', action='store_true', help="write into the repo's databases (keeps .bak copies)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    season_start = date.today()
+    paths = prepare_databases(args)
+    started = time.perf_counter()
+
+    conn = connect(paths[SWIMMERS_DB])
+    try:
+        teams = generate_teams(conn, rng, args)
+        totals = generate_swimmers(conn, rng, teams, args, season_start)
+        conn.execute('ANALYZE')
+    finally:
+        conn.close()
+
+    conn = connect(paths[WORKOUTS_DB])
+    try:
+        totals.update(generate_calendar(conn, rng, teams, args, season_start))
+        conn.execute('ANALYZE')
+    finally:
+        conn.close()
+
+    print(f"Generated in {time.perf_counter() - started:.1f}s:")
+    print(f"  teams {len(teams)}, training groups {sum(len(groups) for _, _, groups in teams)}")
+    for table, count in totals.items():
+        print(f"  {table:22s} {count:>10}")
+    for path in paths.values():
+        print(f"  -> {path}")
+
+
+if __name__ == '__main__':
+    main()
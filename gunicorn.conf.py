@@ -0,0 +1,49 @@
+"""
+Production server settings.
+
+    gunicorn -c gunicorn.conf.py
+
+Runs the app under a pre-fork server: the master imports the app and
+initializes the database once, then forks WEB_CONCURRENCY worker processes
+with GUNICORN_THREADS request threads each. Services are created per
+worker after the fork and closed when the worker exits.
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# Import the app and run create_app() once in the master before forking
+preload_app = True
+
+# Scrapes and plot renders can take a while
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+
+# Recycle workers now and then to bound memory growth from caches and scrapers
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    """Start the background services each worker needs"""
+    from app import services
+    # Fork the render processes before the outbox sender and request threads
+    # start; start() pauses the logging listener while the workers fork
+    services.plot_renderer.start()
+    services.email_outbox.start()
+
+
+def worker_exit(server, worker):
+    """Close pools, render workers, SMTP sessions and scraper sessions"""
+    from app import services
+    services.close_all()
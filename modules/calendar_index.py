@@ -0,0 +1,270 @@
+"""
+Per-season calendar index.
+
+Builds, once per season, arrays keyed by day offset from the season start:
+a flags byte per day (holiday, weekend) and a closure matrix of locations x
+days from the location_closures table in swimming_team_workouts.db, plus
+the holiday names. Planner and calendar lookups are then array reads
+instead of calls into the holidays package and per-day queries.
+
+Holidays come from the holidays package for HOLIDAY_COUNTRY (and
+HOLIDAY_SUBDIV, e.g. a state). Indexes are cached per season, dropped
+with invalidate() when closures change in this process and rebuilt after
+CALENDAR_INDEX_TTL seconds so other workers pick up changes too.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+WORKOUTS_DB = os.environ.get('WORKOUTS_DB', 'swimming_team_workouts.db')
+HOLIDAY_COUNTRY = os.environ.get('HOLIDAY_COUNTRY', 'US')
+HOLIDAY_SUBDIV = os.environ.get('HOLIDAY_SUBDIV') or None
+CALENDAR_INDEX_TTL = int(os.environ.get('CALENDAR_INDEX_TTL', 300))
+
+HOLIDAY = 1
+WEEKEND = 2
+
+
+def _parse_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def get_workouts_connection():
+    return sqlite3.connect(WORKOUTS_DB)
+
+
+class SeasonCalendar:
+    """Day-offset arrays for one season"""
+
+    def __init__(self, season_id, start, num_weeks, location_ids, holidays, closures):
+        self.season_id = season_id
+        self.start = start
+        self.num_days = num_weeks * 7
+        self.end = start + timedelta(days=self.num_days)
+        self.location_ids = list(location_ids)
+        self._location_rows = {location_id: row for row, location_id in enumerate(self.location_ids)}
+
+        self.flags = np.zeros(self.num_days, dtype=np.uint8)
+        weekdays = (start.weekday() + np.arange(self.num_days)) % 7
+        self.flags[weekdays >= 5] |= WEEKEND
+
+        self.holiday_names = {}
+        for day, name in holidays.items():
+            offset = (day - start).days
+            if 0 <= offset < self.num_days:
+                self.flags[offset] |= HOLIDAY
+                self.holiday_names[offset] = name
+
+        # closed[row, offset]: location row is closed that day
+        self.closed = np.zeros((len(self.location_ids), self.num_days), dtype=bool)
+        for location_id, first, last in closures:
+            begin = max(0, (first - start).days)
+            end = min(self.num_days, (last - start).days + 1)
+            if begin >= end:
+                continue
+            if location_id is None:
+                self.closed[:, begin:end] = True
+            elif location_id in self._location_rows:
+                self.closed[self._location_rows[location_id], begin:end] = True
+        self.all_closed = self.closed.all(axis=0) if self.location_ids else np.zeros(self.num_days, dtype=bool)
+
+    def offset(self, day):
+        """Day offset from the season start, or None outside the season"""
+        offset = (_parse_date(day) - self.start).days
+        return offset if 0 <= offset < self.num_days else None
+
+    def week_of(self, day):
+        offset = self.offset(day)
+        return None if offset is None else offset // 7
+
+    def is_holiday(self, day):
+        offset = self.offset(day)
+        return offset is not None and bool(self.flags[offset] & HOLIDAY)
+
+    def holiday_name(self, day):
+        offset = self.offset(day)
+        return self.holiday_names.get(offset) if offset is not None else None
+
+    def is_closed(self, day, location_id=None):
+        """Whether a location (or, without one, every location) is closed that day"""
+        offset = self.offset(day)
+        if offset is None:
+            return False
+        if location_id is None:
+            return bool(self.all_closed[offset])
+        row = self._location_rows.get(location_id)
+        return row is not None and bool(self.closed[row, offset])
+
+    def open_locations(self, day):
+        offset = self.offset(day)
+        if offset is None:
+            return list(self.location_ids)
+        return [location_id for location_id, closed in zip(self.location_ids, self.closed[:, offset]) if not closed]
+
+    def no_training_days(self, start=None, end=None):
+        """Dates in [start, end) that are holidays or when every pool is closed"""
+        begin = 0 if start is None else max(0, (_parse_date(start) - self.start).days)
+        stop = self.num_days if end is None else min(self.num_days, (_parse_date(end) - self.start).days)
+        if begin >= stop:
+            return []
+        blocked = (self.flags[begin:stop] & HOLIDAY).astype(bool) | self.all_closed[begin:stop]
+        return [self.start + timedelta(days=int(offset) + begin) for offset in np.flatnonzero(blocked)]
+
+    def days(self):
+        """Every day of the season with its week, holiday and closed locations"""
+        result = []
+        for offset in range(self.num_days):
+            closed = [location_id for location_id, flag in zip(self.location_ids, self.closed[:, offset]) if flag]
+            result.append({
+                'date': (self.start + timedelta(days=offset)).isoformat(),
+                'week': offset // 7,
+                'weekend': bool(self.flags[offset] & WEEKEND),
+                'holiday': self.holiday_names.get(offset),
+                'closed_locations': closed
+            })
+        return result
+
+
+def load_holidays(first, last, country=HOLIDAY_COUNTRY, subdiv=HOLIDAY_SUBDIV):
+    """{date: name} for the years spanned by [first, last]"""
+    if not country:
+        return {}
+    import holidays
+    calendar = holidays.country_holidays(country, subdiv=subdiv, years=range(first.year, last.year + 1))
+    return {day: name for day, name in calendar.items() if first <= day <= last}
+
+
+class CalendarIndex:
+    """SeasonCalendar per season, built on first use and cached"""
+
+    def __init__(self, connect=get_workouts_connection, country=HOLIDAY_COUNTRY, subdiv=HOLIDAY_SUBDIV,
+                 ttl=CALENDAR_INDEX_TTL):
+        self._connect = connect
+        self.country = country
+        self.subdiv = subdiv
+        self.ttl = ttl
+        self._seasons = {}
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        """Create the location closures table if needed"""
+        if self._schema_ready:
+            return
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS location_closures (
+                    closure_id INTEGER PRIMARY KEY,
+                    location_id INTEGER REFERENCES locations(location_id),
+                    start_date DATE NOT NULL,
+                    end_date DATE NOT NULL,
+                    reason TEXT
+                )
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+        self._schema_ready = True
+
+    def season(self, season_id):
+        """The SeasonCalendar for a season, or None if there is no such season"""
+        with self._lock:
+            cached = self._seasons.get(season_id)
+        if cached is not None and time.monotonic() - cached[1] < self.ttl:
+            return cached[0]
+        calendar = self._build(season_id)
+        if calendar is not None:
+            with self._lock:
+                self._seasons[season_id] = (calendar, time.monotonic())
+        return calendar
+
+    def invalidate(self, season_id=None):
+        """Drop one season's index, or all of them"""
+        with self._lock:
+            if season_id is None:
+                self._seasons.clear()
+            else:
+                self._seasons.pop(season_id, None)
+
+    def _build(self, season_id):
+        self.ensure_schema()
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT start_date, num_weeks FROM seasons WHERE season_id = ?', (season_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            start, num_weeks = _parse_date(row[0]), int(row[1])
+            end = start + timedelta(days=num_weeks * 7 - 1)
+            cursor.execute('SELECT location_id FROM locations ORDER BY location_id')
+            location_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute('''
+                SELECT location_id, start_date, end_date FROM location_closures
+                WHERE start_date <= ? AND end_date >= ?
+            ''', (end.isoformat(), start.isoformat()))
+            closures = [(row[0], _parse_date(row[1]), _parse_date(row[2])) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+        holidays = load_holidays(start, end, self.country, self.subdiv)
+        return SeasonCalendar(season_id, start, num_weeks, location_ids, holidays, closures)
+
+    # ------------------------------------------------------------------
+    # Closures
+    # ------------------------------------------------------------------
+
+    def add_closure(self, start_date, end_date, location_id=None, reason=None):
+        """Close one location (or all with location_id None) for a date range; returns the closure id"""
+        first, last = _parse_date(start_date), _parse_date(end_date)
+        if last < first:
+            raise ValueError('end_date is before start_date')
+        self.ensure_schema()
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO location_closures (location_id, start_date, end_date, reason) VALUES (?, ?, ?, ?)
+            ''', (location_id, first.isoformat(), last.isoformat(), reason))
+            conn.commit()
+            closure_id = cursor.lastrowid
+        finally:
+            conn.close()
+        self.invalidate()
+        return closure_id
+
+    def remove_closure(self, closure_id):
+        self.ensure_schema()
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM location_closures WHERE closure_id = ?', (closure_id,))
+            conn.commit()
+            removed = cursor.rowcount > 0
+        finally:
+            conn.close()
+        if removed:
+            self.invalidate()
+        return removed
+
+    def closures(self):
+        self.ensure_schema()
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT closure_id, location_id, start_date, end_date, reason FROM location_closures ORDER BY start_date
+            ''')
+            return [
+                {'closure_id': row[0], 'location_id': row[1], 'start_date': row[2], 'end_date': row[3], 'reason': row[4]}
+                for row in cursor.fetchall()
+            ]
+        finally:
+            conn.close()
@@ -0,0 +1,269 @@
+"""
+Team-wide Urbanchek color system results.
+
+After a 200 or 3000 test set every swimmer's result is computed in one
+pass, stored per swimmer with the test date, and a printable team pace
+chart is cached per training group until a newer test is recorded or the
+group's roster or names change.
+"""
+
+import hashlib
+import html
+import json
+import logging
+
+import numpy as np
+
+from modules.colorsystem import UrbanchekColorSystem
+from modules.database import get_connection
+from modules.result_cache import canonical_time
+from modules.time_utils import parse_time_input
+
+logger = logging.getLogger(__name__)
+
+# Zone colors in chart column order, as in urbanchek_gui.py
+ZONE_COLORS = ('White', 'Pink', 'Red', 'Blue', 'Purple')
+# Keys a zone entry may hold its pace under, in order of preference
+PACE_KEYS = ('pace', 'pace_per_100', 'target_pace', 'interval')
+
+_schema_ready = False
+
+
+def ensure_color_system_tables(cursor):
+    """Create the result and pace chart tables if they don't exist (once per process)"""
+    global _schema_ready
+    if _schema_ready:
+        return
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS color_system_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            swimmer_id INTEGER NOT NULL,
+            test_type TEXT NOT NULL,
+            test_date TEXT NOT NULL,
+            test_seconds REAL NOT NULL,
+            drag_suit BOOLEAN DEFAULT FALSE,
+            results TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (swimmer_id) REFERENCES swimmers (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_color_system_results_swimmer
+        ON color_system_results (swimmer_id, test_date)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS team_pace_charts (
+            group_id INTEGER PRIMARY KEY,
+            latest_result_id INTEGER,
+            chart_key TEXT,
+            chart_html TEXT,
+            generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (group_id) REFERENCES training_groups (id)
+        )
+    ''')
+    cursor.execute('PRAGMA table_info(team_pace_charts)')
+    if 'chart_key' not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute('ALTER TABLE team_pace_charts ADD COLUMN chart_key TEXT')
+    _schema_ready = True
+
+
+def parse_test_result(entry):
+    """Test time in seconds from {"minutes", "seconds"} or a {"time": "m:ss.s"} string"""
+    if entry.get('time'):
+        return parse_time_input(entry['time'])
+    return int(entry.get('minutes', 0)) * 60 + float(entry.get('seconds', 0))
+
+
+def calculate_team_color_systems(test_type, test_seconds, drag_suit=False):
+    """
+    Color system results for a whole set of test times.
+
+    Test times are rounded to 0.01 s and every distinct time is computed once
+    with a single UrbanchekColorSystem; swimmers with the same rounded time
+    share the result. Returns a list aligned with test_seconds.
+    """
+    rounded = np.round(np.asarray(test_seconds, dtype=float), 2)
+    unique_seconds, inverse = np.unique(rounded, return_inverse=True)
+
+    color_system = UrbanchekColorSystem()
+    unique_results = [
+        color_system.calculate_full_system(test_type, float(seconds), drag_suit)
+        for seconds in unique_seconds
+    ]
+    return [unique_results[index] for index in inverse.ravel()]
+
+
+def save_team_color_systems(test_type, test_date, drag_suit, entries):
+    """
+    Compute and store results for a list of {"swimmer_id", ...time} entries.
+
+    All rows are written in one transaction. Returns a list of
+    {"swimmer_id", "test_seconds", "results"} dicts.
+    """
+    test_seconds = [canonical_time(parse_test_result(entry)) for entry in entries]
+    results = calculate_team_color_systems(test_type, test_seconds, drag_suit)
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        ensure_color_system_tables(cursor)
+        cursor.executemany('''
+            INSERT INTO color_system_results
+            (swimmer_id, test_type, test_date, test_seconds, drag_suit, results)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            (int(entry['swimmer_id']), test_type, test_date, seconds, bool(drag_suit), json.dumps(result))
+            for entry, seconds, result in zip(entries, test_seconds, results)
+        ])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return [
+        {'swimmer_id': int(entry['swimmer_id']), 'test_seconds': seconds, 'results': result}
+        for entry, seconds, result in zip(entries, test_seconds, results)
+    ]
+
+
+def _zone_color(name):
+    color = str(name).strip().title()
+    return color if color in ZONE_COLORS else None
+
+
+def _zone_entries(results):
+    """
+    {color: entry} from a calculate_full_system result.
+
+    The zones are found by color name, whether they key the result itself,
+    a mapping inside it, or a list of entries with a "zone", "color" or
+    "name" field.
+    """
+    if not isinstance(results, dict):
+        return {}
+    for candidate in [results] + [value for value in results.values() if isinstance(value, dict)]:
+        entries = {_zone_color(key): value for key, value in candidate.items() if _zone_color(key)}
+        if entries:
+            return entries
+    for value in results.values():
+        if isinstance(value, list):
+            entries = {}
+            for item in value:
+                if isinstance(item, dict):
+                    color = _zone_color(item.get('zone') or item.get('color') or item.get('name') or '')
+                    if color:
+                        entries[color] = item
+            if entries:
+                return entries
+    return {}
+
+
+def _zone_paces(results):
+    """{color: pace} for the zones of a calculate_full_system result"""
+    paces = {}
+    for color, entry in _zone_entries(results).items():
+        if isinstance(entry, dict):
+            entry = next((entry[key] for key in PACE_KEYS if entry.get(key) is not None), None)
+        if entry is not None:
+            paces[color] = entry
+    return paces
+
+
+def render_team_pace_chart(group_name, rows):
+    """Printable HTML pace chart from (swimmer name, test date, test type, results) rows"""
+    paces = []
+    for name, _, _, results in rows:
+        paces.append(_zone_paces(results))
+        if not paces[-1]:
+            logger.warning('Color system result has no zone paces', extra={'swimmer': name})
+    zone_names = [color for color in ZONE_COLORS if any(color in row_paces for row_paces in paces)]
+
+    lines = [
+        '<!DOCTYPE html>',
+        '<html><head><meta charset="utf-8">',
+        f'<title>{html.escape(group_name)} - Team Pace Chart</title>',
+        '<style>',
+        'body { font-family: sans-serif; }',
+        'table { border-collapse: collapse; width: 100%; }',
+        'th, td { border: 1px solid #444; padding: 4px 8px; text-align: center; }',
+        '@media print { body { margin: 0; } }',
+        '</style></head><body>',
+        f'<h1>{html.escape(group_name)} - Team Pace Chart</h1>',
+        '<table>',
+        '<tr><th>Swimmer</th><th>Test</th><th>Date</th>'
+        + ''.join(f'<th>{html.escape(str(zone))}</th>' for zone in zone_names) + '</tr>'
+    ]
+    for (name, test_date, test_type, _), row_paces in zip(rows, paces):
+        lines.append(
+            f'<tr><td>{html.escape(name)}</td><td>{html.escape(test_type)}</td><td>{html.escape(test_date)}</td>'
+            + ''.join(f'<td>{html.escape(str(row_paces.get(zone, "")))}</td>' for zone in zone_names) + '</tr>'
+        )
+    lines.extend(['</table>', '</body></html>'])
+    return '\n'.join(lines)
+
+
+def get_team_pace_chart(group_id):
+    """
+    The printable pace chart for a training group.
+
+    The cached chart is reused until a color system result newer than the
+    one it was built from is recorded for a swimmer in the group, or the
+    group's name, members or their names change. Returns None when the
+    group does not exist.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        ensure_color_system_tables(cursor)
+
+        cursor.execute('SELECT group_name FROM training_groups WHERE id = ?', (group_id,))
+        group = cursor.fetchone()
+        if not group:
+            return None
+
+        cursor.execute('''
+            SELECT MAX(r.id)
+            FROM color_system_results r
+            JOIN swimmers s ON s.id = r.swimmer_id
+            WHERE s.training_group_id = ?
+        ''', (group_id,))
+        latest_result_id = cursor.fetchone()[0]
+
+        cursor.execute('SELECT id, name FROM swimmers WHERE training_group_id = ? ORDER BY id', (group_id,))
+        roster = cursor.fetchall()
+        chart_key = hashlib.sha1(
+            json.dumps([group[0], latest_result_id, roster]).encode('utf-8')
+        ).hexdigest()
+
+        cursor.execute('SELECT chart_key, chart_html FROM team_pace_charts WHERE group_id = ?', (group_id,))
+        cached = cursor.fetchone()
+        if cached and cached[0] == chart_key:
+            return cached[1]
+
+        # Latest test per swimmer in the group
+        cursor.execute('''
+            SELECT s.name, r.test_date, r.test_type, r.results
+            FROM color_system_results r
+            JOIN swimmers s ON s.id = r.swimmer_id
+            WHERE s.training_group_id = ?
+              AND r.id = (
+                  SELECT r2.id FROM color_system_results r2
+                  WHERE r2.swimmer_id = r.swimmer_id
+                  ORDER BY r2.test_date DESC, r2.id DESC
+                  LIMIT 1
+              )
+            ORDER BY s.name
+        ''', (group_id,))
+        rows = [(row[0], row[1], row[2], json.loads(row[3])) for row in cursor.fetchall()]
+
+        chart_html = render_team_pace_chart(group[0], rows)
+        cursor.execute('''
+            INSERT OR REPLACE INTO team_pace_charts (group_id, latest_result_id, chart_key, chart_html, generated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (group_id, latest_result_id, chart_key, chart_html))
+        conn.commit()
+        return chart_html
+    finally:
+        conn.close()
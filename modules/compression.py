@@ -0,0 +1,84 @@
+"""
+Negotiated response compression.
+
+Compresses text, JSON and SVG responses of at least COMPRESS_MIN_SIZE
+bytes with brotli (when the brotli package is installed) or gzip, picked
+from the client's Accept-Encoding. Streamed responses, responses that
+already carry a Content-Encoding and PNG images are left alone.
+COMPRESS_ENABLED=0 turns it off, e.g. behind a proxy that compresses.
+"""
+
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') != '0'
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript', 'image/svg+xml',
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript'
+}
+
+
+def _encoders():
+    encoders = {}
+    if brotli is not None:
+        encoders['br'] = lambda data: brotli.compress(data, quality=BROTLI_QUALITY)
+    encoders['gzip'] = lambda data: gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    return encoders
+
+
+ENCODERS = _encoders()
+
+
+def choose_encoding(accept_encoding):
+    """The best supported encoding for an Accept-Encoding header, or None"""
+    best, best_quality = None, 0.0
+    # Server preference breaks ties: brotli before gzip
+    for encoding in ENCODERS:
+        quality = accept_encoding.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_response(response, accept_encoding, min_size=COMPRESS_MIN_SIZE):
+    """Compress a response in place when it is worth it; returns the encoding used or None"""
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 206, 304) or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return None
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return None
+    data = response.get_data()
+    if len(data) < min_size:
+        return None
+
+    response.set_data(ENCODERS[encoding](data))
+    response.headers['Content-Encoding'] = encoding
+    # A strong ETag names the uncompressed bytes
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return encoding
+
+
+def init_app(app, enabled=COMPRESS_ENABLED):
+    """Install the after-request hook that compresses responses"""
+    if not enabled:
+        return
+    from flask import request
+
+    @app.after_request
+    def compress(response):
+        compress_response(response, request.accept_encodings)
+        return response
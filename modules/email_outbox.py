@@ -0,0 +1,393 @@
+"""
+Durable outbound email queue.
+
+Messages are written to the email_outbox table and the HTTP request returns
+straight away; a background sender thread delivers them through the pooled
+SMTP sessions. Failed sends are retried with exponential backoff (failures
+a retry can't fix, like missing credentials or a rejected login, fail at
+once), each provider is held to a per-minute send rate, and the matching
+email_log or coach_email_log row is updated with the final status.
+
+Every process may run a sender thread, but only the one holding the
+outbox lock file sends, so rate limits hold across worker processes.
+Claimed messages carry a lease; a message whose sender died mid-send is
+re-queued once its lease expires, so nothing queued is lost.
+
+Delivery is at-least-once. Each message's result is committed as soon as
+the SMTP server answers, before the next message in the batch is sent, but
+a sender that dies between the server accepting a message and that commit
+leaves it in 'sending', and it is sent again after SEND_LEASE_SECONDS.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: every sender thread sends
+    fcntl = None
+
+from modules.database import get_connection
+from modules.smtp_pool import smtp_settings_for
+
+logger = logging.getLogger(__name__)
+
+# Attempts before a message is marked failed
+MAX_ATTEMPTS = 5
+
+# Backoff before retry n is BACKOFF_BASE_SECONDS * 2 ** (n - 1), capped
+BACKOFF_BASE_SECONDS = 30
+MAX_BACKOFF_SECONDS = 30 * 60
+
+# Messages per minute per provider; EMAIL_RATE_LIMIT_PER_MINUTE overrides all
+PROVIDER_RATE_LIMITS = {
+    'smtp.gmail.com': 20,
+    'smtp-mail.outlook.com': 30,
+    'smtp.mail.yahoo.com': 20,
+}
+DEFAULT_RATE_LIMIT = 20
+
+# Messages claimed from the table per pass
+CLAIM_BATCH_SIZE = 50
+
+# Seconds the sender sleeps when nothing is due
+POLL_SECONDS = 5
+
+# Seconds a claimed message may stay in 'sending' before it is re-queued
+SEND_LEASE_SECONDS = 300
+
+# Held by the one process whose sender thread delivers mail
+LOCK_PATH = os.environ.get('EMAIL_OUTBOX_LOCK', os.path.join(tempfile.gettempdir(), 'email_outbox.lock'))
+
+# Log tables the sender is allowed to update
+LOG_TABLES = ('email_log', 'coach_email_log')
+
+
+def backoff_seconds(attempts):
+    """Delay before the next attempt after `attempts` failed sends"""
+    return min(MAX_BACKOFF_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def rate_limit_for(provider):
+    override = os.environ.get('EMAIL_RATE_LIMIT_PER_MINUTE')
+    if override:
+        return int(override)
+    return PROVIDER_RATE_LIMITS.get(provider, DEFAULT_RATE_LIMIT)
+
+
+class RateLimiter:
+    """Token bucket per provider, refilled continuously at the per-minute rate"""
+
+    def __init__(self):
+        self._buckets = {}
+
+    def available(self, provider):
+        """Whole sends allowed for a provider right now"""
+        rate = rate_limit_for(provider)
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(provider, (float(rate), now))
+        tokens = min(float(rate), tokens + (now - updated) * rate / 60.0)
+        self._buckets[provider] = (tokens, now)
+        return int(tokens)
+
+    def consume(self, provider, count):
+        tokens, updated = self._buckets[provider]
+        self._buckets[provider] = (tokens - count, updated)
+
+
+class EmailOutbox:
+    """Outbox table plus the background thread that drains it"""
+
+    def __init__(self, smtp_pool):
+        self.smtp_pool = smtp_pool
+        self.rate_limiter = RateLimiter()
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        """Create the outbox table and its index if needed"""
+        if self._schema_ready:
+            return
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS email_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    to_email TEXT NOT NULL,
+                    subject TEXT,
+                    content TEXT,
+                    provider TEXT,
+                    status TEXT DEFAULT 'queued',
+                    attempts INTEGER DEFAULT 0,
+                    next_attempt_at REAL DEFAULT 0,
+                    last_error TEXT,
+                    log_table TEXT,
+                    log_id INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    sent_at TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_email_outbox_status_next
+                ON email_outbox (status, next_attempt_at)
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+        self._schema_ready = True
+
+    # ------------------------------------------------------------------
+    # Queueing and status
+    # ------------------------------------------------------------------
+
+    def enqueue_many(self, messages, write_logs=None):
+        """
+        Queue several messages in one transaction.
+
+        Each message is a dict with to_email, subject, content and optionally
+        log_table and log_id (the email_log/coach_email_log row to update).
+        write_logs(cursor), if given, inserts the log rows in the same
+        transaction and returns their ids, used as each message's log_id.
+        Returns the outbox ids in order.
+        """
+        self.ensure_schema()
+        sender_email, _ = self.smtp_pool.credentials()
+        provider = smtp_settings_for(sender_email or '')[0]
+
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            log_ids = write_logs(cursor) if write_logs else [message.get('log_id') for message in messages]
+            ids = []
+            for message, log_id in zip(messages, log_ids):
+                log_table = message.get('log_table')
+                if log_table is not None and log_table not in LOG_TABLES:
+                    raise ValueError(f"Unknown email log table: {log_table}")
+                cursor.execute('''
+                    INSERT INTO email_outbox (to_email, subject, content, provider, next_attempt_at, log_table, log_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (message['to_email'], message['subject'], message['content'], provider,
+                      time.time(), log_table, log_id))
+                ids.append(cursor.lastrowid)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        self.start()
+        self._wakeup.set()
+        return ids
+
+    def enqueue(self, to_email, subject, content, log_table=None, log_id=None, write_logs=None):
+        """Queue one message and return its outbox id"""
+        return self.enqueue_many([{
+            'to_email': to_email,
+            'subject': subject,
+            'content': content,
+            'log_table': log_table,
+            'log_id': log_id
+        }], write_logs)[0]
+
+    def status(self, outbox_id):
+        """Delivery status of a queued message, or None if the id is unknown"""
+        self.ensure_schema()
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, to_email, subject, status, attempts, next_attempt_at, last_error, created_at, sent_at
+                FROM email_outbox WHERE id = ?
+            ''', (outbox_id,))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+
+        if row is None:
+            return None
+        return {
+            'id': row[0],
+            'recipient': row[1],
+            'subject': row[2],
+            'status': row[3],
+            'attempts': row[4],
+            'next_attempt_in': max(0, round(row[5] - time.time())) if row[3] == 'queued' else None,
+            'error': row[6],
+            'queued_at': row[7],
+            'sent_at': row[8]
+        }
+
+    # ------------------------------------------------------------------
+    # Background sender
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the sender thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self.ensure_schema()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _is_sender(self):
+        """Whether this process holds the outbox lock (taking it if it's free)"""
+        if fcntl is None or self._lock_file is not None:
+            return True
+        lock_file = open(LOCK_PATH, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                delay = self.process_due() if self._is_sender() else POLL_SECONDS
+            except Exception as e:
+                logger.exception('Email outbox pass failed')
+                delay = POLL_SECONDS
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+    def process_due(self):
+        """
+        Send every due message the rate limits allow.
+
+        Returns how long the sender can sleep before something is due again.
+        """
+        now = time.time()
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            # Re-queue messages whose sender died mid-send
+            cursor.execute(
+                "UPDATE email_outbox SET status = 'queued' WHERE status = 'sending' AND next_attempt_at <= ?",
+                (now,)
+            )
+            conn.commit()
+            cursor.execute('''
+                SELECT id, to_email, subject, content, provider, attempts, log_table, log_id
+                FROM email_outbox
+                WHERE status = 'queued' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at, id
+                LIMIT ?
+            ''', (now, CLAIM_BATCH_SIZE))
+            due = cursor.fetchall()
+            cursor.execute("SELECT MIN(next_attempt_at) FROM email_outbox WHERE status = 'queued' AND next_attempt_at > ?", (now,))
+            next_due = cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+        by_provider = {}
+        for row in due:
+            by_provider.setdefault(row[4], []).append(row)
+
+        throttled_delay = None
+        for provider, rows in by_provider.items():
+            allowed = self.rate_limiter.available(provider)
+            if allowed < len(rows):
+                # Wait roughly one token's worth of time for this provider
+                provider_delay = 60.0 / rate_limit_for(provider)
+                throttled_delay = min(throttled_delay or provider_delay, provider_delay)
+            claimed = self._claim(rows[:allowed])
+            if claimed:
+                self.rate_limiter.consume(provider, len(claimed))
+                self._deliver(claimed)
+
+        if throttled_delay is not None:
+            return min(POLL_SECONDS, throttled_delay)
+        if len(due) == CLAIM_BATCH_SIZE:
+            return 0
+        if next_due is not None:
+            return max(0.0, min(POLL_SECONDS, next_due - time.time()))
+        return POLL_SECONDS
+
+    def _claim(self, rows):
+        """Mark rows as sending under a lease; rows claimed elsewhere first are dropped"""
+        if not rows:
+            return []
+        claimed = []
+        lease_expires = time.time() + SEND_LEASE_SECONDS
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            for row in rows:
+                cursor.execute(
+                    "UPDATE email_outbox SET status = 'sending', next_attempt_at = ? WHERE id = ? AND status = 'queued'",
+                    (lease_expires, row[0])
+                )
+                if cursor.rowcount:
+                    claimed.append(row)
+            conn.commit()
+        finally:
+            conn.close()
+        return claimed
+
+    def _deliver(self, rows):
+        """Send claimed rows, committing each result before the next message goes out"""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+
+            def record(index, result):
+                self._record(cursor, rows[index], result)
+                conn.commit()
+
+            self.smtp_pool.send_bulk([(row[1], row[2], row[3]) for row in rows], on_result=record)
+        finally:
+            conn.close()
+
+    def _record(self, cursor, row, result):
+        """Store one send result: sent, failed, or queued again after a backoff"""
+        success, message = result
+        outbox_id, attempts, log_table, log_id = row[0], row[5] + 1, row[6], row[7]
+        if success:
+            cursor.execute('''
+                UPDATE email_outbox
+                SET status = 'sent', attempts = ?, last_error = NULL, sent_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (attempts, outbox_id))
+            final_status, error = 'sent', None
+        elif attempts >= MAX_ATTEMPTS or not result.retryable:
+            cursor.execute('''
+                UPDATE email_outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?
+            ''', (attempts, message, outbox_id))
+            final_status, error = 'failed', message
+            logger.error('Email delivery failed', extra={'to': row[1], 'attempts': attempts, 'error': message})
+        else:
+            cursor.execute('''
+                UPDATE email_outbox SET status = 'queued', attempts = ?, last_error = ?, next_attempt_at = ?
+                WHERE id = ?
+            ''', (attempts, message, time.time() + backoff_seconds(attempts), outbox_id))
+            return
+
+        if log_table in LOG_TABLES and log_id is not None:
+            cursor.execute(
+                f"UPDATE {log_table} SET status = ?, error_message = ? WHERE id = ?",
+                (final_status, error, log_id)
+            )
@@ -0,0 +1,169 @@
+"""
+Vectorized distance predictions for the interval calculator.
+
+The distance model in modules.interval_calculator is sampled once over the
+whole distance vector; model, practice and goal predictions are then derived
+from that vector with NumPy array operations and formatted in one batch.
+"""
+
+import numpy as np
+
+from modules.database import get_connection
+from modules.interval_calculator import calculate_base_interval, calculate_base_time, generate_intervals
+from modules.swimmer_analysis import calculate_velocities, determine_swimmer_style
+from modules.time_utils import parse_time_input, format_time, adjust_time_for_practice
+
+# 25 to 500 yards in 25 yard steps - the distances shown on the interval calculator
+DISTANCES = np.arange(25, 525, 25)
+
+
+def distance_keys(distances=DISTANCES):
+    """Response keys for a distance vector ("25 yards", "50 yards", ...)"""
+    return [f"{int(distance)} yards" for distance in distances]
+
+
+def evaluate_distance_model(times, velocities, swimmer_style, distances=DISTANCES):
+    """Evaluate the swimmer's distance model once for every distance"""
+    return np.fromiter(
+        (calculate_base_time(int(distance), times, velocities, swimmer_style) for distance in distances),
+        dtype=float,
+        count=len(distances)
+    )
+
+
+def practice_adjust(base_times, distances=DISTANCES):
+    """Apply the practice adjustment to every positive model time"""
+    practice_times = np.zeros_like(base_times)
+    valid = base_times > 0
+    practice_times[valid] = np.fromiter(
+        (adjust_time_for_practice(base_time, int(distance))
+         for base_time, distance in zip(base_times[valid], distances[valid])),
+        dtype=float,
+        count=int(valid.sum())
+    )
+    return practice_times
+
+
+def format_times(values):
+    """Format an array of seconds in one pass, None where the value is not positive"""
+    values = np.asarray(values, dtype=float)
+    formatted = {}
+    for value in np.unique(values[values > 0]).tolist():
+        formatted[value] = format_time(value)
+    return np.array([formatted.get(value) for value in values.ravel().tolist()], dtype=object).reshape(values.shape)
+
+
+def predict_distance_times(times, velocities, swimmer_style, goal_percentage, distances=DISTANCES):
+    """
+    Model, practice and goal predictions for every distance.
+
+    Returns a dict of {"model": ..., "practice": ..., "goal": ...} where each
+    value maps "<distance> yards" to a formatted time. Distances where the
+    model has no prediction are left out, matching the /generate response.
+    """
+    distances = np.asarray(distances)
+    base_times = evaluate_distance_model(times, velocities, swimmer_style, distances)
+    valid = base_times > 0
+
+    predictions = np.vstack([
+        base_times,
+        practice_adjust(base_times, distances),
+        base_times * (1 - goal_percentage / 100),
+    ])
+    formatted = format_times(np.where(valid, predictions, 0))
+
+    keys = [key for key, is_valid in zip(distance_keys(distances), valid) if is_valid]
+    return {
+        name: dict(zip(keys, formatted[row][valid]))
+        for row, name in enumerate(('model', 'practice', 'goal'))
+    }
+
+
+def build_interval_response(times, goal_percentage, num_reps):
+    """Intervals, fatigue progressions and predictions for one swimmer's parsed times"""
+    velocities = calculate_velocities(times)
+    swimmer_style, dropoff = determine_swimmer_style(velocities)
+
+    base_interval_100 = calculate_base_interval(times['t100'], swimmer_style)
+    intervals, fatigue_progressions = generate_intervals(times, DISTANCES.tolist(), swimmer_style, num_reps)
+
+    actual_times = {
+        "50 yards": format_time(times['t50']) if times['t50'] > 0 else None,
+        "100 yards": format_time(times['t100']) if times['t100'] > 0 else None,
+        "200 yards": format_time(times['t200']) if times['t200'] > 0 else None,
+        "500 yards": format_time(times['t500']) if times['t500'] > 0 else None
+    }
+
+    predictions = predict_distance_times(times, velocities, swimmer_style, goal_percentage, DISTANCES)
+
+    return {
+        "intervals": intervals,
+        "fatigue_progressions": fatigue_progressions,
+        "actual_times": actual_times,
+        "model_predictions": predictions['model'],
+        "practice_predictions": predictions['practice'],
+        "goal_model": {
+            "formula": f"Goal times based on {goal_percentage}% improvement",
+            "percentage": goal_percentage
+        },
+        "goal_predictions": predictions['goal'],
+        "velocity_model": {
+            "formula": f"Cubic model based on {swimmer_style} profile"
+        },
+        "swimmer_profile": {
+            "style": swimmer_style,
+            "base_interval_100": format_time(base_interval_100)
+        }
+    }
+
+
+def load_group_times(training_group_id=None, swimmer_ids=None):
+    """
+    Load and parse the t50/t100/t200/t500 times for a training group or a
+    list of swimmer ids in a single query.
+
+    Returns a list of (swimmer_id, name, times) tuples ordered by name.
+    """
+    if training_group_id is not None:
+        where, params = 'training_group_id = ?', [training_group_id]
+    elif swimmer_ids:
+        where, params = f"id IN ({', '.join('?' * len(swimmer_ids))})", list(swimmer_ids)
+    else:
+        return []
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id, name, t50, t100, t200, t500
+            FROM swimmers
+            WHERE {where}
+            ORDER BY name
+        ''', params)
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    return [
+        (row[0], row[1], {
+            't50': parse_time_input(row[2] or ''),
+            't100': parse_time_input(row[3] or ''),
+            't200': parse_time_input(row[4] or ''),
+            't500': parse_time_input(row[5] or ''),
+        })
+        for row in rows
+    ]
+
+
+def build_group_interval_responses(swimmer_times, goal_percentage, num_reps):
+    """Yield one interval response per swimmer from load_group_times() output"""
+    for swimmer_id, name, times in swimmer_times:
+        entry = {'swimmer_id': swimmer_id, 'name': name}
+        if times['t100'] <= 0:
+            entry['error'] = 'No 100 yard time on file'
+        else:
+            try:
+                entry.update(build_interval_response(times, goal_percentage, num_reps))
+            except Exception as e:
+                entry['error'] = str(e)
+        yield entry
@@ -0,0 +1,71 @@
+"""
+Fast JSON provider.
+
+OrjsonProvider serializes responses with orjson and falls back to Flask's
+stdlib provider for anything orjson can't encode (integers beyond 64 bits,
+or callers passing stdlib json options). Dates, Decimals, UUIDs and
+__html__ objects go through Flask's default hook, so the output matches
+the stdlib provider; NaN and infinity become null instead of invalid JSON.
+
+JSON_PROVIDER picks the provider: "orjson", "stdlib", or "auto" (the
+default: orjson when it is installed).
+"""
+
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto').lower()
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson"""
+
+    def _options(self, pretty=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _encode(self, obj, pretty=False):
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(pretty))
+        except TypeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            encoded = self._encode(obj)
+            if encoded is not None:
+                return encoded.decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        encoded = self._encode(obj, pretty)
+        if encoded is None:
+            return super().response(obj)
+        return self._app.response_class(encoded + b'\n', mimetype=self.mimetype)
+
+
+def init_app(app, provider=JSON_PROVIDER):
+    """Install the configured JSON provider; returns its name"""
+    if provider == 'stdlib' or (provider == 'auto' and orjson is None):
+        return 'stdlib'
+    if orjson is None:
+        raise RuntimeError('JSON_PROVIDER=orjson but orjson is not installed')
+    app.json = OrjsonProvider(app)
+    return 'orjson'
@@ -0,0 +1,153 @@
+"""
+Structured, non-blocking logging.
+
+configure_logging() routes every logger through a QueueHandler, so a log
+call only formats its message and puts the record on a queue; a
+QueueListener thread writes the records to stderr. LOG_LEVEL sets the
+level (INFO by default) and LOG_FORMAT=json switches from key=value lines
+to one JSON object per line.
+
+Structured fields are passed with extra=:
+
+    logger.info('Email queued', extra={'to': address, 'message_id': message_id})
+
+Work that only feeds debug output should be guarded with
+logger.isEnabledFor(logging.DEBUG) so it is skipped when debug is off.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_lock = threading.Lock()
+_handler = None
+_listener = None
+
+
+def record_fields(record):
+    """The structured fields attached to a record with extra="""
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class StructuredFormatter(logging.Formatter):
+    """key=value lines, or one JSON object per line with json_lines=True"""
+
+    def __init__(self, json_lines=False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record):
+        message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created))
+        timestamp += f".{int(record.msecs):03d}"
+        fields = record_fields(record)
+
+        if self.json_lines:
+            entry = {
+                'time': timestamp, 'level': record.levelname, 'logger': record.name,
+                'message': message, 'pid': record.process
+            }
+            entry.update(fields)
+            if record.exc_text:
+                entry['exception'] = record.exc_text
+            return json.dumps(entry, default=str)
+
+        line = f"{timestamp} {record.levelname:<7} {record.name}: {message}"
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value!r}" if isinstance(value, str) and ' ' in value else f"{key}={value}"
+                                   for key, value in fields.items())
+        if record.exc_text:
+            line += '\n' + record.exc_text
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Queues records with their extra fields intact for StructuredFormatter"""
+
+    def prepare(self, record):
+        # Resolve the message and traceback now: the args and frames they
+        # refer to may change or be gone by the time the listener runs
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _start_listener():
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _handler.queue = log_queue
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(StructuredFormatter(json_lines=LOG_FORMAT == 'json'))
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+
+
+def _after_fork():
+    # The listener thread doesn't survive fork; give the child its own
+    if _handler is not None:
+        _start_listener()
+
+
+def configure_logging(level=None):
+    """Install the queue handler on the root logger (idempotent)"""
+    global _handler
+    with _lock:
+        root = logging.getLogger()
+        root.setLevel(level or LOG_LEVEL)
+        if _handler is not None:
+            return
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        _handler = _QueueHandler(queue.SimpleQueue())
+        root.addHandler(_handler)
+        _start_listener()
+        atexit.register(stop_logging)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_after_fork)
+
+
+@contextmanager
+def listener_stopped():
+    """
+    Stop the listener thread for the duration of the block.
+
+    For forking child processes without a thread running in the parent;
+    records logged meanwhile stay queued and are written once it restarts.
+    """
+    with _lock:
+        listener = _listener
+        if listener is not None:
+            listener.stop()
+    try:
+        yield
+    finally:
+        with _lock:
+            if listener is not None and _listener is listener:
+                listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
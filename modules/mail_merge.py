@@ -0,0 +1,175 @@
+"""
+Server-side mail merge for training group emails.
+
+A group's athlete profiles, best times and latest pulse plot tests are
+loaded in a few set-based queries, and one compiled template is rendered
+for every athlete. Templates use Jinja syntax ({{ first_name }},
+{% for t in best_times %}...) and run in a sandbox since coaches write them.
+"""
+
+import json
+
+import numpy as np
+from jinja2 import TemplateSyntaxError
+from jinja2.sandbox import SandboxedEnvironment
+
+from modules.database import get_connection
+from modules.pulse_trends import batch_regression, count_sums_to_bpm
+
+_environment = SandboxedEnvironment(autoescape=False, keep_trailing_newline=True)
+
+
+class MailMergeError(ValueError):
+    """A template could not be compiled or rendered"""
+
+
+def compile_template(source, name='template'):
+    """Compile a mail-merge template once for rendering against many athletes"""
+    try:
+        return _environment.from_string(source or '')
+    except TemplateSyntaxError as e:
+        raise MailMergeError(f"{name} line {e.lineno}: {e.message}")
+
+
+def _latest_pulse_tests(cursor, group_id):
+    """Latest pulse plot test per swimmer in the group, with its fitted line (bpm sums, as in the trends)"""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pulse_plot_tests'")
+    if not cursor.fetchone():
+        return {}
+
+    cursor.execute('''
+        SELECT swimmer_id, test_date, stroke, swim_speeds, sum_heart_rates
+        FROM (
+            SELECT p.swimmer_id, p.test_date, p.stroke, p.swim_speeds, p.sum_heart_rates,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY p.swimmer_id ORDER BY p.test_date DESC, p.created_at DESC
+                   ) AS recency
+            FROM pulse_plot_tests p
+            JOIN swimmers s ON s.id = p.swimmer_id
+            WHERE s.training_group_id = ?
+        )
+        WHERE recency = 1
+    ''', (group_id,))
+    rows = cursor.fetchall()
+    if not rows:
+        return {}
+
+    speeds = np.full((len(rows), 8), np.nan)
+    heart_rates = np.full((len(rows), 8), np.nan)
+    for index, row in enumerate(rows):
+        for matrix, values in ((speeds, row[3]), (heart_rates, row[4])):
+            try:
+                parsed = [float(value) for value in json.loads(values or '[]')[:8]]
+            except (TypeError, ValueError):
+                parsed = []
+            matrix[index, :len(parsed)] = parsed
+    # Stored sums are 10-second counts; fit in bpm like every other pulse plot view
+    slopes, intercepts, r_squared = batch_regression(speeds, count_sums_to_bpm(heart_rates))
+
+    latest = {}
+    for index, row in enumerate(rows):
+        fitted = bool(np.isfinite(slopes[index]))
+        latest[row[0]] = {
+            'test_date': row[1],
+            'stroke': row[2] or 'freestyle',
+            'slope': round(float(slopes[index]), 2) if fitted else None,
+            'intercept': round(float(intercepts[index]), 2) if fitted else None,
+            'r_squared': round(float(r_squared[index]), 3) if np.isfinite(r_squared[index]) else None
+        }
+    return latest
+
+
+def load_group_profiles(group_id):
+    """
+    Merge fields for every athlete in a training group.
+
+    Returns (group, profiles): group is {group_name, coach_name} or None if
+    the group doesn't exist; each profile holds the athlete's profile
+    columns, first_name, best_times (list of {event, time, course}),
+    best_times_text (one line per event) and latest_pulse (or None).
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT group_name, coach_name FROM training_groups WHERE id = ?', (group_id,))
+        group_row = cursor.fetchone()
+        if group_row is None:
+            return None, []
+        group = {'group_name': group_row[0], 'coach_name': group_row[1]}
+
+        cursor.execute('''
+            SELECT id, name, email, team, year, grade, style, t50, t100, t200, t500
+            FROM swimmers
+            WHERE training_group_id = ?
+            ORDER BY name
+        ''', (group_id,))
+        athletes = cursor.fetchall()
+
+        cursor.execute('''
+            SELECT b.swimmer_id, b.event, b.time_string, b.course
+            FROM best_times b
+            JOIN swimmers s ON s.id = b.swimmer_id
+            WHERE s.training_group_id = ?
+            ORDER BY b.swimmer_id, b.course, b.time_seconds
+        ''', (group_id,))
+        best_times = {}
+        for swimmer_id, event, time_string, course in cursor.fetchall():
+            best_times.setdefault(swimmer_id, []).append({'event': event, 'time': time_string, 'course': course})
+
+        latest_pulse = _latest_pulse_tests(cursor, group_id)
+    finally:
+        conn.close()
+
+    profiles = []
+    for row in athletes:
+        times = best_times.get(row[0], [])
+        profiles.append({
+            'id': row[0],
+            'name': row[1],
+            'first_name': (row[1] or '').split(' ')[0],
+            'email': row[2],
+            'team': row[3],
+            'year': row[4],
+            'grade': row[5],
+            'style': row[6],
+            't50': row[7],
+            't100': row[8],
+            't200': row[9],
+            't500': row[10],
+            'best_times': times,
+            'best_times_text': '\n'.join(
+                f"{t['event']} ({t['course']}): {t['time']}" if t['course'] else f"{t['event']}: {t['time']}"
+                for t in times
+            ),
+            'latest_pulse': latest_pulse.get(row[0])
+        })
+    return group, profiles
+
+
+def render_messages(profiles, subject_template, body_template, extra_context=None):
+    """
+    Render the compiled subject and body for every athlete with an email.
+
+    Returns (messages, skipped): messages are dicts with athlete_id,
+    athlete_name, to_email, subject and content; skipped lists athletes
+    without an email address.
+    """
+    messages, skipped = [], []
+    for profile in profiles:
+        if not profile['email']:
+            skipped.append({'athlete_id': profile['id'], 'athlete_name': profile['name'], 'reason': 'no email address'})
+            continue
+        context = dict(extra_context or {}, **profile)
+        try:
+            subject = subject_template.render(context).strip()
+            content = body_template.render(context)
+        except Exception as e:
+            raise MailMergeError(f"Could not render template for {profile['name']}: {e}")
+        messages.append({
+            'athlete_id': profile['id'],
+            'athlete_name': profile['name'],
+            'to_email': profile['email'],
+            'subject': subject,
+            'content': content
+        })
+    return messages, skipped
@@ -0,0 +1,395 @@
+"""
+Built-in request, database, scraper and cache metrics.
+
+- Request latency per endpoint, as fixed-bucket histograms.
+- SQL statement count and time per request, recorded through a wrapped
+  connection factory.
+- SwimCloud fetch and parse timings and response status counts
+  (HTTP 202 means SwimCloud is throttling us).
+- Result cache hit rates.
+
+Recording is a perf_counter pair and a few additions under a lock, so it
+is cheap enough to leave on; METRICS_ENABLED=0 turns it off entirely.
+Metrics are per process: under gunicorn each worker reports its own.
+"""
+
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+
+ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Upper bounds of the SQL-statements-per-request histogram buckets
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+# Scraper methods timed when a scraper is instrumented
+SCRAPER_METHODS = ('search_swimmer', 'get_swimmer_times', '_get_enhanced_swimmer_data')
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile"""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        cumulative, running = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative.append([bound, running])
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': cumulative
+        }
+
+
+class Metrics:
+    """Process-wide metric store"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.request_latency = {}
+        self.request_status = {}
+        self.request_queries = {}
+        self.request_query_seconds = {}
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.scrape_seconds = {}
+        self.scrape_status = {}
+
+    def _histogram(self, table, key, buckets):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(buckets)
+        return histogram
+
+    def record_request(self, endpoint, method, status, seconds, queries, query_seconds):
+        key = (endpoint, method)
+        with self._lock:
+            self._histogram(self.request_latency, key, LATENCY_BUCKETS).observe(seconds)
+            self._histogram(self.request_queries, key, QUERY_COUNT_BUCKETS).observe(queries)
+            self.request_query_seconds[key] = self.request_query_seconds.get(key, 0.0) + query_seconds
+            status_key = (endpoint, method, status)
+            self.request_status[status_key] = self.request_status.get(status_key, 0) + 1
+
+    def record_query(self, seconds, statements=1):
+        """Time spent in SQL; fetches add time without counting a statement"""
+        with self._lock:
+            self.query_count += statements
+            self.query_seconds += seconds
+
+    def record_scrape(self, method, phase, seconds):
+        with self._lock:
+            self._histogram(self.scrape_seconds, (method, phase), LATENCY_BUCKETS).observe(seconds)
+
+    def record_scrape_status(self, status):
+        with self._lock:
+            self.scrape_status[status] = self.scrape_status.get(status, 0) + 1
+
+    def snapshot(self, cache_stats=()):
+        """Everything as plain JSON-ready data"""
+        with self._lock:
+            endpoints = []
+            for (endpoint, method), histogram in sorted(self.request_latency.items()):
+                queries = self.request_queries[(endpoint, method)]
+                endpoints.append({
+                    'endpoint': endpoint,
+                    'method': method,
+                    'latency_seconds': histogram.snapshot(),
+                    'queries_per_request': queries.snapshot(),
+                    'query_seconds_total': round(self.request_query_seconds[(endpoint, method)], 6),
+                    'status': {
+                        str(status): count
+                        for (e, m, status), count in self.request_status.items()
+                        if e == endpoint and m == method
+                    }
+                })
+            return {
+                'pid': os.getpid(),
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'endpoints': endpoints,
+                'database': {'queries': self.query_count, 'query_seconds': round(self.query_seconds, 6)},
+                'scraper': {
+                    'timings': [
+                        {'method': method, 'phase': phase, 'seconds': histogram.snapshot()}
+                        for (method, phase), histogram in sorted(self.scrape_seconds.items())
+                    ],
+                    'responses': {str(status): count for status, count in sorted(self.scrape_status.items())},
+                    'throttled_202': self.scrape_status.get(202, 0)
+                },
+                'caches': list(cache_stats)
+            }
+
+    def prometheus(self, cache_stats=()):
+        """Prometheus text exposition format"""
+        lines = []
+
+        def histogram_lines(name, labels, histogram):
+            running = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                running += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {running}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+        with self._lock:
+            lines.append('# TYPE http_request_duration_seconds histogram')
+            for (endpoint, method), histogram in sorted(self.request_latency.items()):
+                histogram_lines('http_request_duration_seconds', f'endpoint="{endpoint}",method="{method}"', histogram)
+            lines.append('# TYPE http_requests_total counter')
+            for (endpoint, method, status), count in sorted(self.request_status.items()):
+                lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+            lines.append('# TYPE http_request_sql_queries histogram')
+            for (endpoint, method), histogram in sorted(self.request_queries.items()):
+                histogram_lines('http_request_sql_queries', f'endpoint="{endpoint}",method="{method}"', histogram)
+            lines.append('# TYPE sql_queries_total counter')
+            lines.append(f'sql_queries_total {self.query_count}')
+            lines.append('# TYPE sql_query_seconds_total counter')
+            lines.append(f'sql_query_seconds_total {self.query_seconds:.6f}')
+            lines.append('# TYPE swimcloud_scrape_seconds histogram')
+            for (method, phase), histogram in sorted(self.scrape_seconds.items()):
+                histogram_lines('swimcloud_scrape_seconds', f'method="{method}",phase="{phase}"', histogram)
+            lines.append('# TYPE swimcloud_responses_total counter')
+            for status, count in sorted(self.scrape_status.items()):
+                lines.append(f'swimcloud_responses_total{{status="{status}"}} {count}')
+
+        lines.append('# TYPE result_cache_hit_ratio gauge')
+        for stats in cache_stats:
+            lines.append(f'result_cache_hit_ratio{{cache="{stats["name"]}"}} {stats["hit_rate"]:.6f}')
+        lines.append('# TYPE result_cache_lookups_total counter')
+        for stats in cache_stats:
+            lines.append(f'result_cache_lookups_total{{cache="{stats["name"]}",result="hit"}} {stats["hits"]}')
+            lines.append(f'result_cache_lookups_total{{cache="{stats["name"]}",result="miss"}} {stats["misses"]}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+# [statement count, seconds] for the request being handled in this context
+_request_queries = contextvars.ContextVar('request_queries', default=None)
+
+
+# ----------------------------------------------------------------------
+# Requests
+# ----------------------------------------------------------------------
+
+def init_app(app):
+    """Time every request and count the SQL it runs"""
+    if not ENABLED:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = [0, 0.0]
+        g.metrics_token = _request_queries.set(g.metrics_queries)
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            queries, query_seconds = g.pop('metrics_queries', (0, 0.0))
+            metrics.record_request(
+                request.endpoint or 'unmatched', request.method, response.status_code,
+                time.perf_counter() - started, queries, query_seconds
+            )
+        _reset_request_queries()
+        return response
+
+    @app.teardown_request
+    def end_request_metrics(exc):
+        # after_request is skipped when a view raises; this always runs
+        _reset_request_queries()
+
+    def _reset_request_queries():
+        token = g.pop('metrics_token', None)
+        if token is not None:
+            _request_queries.reset(token)
+
+
+# ----------------------------------------------------------------------
+# Database
+# ----------------------------------------------------------------------
+
+class InstrumentedCursor:
+    """Cursor that times and counts the statements it executes"""
+
+    def __init__(self, cursor):
+        object.__setattr__(self, '_cursor', cursor)
+
+    def _timed(self, method, *args, count=False):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            current = _request_queries.get()
+            if current is not None:
+                current[0] += count
+                current[1] += elapsed
+            metrics.record_query(elapsed, int(count))
+
+    def execute(self, *args):
+        self._timed(self._cursor.execute, *args, count=True)
+        return self
+
+    def executemany(self, *args):
+        self._timed(self._cursor.executemany, *args, count=True)
+        return self
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+    def fetchmany(self, *args):
+        return self._timed(self._cursor.fetchmany, *args)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # e.g. cursor.row_factory = sqlite3.Row
+        setattr(self._cursor, name, value)
+
+
+class InstrumentedConnection:
+    """Connection whose cursors are instrumented"""
+
+    def __init__(self, connection):
+        object.__setattr__(self, '_connection', connection)
+
+    def cursor(self, *args):
+        return InstrumentedCursor(self._connection.cursor(*args))
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def __enter__(self):
+        self._connection.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._connection.__exit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __setattr__(self, name, value):
+        # row_factory, isolation_level, text_factory... belong to the real connection
+        setattr(self._connection, name, value)
+
+
+def instrument_database():
+    """
+    Wrap modules.database.get_connection so every connection is instrumented.
+
+    Must run before other modules do "from modules.database import
+    get_connection" at import time; call sites that import it inside
+    functions pick up the wrapper whenever it is installed.
+    """
+    if not ENABLED:
+        return
+    import modules.database as database
+    original = database.get_connection
+    if getattr(original, 'instrumented', False):
+        return
+
+    @functools.wraps(original)
+    def get_connection(*args, **kwargs):
+        return InstrumentedConnection(original(*args, **kwargs))
+
+    get_connection.instrumented = True
+    database.get_connection = get_connection
+
+
+# ----------------------------------------------------------------------
+# Scraper
+# ----------------------------------------------------------------------
+
+_scrape_fetch = threading.local()
+
+
+def _response_hook(response, *args, **kwargs):
+    metrics.record_scrape_status(response.status_code)
+    elapsed = response.elapsed.total_seconds()
+    _scrape_fetch.seconds = getattr(_scrape_fetch, 'seconds', 0.0) + elapsed
+    return response
+
+
+def instrument_scraper(scraper):
+    """
+    Time a scraper's public calls, splitting HTTP fetch time from parsing.
+
+    Fetch time and status codes come from a response hook on the scraper's
+    requests session; without one, each call is recorded as a whole.
+    """
+    if not ENABLED:
+        return scraper
+    session = getattr(scraper, 'session', None)
+    hooks = getattr(session, 'hooks', None)
+    if isinstance(hooks, dict):
+        hooks.setdefault('response', []).append(_response_hook)
+
+    for name in SCRAPER_METHODS:
+        method = getattr(scraper, name, None)
+        if method is None:
+            continue
+
+        def timed(*args, _method=method, _name=name, **kwargs):
+            fetched_before = getattr(_scrape_fetch, 'seconds', 0.0)
+            start = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                total = time.perf_counter() - start
+                if isinstance(hooks, dict):
+                    fetched = getattr(_scrape_fetch, 'seconds', 0.0) - fetched_before
+                    metrics.record_scrape(_name, 'fetch', fetched)
+                    metrics.record_scrape(_name, 'parse', max(0.0, total - fetched))
+                else:
+                    metrics.record_scrape(_name, 'total', total)
+
+        setattr(scraper, name, functools.wraps(method)(timed))
+    return scraper
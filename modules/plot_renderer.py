@@ -0,0 +1,276 @@
+"""
+Pulse plot rendering service.
+
+Plots are drawn with matplotlib's object-oriented Figure/Agg API in a small
+pool of worker processes that import matplotlib once at startup. Request
+handlers submit a plain-data render spec and wait for the image bytes, so
+rendering never touches pyplot's global state and concurrent requests
+cannot interfere with each other.
+
+Render specs are stored in the pulse_plot_specs table under a content
+hash of the plot data and options, so an image URL made by one worker
+process can be rendered by any other, and stays valid across restarts.
+A spec not registered again for SPEC_TTL_DAYS is pruned, so specs of old or
+deleted tests don't accumulate. Specs and rendered images are also cached in memory, so a plot that has
+already been drawn is served without a database read or a render.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from modules.database import get_connection
+from modules.logging_config import listener_stopped
+from modules.result_cache import ResultCache
+
+IMAGE_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+# Specs not registered again within this many days are deleted
+SPEC_TTL_DAYS = int(os.environ.get('PLOT_SPEC_TTL_DAYS', 30))
+
+# Seconds between pruning passes in each process
+PRUNE_INTERVAL = 3600
+
+
+def _init_worker():
+    """Pre-import matplotlib in each worker process"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+def _ping():
+    return os.getpid()
+
+
+def render_pulse_plot(spec):
+    """
+    Draw a pulse plot and return the encoded image bytes.
+
+    spec is a dict with swimmer_name, test_date, swim_speeds, sum_heart_rates,
+    an optional regression {"slope", "intercept"} and an optional format
+    ("png" or "svg", default "png").
+    """
+    import numpy as np
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    swim_speeds = spec['swim_speeds']
+    sum_heart_rates = spec['sum_heart_rates']
+    regression = spec.get('regression')
+
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.scatter(swim_speeds, sum_heart_rates)
+
+    if regression:
+        slope, intercept = regression['slope'], regression['intercept']
+        fit_speeds = np.linspace(min(swim_speeds), max(swim_speeds), 100)
+        ax.plot(fit_speeds, slope * fit_speeds + intercept, 'r--')
+        equation = f"HR Sum = {slope:.2f} × Speed + {intercept:.2f}"
+        ax.text(min(swim_speeds), max(sum_heart_rates), equation, fontsize=10)
+
+    ax.set_title(f"Pulse Plot - {spec['swimmer_name']} - {spec['test_date']}")
+    ax.set_xlabel("Swim Speed (yards/second)")
+    ax.set_ylabel("Heart Rate Sum (10s + 30s + 60s)")
+    ax.grid(True)
+
+    buf = BytesIO()
+    fig.savefig(buf, format=spec.get('format', 'png'))
+    return buf.getvalue()
+
+
+def render_pulse_overlay(spec):
+    """
+    Draw every swimmer's pulse plot line on one chart and return the image bytes.
+
+    spec is a dict with title and series, a list of {"name", "speed_range",
+    "regression", "points"} where points is an already downsampled list of
+    [speed, hr_sum] pairs. Each fit line is drawn as a single segment over
+    the swimmer's speed range.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    series = spec['series']
+    fig = Figure(figsize=(12, 7))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    for entry in series:
+        points = entry.get('points') or []
+        scatter = ax.scatter([p[0] for p in points], [p[1] for p in points], s=12, alpha=0.5)
+        regression = entry.get('regression')
+        if regression and entry.get('speed_range'):
+            low, high = entry['speed_range']
+            ax.plot(
+                [low, high],
+                [regression['slope'] * low + regression['intercept'], regression['slope'] * high + regression['intercept']],
+                '-', color=scatter.get_facecolor()[0], linewidth=1.5, label=entry['name']
+            )
+
+    ax.set_title(spec['title'])
+    ax.set_xlabel("Swim Speed (yards/second)")
+    ax.set_ylabel("Heart Rate Sum (10s + 30s + 60s)")
+    ax.grid(True)
+    if series:
+        ax.legend(fontsize=7, ncol=2 if len(series) > 15 else 1, loc='upper left')
+
+    buf = BytesIO()
+    fig.savefig(buf, format=spec.get('format', 'png'))
+    return buf.getvalue()
+
+
+def render_plot(spec):
+    """Render a spec with the renderer for its kind ("pulse" or "overlay")"""
+    if spec.get('kind') == 'overlay':
+        return render_pulse_overlay(spec)
+    return render_pulse_plot(spec)
+
+
+def plot_key(spec):
+    """Content hash of a render spec, ignoring the output format"""
+    content = {key: value for key, value in spec.items() if key != 'format'}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+
+class PlotRenderer:
+    """Process pool that renders plots off the request thread"""
+
+    def __init__(self, max_workers=2, timeout=30, cache_size=256):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._pruned_at = 0.0
+        # Specs are tiny, so many more are kept than rendered images
+        self.specs = ResultCache('pulse_plot_specs', maxsize=cache_size * 16)
+        self.images = ResultCache('pulse_plot_images', maxsize=cache_size)
+
+    def start(self):
+        """Start the worker processes; call at startup, before serving requests"""
+        with self._lock:
+            if self._executor is None:
+                # fork keeps workers from re-importing the app's main module
+                method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+                # No logging thread may be running while the workers fork,
+                # including when a broken pool is replaced mid-request
+                with listener_stopped():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context(method),
+                        initializer=_init_worker
+                    )
+                    # Workers are launched on the first submission
+                    self._executor.submit(_ping).result(timeout=self.timeout)
+        return self
+
+    def submit(self, func, *args):
+        """Queue a render job and return its future"""
+        if self._executor is None:
+            self.start()
+        return self._executor.submit(func, *args)
+
+    def render(self, spec):
+        """Render a plot spec in the pool and wait for the image bytes"""
+        try:
+            return self.submit(render_plot, spec).result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # A worker died; replace the pool and retry once
+            self.shutdown()
+            return self.submit(render_plot, spec).result(timeout=self.timeout)
+
+    def ensure_schema(self):
+        """Create the render spec table if needed"""
+        if self._schema_ready:
+            return
+        conn = get_connection()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS pulse_plot_specs (
+                    plot_key TEXT PRIMARY KEY,
+                    spec TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    registered_at REAL
+                )
+            ''')
+            if 'registered_at' not in {row[1] for row in conn.execute('PRAGMA table_info(pulse_plot_specs)')}:
+                conn.execute('ALTER TABLE pulse_plot_specs ADD COLUMN registered_at REAL')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_pulse_plot_specs_registered ON pulse_plot_specs (registered_at)
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+        self._schema_ready = True
+
+    def register(self, spec):
+        """Store a render spec (renewing its TTL) and return its content-hash key"""
+        key = plot_key(spec)
+        if self.specs.get(key) is None:
+            spec = {k: v for k, v in spec.items() if k != 'format'}
+            self.ensure_schema()
+            now = time.time()
+            conn = get_connection()
+            try:
+                conn.execute('''
+                    INSERT INTO pulse_plot_specs (plot_key, spec, registered_at) VALUES (?, ?, ?)
+                    ON CONFLICT (plot_key) DO UPDATE SET registered_at = excluded.registered_at
+                ''', (key, json.dumps(spec), now))
+                if now - self._pruned_at >= PRUNE_INTERVAL:
+                    self._pruned_at = now
+                    self._prune(conn, now)
+                conn.commit()
+            finally:
+                conn.close()
+            self.specs.put(key, spec)
+        return key
+
+    @staticmethod
+    def _prune(conn, now):
+        # Rows from before registered_at existed are aged from created_at
+        conn.execute('''
+            DELETE FROM pulse_plot_specs
+            WHERE COALESCE(registered_at, CAST(strftime('%s', created_at) AS REAL)) < ?
+        ''', (now - SPEC_TTL_DAYS * 86400,))
+
+    def _load_spec(self, key):
+        """A registered spec from memory or the database, or None"""
+        spec = self.specs.get(key)
+        if spec is not None:
+            return spec
+        self.ensure_schema()
+        conn = get_connection()
+        try:
+            row = conn.execute('SELECT spec FROM pulse_plot_specs WHERE plot_key = ?', (key,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        spec = json.loads(row[0])
+        self.specs.put(key, spec)
+        return spec
+
+    def get_image(self, key, fmt='png'):
+        """Image bytes for a registered spec, rendering on a cache miss; None for unknown keys"""
+        spec = self._load_spec(key)
+        if spec is None:
+            return None
+        return self.images.get_or_compute(
+            (key, fmt), lambda: self.render(dict(spec, format=fmt))
+        )
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
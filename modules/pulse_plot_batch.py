@@ -0,0 +1,150 @@
+"""
+Test-day batch ingestion for the Salo pulse plot test.
+
+A whole group's results are validated against the 8-interval protocol,
+saved in one transaction, fitted in one vectorized regression pass and
+drawn as a single overlay chart.
+"""
+
+import numpy as np
+
+from modules.database import get_connection
+from modules.pulse_trends import batch_regression, count_sums_to_bpm
+
+PROTOCOL_INTERVALS = 8
+
+# Points drawn per swimmer on the group overlay chart
+OVERLAY_POINTS_PER_SWIMMER = 4
+
+
+def validate_pulse_entry(entry):
+    """Return a list of protocol errors for one swimmer's results (empty when valid)"""
+    errors = []
+    if not entry.get('swimmer_id'):
+        errors.append('swimmer_id is required')
+    else:
+        try:
+            int(entry['swimmer_id'])
+        except (TypeError, ValueError):
+            errors.append('swimmer_id must be a number')
+
+    for field in ('hr_10s', 'hr_30s', 'hr_60s', 'swim_times'):
+        values = entry.get(field)
+        if not isinstance(values, list) or len(values) != PROTOCOL_INTERVALS:
+            errors.append(f'{field} must have {PROTOCOL_INTERVALS} measurements')
+            continue
+        try:
+            numbers = [float(value) for value in values]
+        except (TypeError, ValueError):
+            errors.append(f'{field} must be numeric')
+            continue
+        if field == 'swim_times' and any(number <= 0 for number in numbers):
+            errors.append('swim_times must all be greater than zero')
+        elif any(number < 0 for number in numbers):
+            errors.append(f'{field} cannot be negative')
+    return errors
+
+
+def pulse_matrices(entries, interval_distance):
+    """
+    Speed and HR sum matrices for a validated batch.
+
+    Returns (speeds, heart_rate_sums, count_sums): speeds in yards/second,
+    heart rate sums in bpm (as generate_pulse_plot uses) and the raw count
+    sums stored with each test.
+    """
+    swim_times = np.array([entry['swim_times'] for entry in entries], dtype=float)
+    counts = np.stack([
+        np.array([entry[field] for entry in entries], dtype=float)
+        for field in ('hr_10s', 'hr_30s', 'hr_60s')
+    ])
+    speeds = interval_distance / swim_times
+    count_sums = counts.sum(axis=0)
+    return speeds, count_sums_to_bpm(count_sums), count_sums
+
+
+def _swimmer_names(cursor, swimmer_ids):
+    """Names for a set of swimmer ids in one query"""
+    if not swimmer_ids:
+        return {}
+    cursor.execute(
+        f"SELECT id, name FROM swimmers WHERE id IN ({', '.join('?' * len(swimmer_ids))})",
+        list(swimmer_ids)
+    )
+    return dict(cursor.fetchall())
+
+
+def save_pulse_test_batch(store, test_date, stroke, interval_distance, entries):
+    """
+    Save a validated batch of pulse plot tests in one transaction of the
+    given PulsePlotStore.
+
+    Returns one result dict per entry with the swimmer, speeds, HR sums and
+    fitted regression.
+    """
+    speeds, heart_rate_sums, count_sums = pulse_matrices(entries, interval_distance)
+    # Like a single test, a swimmer is only fitted when every count is valid
+    slopes, intercepts, r_squared = batch_regression(speeds, heart_rate_sums, require_all=True)
+
+    conn = get_connection()
+    try:
+        names = _swimmer_names(conn.cursor(), {int(entry['swimmer_id']) for entry in entries})
+    finally:
+        conn.close()
+
+    store.save_tests([
+        {
+            'swimmer_id': int(entry['swimmer_id']),
+            'test_date': test_date,
+            'stroke': stroke,
+            'swim_times': entry['swim_times'],
+            'hr_10s': entry['hr_10s'],
+            'hr_30s': entry['hr_30s'],
+            'hr_60s': entry['hr_60s'],
+            'swim_speeds': speeds[row].tolist(),
+            'sum_heart_rates': count_sums[row].astype(int).tolist()
+        }
+        for row, entry in enumerate(entries)
+    ])
+
+    results = []
+    for row, entry in enumerate(entries):
+        swimmer_id = int(entry['swimmer_id'])
+        fitted = bool(np.isfinite(slopes[row]))
+        results.append({
+            'swimmer_id': swimmer_id,
+            'swimmer_name': entry.get('swimmer_name') or names.get(swimmer_id, f'Swimmer {swimmer_id}'),
+            'swim_speeds': speeds[row].tolist(),
+            'sum_heart_rates': heart_rate_sums[row].astype(int).tolist(),
+            'regression': {
+                'slope': float(slopes[row]),
+                'intercept': float(intercepts[row]),
+                'r_squared': float(r_squared[row]) if np.isfinite(r_squared[row]) else None
+            } if fitted else None
+        })
+    return results
+
+
+def overlay_spec(title, results, points_per_swimmer=OVERLAY_POINTS_PER_SWIMMER):
+    """
+    Render spec for the group overlay chart.
+
+    Each swimmer contributes one fit line and a few evenly spaced test points,
+    keeping the chart readable (and the spec small) for 30 swimmers.
+    """
+    series = []
+    for result in results:
+        speeds = np.asarray(result['swim_speeds'], dtype=float)
+        heart_rates = np.asarray(result['sum_heart_rates'], dtype=float)
+        order = np.argsort(speeds)
+        picks = order[np.linspace(0, len(order) - 1, min(points_per_swimmer, len(order))).round().astype(int)]
+        series.append({
+            'name': result['swimmer_name'],
+            'speed_range': [round(float(speeds.min()), 3), round(float(speeds.max()), 3)],
+            'regression': {
+                'slope': round(result['regression']['slope'], 3),
+                'intercept': round(result['regression']['intercept'], 3)
+            } if result['regression'] else None,
+            'points': [[round(float(speeds[i]), 3), float(heart_rates[i])] for i in picks]
+        })
+    return {'kind': 'overlay', 'title': title, 'series': series}
@@ -0,0 +1,351 @@
+"""
+The pulse plot test store.
+
+The pulse_plot_tests table is the only store for pulse plot tests; lookups
+and deletes go through an index on (swimmer_id, test_date, stroke). An
+optional file export (PULSE_PLOT_EXPORT_LOG) is kept as an append-only
+JSON-lines log of saves and deletes that is compacted periodically, instead
+of rewriting a whole JSON file per swimmer on every change. Appends and
+compaction take an exclusive flock on <log>.lock, so worker processes
+sharing the log never lose each other's lines.
+
+Existing pulse_plot_data/<name>.json histories can be imported once with:
+
+    python -m modules.pulse_plot_store import [pulse_plot_data]
+"""
+
+import glob
+import json
+import logging
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock
+    fcntl = None
+
+from modules.database import get_connection
+from modules.pulse_trends import pulse_count_sums
+
+logger = logging.getLogger(__name__)
+
+EXPORT_LOG_PATH = os.environ.get('PULSE_PLOT_EXPORT_LOG')
+
+# Compact the export log once this many records have been appended since the last compaction
+COMPACT_EVERY = 500
+
+
+def _speeds_and_sums(swim_times, hr_10s, hr_30s, hr_60s, interval_distance):
+    """Speeds (yards/second) and raw heart rate count sums stored with a test"""
+    swim_speeds = [interval_distance / float(time) if float(time) > 0 else 0 for time in swim_times]
+    return swim_speeds, pulse_count_sums(hr_10s, hr_30s, hr_60s)
+
+
+class PulsePlotStore:
+    """Database-backed pulse plot tests with an optional append-only export log"""
+
+    def __init__(self, export_log_path=EXPORT_LOG_PATH):
+        self.export_log_path = export_log_path
+        self._log_lock = threading.Lock()
+        self._appended_since_compaction = 0
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        """Create the tests table and its lookup index if needed"""
+        if self._schema_ready:
+            return
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS pulse_plot_tests (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    swimmer_id INTEGER,
+                    test_date TEXT,
+                    stroke TEXT,
+                    swim_times TEXT,
+                    hr_10s TEXT,
+                    hr_30s TEXT,
+                    hr_60s TEXT,
+                    swim_speeds TEXT,
+                    sum_heart_rates TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (swimmer_id) REFERENCES swimmers (id)
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_pulse_plot_tests_swimmer_date_stroke
+                ON pulse_plot_tests (swimmer_id, test_date, stroke)
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+        self._schema_ready = True
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def save_tests(self, tests):
+        """
+        Insert several tests in one transaction.
+
+        Each test is a dict with swimmer_id, test_date, stroke, swim_times,
+        hr_10s, hr_30s, hr_60s and optionally interval_distance (default 100),
+        swim_speeds and sum_heart_rates. Returns the new row ids.
+        """
+        self.ensure_schema()
+        rows = []
+        for test in tests:
+            swim_speeds, sum_heart_rates = _speeds_and_sums(
+                test['swim_times'], test['hr_10s'], test['hr_30s'], test['hr_60s'],
+                test.get('interval_distance', 100)
+            )
+            rows.append((
+                test.get('swimmer_id'),
+                test['test_date'],
+                test.get('stroke') or 'freestyle',
+                json.dumps(test['swim_times']),
+                json.dumps(test['hr_10s']),
+                json.dumps(test['hr_30s']),
+                json.dumps(test['hr_60s']),
+                json.dumps(test.get('swim_speeds', swim_speeds)),
+                json.dumps(test.get('sum_heart_rates', sum_heart_rates))
+            ))
+
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            ids = []
+            for row in rows:
+                cursor.execute('''
+                    INSERT INTO pulse_plot_tests
+                    (swimmer_id, test_date, stroke, swim_times, hr_10s, hr_30s, hr_60s, swim_speeds, sum_heart_rates)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', row)
+                ids.append(cursor.lastrowid)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        self._export([
+            {'op': 'save', 'id': test_id, 'swimmer_id': row[0], 'test_date': row[1], 'stroke': row[2],
+             'swim_times': json.loads(row[3]), 'hr_10s': json.loads(row[4]),
+             'hr_30s': json.loads(row[5]), 'hr_60s': json.loads(row[6])}
+            for test_id, row in zip(ids, rows)
+        ])
+        return ids
+
+    def save_test(self, swimmer_id, swimmer_name, test_date, swim_times, hr_10s, hr_30s, hr_60s,
+                  stroke='freestyle', interval_distance=100):
+        """Save one test; returns {"success": True, "test_id": ...} or {"success": False, "error": ...}"""
+        try:
+            test_id = self.save_tests([{
+                'swimmer_id': swimmer_id,
+                'test_date': test_date,
+                'stroke': stroke,
+                'swim_times': swim_times,
+                'hr_10s': hr_10s,
+                'hr_30s': hr_30s,
+                'hr_60s': hr_60s,
+                'interval_distance': interval_distance
+            }])[0]
+            return {'success': True, 'test_id': test_id, 'message': f'Test saved for {swimmer_name} on {test_date}'}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def delete_test(self, swimmer_id, test_date, stroke):
+        """Delete a swimmer's test for a date and stroke; returns the number of rows removed"""
+        self.ensure_schema()
+        swimmer_id = int(swimmer_id)
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                DELETE FROM pulse_plot_tests
+                WHERE swimmer_id = ? AND test_date = ? AND stroke = ?
+            ''', (swimmer_id, test_date, stroke))
+            deleted_count = cursor.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+
+        if deleted_count:
+            self._export([{'op': 'delete', 'swimmer_id': swimmer_id, 'test_date': test_date, 'stroke': stroke}])
+        return deleted_count
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def load_history(self, swimmer_id):
+        """All of a swimmer's tests, newest first"""
+        self.ensure_schema()
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, test_date, stroke, swim_times, hr_10s, hr_30s, hr_60s,
+                       swim_speeds, sum_heart_rates, created_at
+                FROM pulse_plot_tests
+                WHERE swimmer_id = ?
+                ORDER BY test_date DESC, created_at DESC
+            ''', (swimmer_id,))
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        return [
+            {
+                'id': row[0],
+                'test_date': row[1],
+                'stroke': row[2] or 'freestyle',
+                'swim_times': json.loads(row[3]) if row[3] else [],
+                'hr_10s': json.loads(row[4]) if row[4] else [],
+                'hr_30s': json.loads(row[5]) if row[5] else [],
+                'hr_60s': json.loads(row[6]) if row[6] else [],
+                'swim_speeds': json.loads(row[7]) if row[7] else [],
+                'sum_heart_rates': json.loads(row[8]) if row[8] else [],
+                'created_at': row[9]
+            }
+            for row in rows
+        ]
+
+    # ------------------------------------------------------------------
+    # Export log
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _locked_log(self):
+        """Hold the export log against other threads and other processes"""
+        with self._log_lock:
+            if fcntl is None:
+                yield
+                return
+            # A separate lock file, since compaction replaces the log itself
+            with open(self.export_log_path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _export(self, records):
+        """Append records to the export log, compacting it periodically"""
+        if not self.export_log_path or not records:
+            return
+        try:
+            with self._locked_log():
+                with open(self.export_log_path, 'a') as f:
+                    for record in records:
+                        f.write(json.dumps(record) + '\n')
+                self._appended_since_compaction += len(records)
+                if self._appended_since_compaction >= COMPACT_EVERY:
+                    self._compact_locked()
+        except OSError as e:
+            logger.warning('Could not write pulse plot export log', extra={'error': str(e)})
+
+    def compact_export_log(self):
+        """Rewrite the export log with only the tests that still exist"""
+        if not self.export_log_path:
+            return
+        with self._locked_log():
+            self._compact_locked()
+
+    def _compact_locked(self):
+        if not os.path.exists(self.export_log_path):
+            self._appended_since_compaction = 0
+            return
+
+        live = {}
+        with open(self.export_log_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                key = (record.get('swimmer_id'), record.get('test_date'), record.get('stroke'))
+                if record.get('op') == 'delete':
+                    live.pop(key, None)
+                else:
+                    live.setdefault(key, []).append(record)
+
+        temp_path = self.export_log_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            for records in live.values():
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+        os.replace(temp_path, self.export_log_path)
+        self._appended_since_compaction = 0
+
+
+def import_json_histories(directory='pulse_plot_data', store=None):
+    """
+    One-off import of pulse_plot_data/<swimmer_name>.json files.
+
+    Files are matched to swimmers by name; tests already in the database for
+    the same swimmer, date and stroke are skipped. Returns a summary dict.
+    """
+    store = store or PulsePlotStore()
+    store.ensure_schema()
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, name FROM swimmers')
+        swimmer_ids = {name.lower().replace(' ', '_'): swimmer_id for swimmer_id, name in cursor.fetchall() if name}
+        cursor.execute('SELECT swimmer_id, test_date, stroke FROM pulse_plot_tests')
+        existing = set(cursor.fetchall())
+    finally:
+        conn.close()
+
+    summary = {'imported': 0, 'skipped': 0, 'unmatched_files': []}
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        file_key = os.path.splitext(os.path.basename(path))[0].lower()
+        swimmer_id = swimmer_ids.get(file_key)
+        if swimmer_id is None:
+            summary['unmatched_files'].append(path)
+            continue
+
+        with open(path, 'r') as f:
+            tests = json.load(f)
+
+        new_tests = []
+        for test in tests:
+            test_date = test.get('date') or test.get('test_date')
+            stroke = test.get('stroke') or 'freestyle'
+            if not test_date or (swimmer_id, test_date, stroke) in existing:
+                summary['skipped'] += 1
+                continue
+            existing.add((swimmer_id, test_date, stroke))
+            new_tests.append({
+                'swimmer_id': swimmer_id,
+                'test_date': test_date,
+                'stroke': stroke,
+                'swim_times': test.get('swim_times', []),
+                'hr_10s': test.get('hr_10s', []),
+                'hr_30s': test.get('hr_30s', []),
+                'hr_60s': test.get('hr_60s', [])
+            })
+
+        if new_tests:
+            store.save_tests(new_tests)
+            summary['imported'] += len(new_tests)
+
+    return summary
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'import':
+        print("Usage: python -m modules.pulse_plot_store import [pulse_plot_data]")
+        sys.exit(2)
+    result = import_json_histories(sys.argv[2] if len(sys.argv) > 2 else 'pulse_plot_data')
+    print(f"Imported {result['imported']} tests, skipped {result['skipped']} already in the database")
+    for path in result['unmatched_files']:
+        print(f"  No swimmer matches {path}")
@@ -0,0 +1,231 @@
+"""
+Longitudinal pulse plot trend analysis.
+
+All of a swimmer's (or a training group's) stored pulse plot tests are
+loaded as one matrix of speeds and heart rate sums; the HR sum vs speed line
+of every test is fitted in a single batched least-squares step, and the
+slope and intercept series are analysed for trends and step changes.
+
+Tests store the raw sums of the 10-second pulse counts; every fit is done
+on bpm sums (counts x 6) from count_sums_to_bpm, the same units
+generate_pulse_plot reports.
+"""
+
+import json
+from datetime import datetime
+
+import numpy as np
+
+from modules.database import get_connection
+
+# Pulse counts are taken over 10 seconds
+BPM_PER_COUNT = 6
+
+# A test-to-test change is flagged when it exceeds both this many standard
+# deviations of the swimmer's changes and the absolute minimum below (bpm sums)
+CHANGE_STD_THRESHOLD = 2.0
+MIN_SLOPE_CHANGE = 30.0
+MIN_INTERCEPT_CHANGE = 60.0
+
+
+def pulse_count_sums(hr_10s, hr_30s, hr_60s):
+    """Per-interval sums of the 10, 30 and 60 second pulse counts, 0 where a count is invalid"""
+    sums = []
+    for hr_10, hr_30, hr_60 in zip(hr_10s, hr_30s, hr_60s):
+        try:
+            sums.append(int(hr_10) + int(hr_30) + int(hr_60))
+        except (TypeError, ValueError):
+            sums.append(0)
+    return sums
+
+
+def count_sums_to_bpm(count_sums):
+    """Pulse count sums (a list or array) as heart rate sums in bpm"""
+    if isinstance(count_sums, np.ndarray):
+        return count_sums * BPM_PER_COUNT
+    return [count * BPM_PER_COUNT for count in count_sums]
+
+
+def batch_regression(speeds, heart_rates, require_all=False):
+    """
+    Fit HR sum = slope x speed + intercept for every row at once.
+
+    speeds and heart_rates are (n_tests, n_points) arrays; NaN or
+    non-positive entries are ignored, or with require_all leave their whole
+    row unfit (the rule for freshly entered tests, where a zero is a missed
+    count). Returns (slopes, intercepts, r_squared) arrays, NaN for rows
+    with fewer than two valid points.
+    """
+    x = np.asarray(speeds, dtype=float)
+    y = np.asarray(heart_rates, dtype=float)
+    valid = np.isfinite(x) & np.isfinite(y) & (x > 0) & (y > 0)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y, 0.0)
+
+    n = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = x.sum(axis=1) / n
+        mean_y = y.sum(axis=1) / n
+        dx = np.where(valid, x - mean_x[:, None], 0.0)
+        dy = np.where(valid, y - mean_y[:, None], 0.0)
+        sxx = (dx * dx).sum(axis=1)
+        sxy = (dx * dy).sum(axis=1)
+        syy = (dy * dy).sum(axis=1)
+
+        slopes = sxy / sxx
+        intercepts = mean_y - slopes * mean_x
+        r_squared = (sxy * sxy) / (sxx * syy)
+
+    unfit = (n < 2) | (sxx == 0)
+    if require_all:
+        unfit |= ~valid.all(axis=1)
+    slopes[unfit] = np.nan
+    intercepts[unfit] = np.nan
+    r_squared[unfit | (syy == 0)] = np.nan
+    return slopes, intercepts, r_squared
+
+
+def _as_row(values, width=8):
+    """JSON list -> fixed width float row padded with NaN"""
+    row = np.full(width, np.nan)
+    try:
+        parsed = json.loads(values) if values else []
+        parsed = [float(value) for value in parsed[:width]]
+    except (TypeError, ValueError):
+        parsed = []
+    row[:len(parsed)] = parsed
+    return row
+
+
+def load_pulse_tests(swimmer_id=None, group_id=None, stroke=None):
+    """
+    Load pulse plot tests for one swimmer or a training group in one query.
+
+    Returns (tests, speeds, heart_rates) where tests is a list of dicts
+    (swimmer_id, swimmer_name, test_date, stroke) aligned with the rows of
+    the (n_tests, 8) speed and HR sum (bpm) matrices. Tests are ordered by
+    swimmer and date.
+    """
+    conditions, params = [], []
+    if swimmer_id is not None:
+        conditions.append('p.swimmer_id = ?')
+        params.append(swimmer_id)
+    if group_id is not None:
+        conditions.append('s.training_group_id = ?')
+        params.append(group_id)
+    if stroke:
+        conditions.append('p.stroke = ?')
+        params.append(stroke)
+    where = ' AND '.join(conditions) if conditions else '1 = 1'
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT p.swimmer_id, s.name, p.test_date, p.stroke, p.swim_speeds, p.sum_heart_rates
+            FROM pulse_plot_tests p
+            LEFT JOIN swimmers s ON s.id = p.swimmer_id
+            WHERE {where}
+            ORDER BY p.swimmer_id, p.test_date, p.created_at
+        ''', params)
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    tests = [
+        {'swimmer_id': row[0], 'swimmer_name': row[1], 'test_date': row[2], 'stroke': row[3] or 'freestyle'}
+        for row in rows
+    ]
+    speeds = np.array([_as_row(row[4]) for row in rows]).reshape(len(rows), 8)
+    count_sums = np.array([_as_row(row[5]) for row in rows]).reshape(len(rows), 8)
+    return tests, speeds, count_sums_to_bpm(count_sums)
+
+
+def _date_ordinal(test_date):
+    """Day number for a stored test date, or None if it can't be parsed"""
+    for fmt in ('%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%m/%d/%Y'):
+        try:
+            return datetime.strptime(test_date, fmt).toordinal()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _flag_changes(values, minimum):
+    """Test-to-test changes and whether each one is significant"""
+    changes = np.full(len(values), np.nan)
+    changes[1:] = np.diff(values)
+    finite = np.isfinite(changes)
+    spread = np.std(changes[finite]) if finite.sum() > 1 else 0.0
+    threshold = max(minimum, CHANGE_STD_THRESHOLD * spread)
+    significant = finite & (np.abs(np.where(finite, changes, 0.0)) > threshold)
+    return changes, significant
+
+
+def _per_30_days(days, values):
+    """Linear trend of values over time, in units per 30 days"""
+    usable = np.isfinite(values) & np.isfinite(days)
+    if usable.sum() < 2 or np.ptp(days[usable]) == 0:
+        return None
+    slope, _ = np.polyfit(days[usable], values[usable], 1)
+    return float(slope * 30)
+
+
+def _clean(value):
+    """JSON-safe float (NaN -> None)"""
+    return None if value is None or not np.isfinite(value) else round(float(value), 3)
+
+
+def analyze_trends(tests, speeds, heart_rates):
+    """
+    Per-swimmer slope and intercept trends with change detection.
+
+    Returns a list with one entry per swimmer (and stroke) holding the
+    fitted line of every test, the trend per 30 days and flagged changes.
+    """
+    slopes, intercepts, r_squared = batch_regression(speeds, heart_rates)
+    days = np.array([_date_ordinal(test['test_date']) or np.nan for test in tests], dtype=float)
+
+    series = {}
+    for index, test in enumerate(tests):
+        series.setdefault((test['swimmer_id'], test['stroke']), []).append(index)
+
+    analyses = []
+    for (swimmer_id, stroke), indexes in series.items():
+        indexes = np.array(indexes)
+        order = indexes[np.argsort(days[indexes], kind='stable')]
+        slope_changes, slope_flags = _flag_changes(slopes[order], MIN_SLOPE_CHANGE)
+        intercept_changes, intercept_flags = _flag_changes(intercepts[order], MIN_INTERCEPT_CHANGE)
+
+        slope_trend = _per_30_days(days[order], slopes[order])
+        analyses.append({
+            'swimmer_id': swimmer_id,
+            'swimmer_name': tests[order[0]]['swimmer_name'],
+            'stroke': stroke,
+            'test_count': len(order),
+            'tests': [
+                {
+                    'test_date': tests[i]['test_date'],
+                    'slope': _clean(slopes[i]),
+                    'intercept': _clean(intercepts[i]),
+                    'r_squared': _clean(r_squared[i]),
+                    'slope_change': _clean(slope_changes[position]),
+                    'intercept_change': _clean(intercept_changes[position]),
+                    'significant_change': bool(slope_flags[position] or intercept_flags[position])
+                }
+                for position, i in enumerate(order)
+            ],
+            'trend': {
+                'slope_per_30_days': _clean(slope_trend),
+                'intercept_per_30_days': _clean(_per_30_days(days[order], intercepts[order])),
+                # A flattening slope means better aerobic conditioning
+                'direction': (
+                    None if slope_trend is None
+                    else 'improving' if slope_trend < 0
+                    else 'declining' if slope_trend > 0
+                    else 'stable'
+                )
+            }
+        })
+
+    return analyses
@@ -0,0 +1,223 @@
+"""
+On-demand request profiler.
+
+A request is profiled with cProfile when it carries the profiler token
+(X-Profile-Token header or __profile query parameter matching
+PROFILER_TOKEN), or when PROFILER_SAMPLE_EVERY=N is set and it is one of
+every N requests. Profiles are written to PROFILER_DIR as .pstats files
+with a small JSON summary, and the newest PROFILER_MAX_PROFILES are kept.
+
+Each profile can be downloaded as pstats (for pstats/snakeviz) or as
+collapsed stacks for flamegraph.pl / speedscope. cProfile records caller
+edges rather than full stacks, so the collapsed stacks are rebuilt by
+walking the call graph from its roots and splitting each function's time
+across its callers in proportion to the calls it received from them.
+"""
+
+import cProfile
+import glob
+import hmac
+import itertools
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+
+PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN')
+SAMPLE_EVERY = int(os.environ.get('PROFILER_SAMPLE_EVERY', 0))
+PROFILE_DIR = os.environ.get('PROFILER_DIR', 'profiles')
+MAX_PROFILES = int(os.environ.get('PROFILER_MAX_PROFILES', 50))
+
+# Call-graph walk limits for collapsed stacks
+MAX_STACK_DEPTH = 64
+MIN_STACK_SECONDS = 1e-5
+
+
+def _function_label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name  # builtins, e.g. <built-in method time.sleep>
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapsed_stacks(stats):
+    """
+    Collapsed "frame;frame;frame microseconds" lines from a pstats.Stats.
+
+    Self time of each function is attributed to the call paths reaching it,
+    weighted by how many calls came in through each caller.
+    """
+    entries = stats.stats
+    callees = {}
+    # Calls each function received from other functions (recursion excluded)
+    incoming = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, caller_stats in callers.items():
+            if caller != func:
+                callees.setdefault(caller, []).append((func, caller_stats[0]))
+                incoming[func] = incoming.get(func, 0) + caller_stats[0]
+
+    lines = {}
+
+    def walk(func, path, share, depth):
+        self_time = entries[func][2]
+        label = _function_label(func)
+        if label in path or depth > MAX_STACK_DEPTH:
+            return
+        path = path + (label,)
+        own = self_time * share
+        if own >= MIN_STACK_SECONDS:
+            key = ';'.join(path)
+            lines[key] = lines.get(key, 0.0) + own
+        for callee, calls in callees.get(func, ()):
+            callee_share = share * calls / (incoming[callee] or 1)
+            if entries[callee][3] * callee_share >= MIN_STACK_SECONDS:
+                walk(callee, path, callee_share, depth + 1)
+
+    roots = [func for func, stat in entries.items() if not stat[4]]
+    for root in roots:
+        walk(root, (), 1.0, 0)
+
+    return '\n'.join(
+        f"{stack} {max(1, round(seconds * 1e6))}" for stack, seconds in sorted(lines.items())
+    ) + '\n'
+
+
+class RequestProfiler:
+    """Decides which requests to profile and stores the results"""
+
+    def __init__(self, directory=PROFILE_DIR, token=PROFILER_TOKEN, sample_every=SAMPLE_EVERY,
+                 max_profiles=MAX_PROFILES):
+        self.directory = directory
+        self.token = token
+        self.sample_every = sample_every
+        self.max_profiles = max_profiles
+        self._counter = itertools.count(1)
+        # cProfile allows one active profiler per process (Python 3.12+)
+        self._active = threading.Lock()
+
+    def authorized(self, request):
+        """Whether a request carries the profiler token"""
+        if not self.token:
+            return False
+        supplied = request.headers.get('X-Profile-Token') or request.args.get('__profile') or ''
+        return hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def should_profile(self, request):
+        """'requested', 'sampled' or None"""
+        if self.authorized(request):
+            return 'requested'
+        if self.sample_every and next(self._counter) % self.sample_every == 0:
+            return 'sampled'
+        return None
+
+    def start(self):
+        """A running profiler, or None if another request is being profiled"""
+        if not self._active.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool is active
+            self._active.release()
+            return None
+        return profiler
+
+    def finish(self, profiler, request, status, seconds, reason):
+        """Stop the profiler and save the profile; returns its id"""
+        try:
+            profiler.disable()
+        finally:
+            self._active.release()
+
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(self.directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(self.directory, f'{profile_id}.pstats'))
+        stats = pstats.Stats(profiler)
+        summary = {
+            'id': profile_id,
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': status,
+            'reason': reason,
+            'duration_ms': round(seconds * 1000, 1),
+            'function_calls': stats.total_calls,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'pid': os.getpid()
+        }
+        with open(os.path.join(self.directory, f'{profile_id}.json'), 'w') as f:
+            json.dump(summary, f)
+        self._prune()
+        return profile_id
+
+    def abandon(self, profiler):
+        """Stop a profiler without saving anything"""
+        try:
+            profiler.disable()
+        finally:
+            self._active.release()
+
+    def _prune(self):
+        summaries = sorted(glob.glob(os.path.join(self.directory, '*.json')))
+        for path in summaries[:max(0, len(summaries) - self.max_profiles)]:
+            base = path[:-len('.json')]
+            for old in (path, base + '.pstats'):
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+    def list_profiles(self):
+        """Summaries of stored profiles, newest first"""
+        profiles = []
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.json')), reverse=True):
+            try:
+                with open(path, 'r') as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def pstats_path(self, profile_id):
+        """Path of a stored profile, or None"""
+        path = os.path.join(self.directory, f'{os.path.basename(profile_id)}.pstats')
+        return path if os.path.exists(path) else None
+
+    def collapsed(self, profile_id):
+        path = self.pstats_path(profile_id)
+        if path is None:
+            return None
+        return collapsed_stacks(pstats.Stats(path))
+
+
+def init_app(app, profiler):
+    """Install the before/after request hooks that run the profiler"""
+    from flask import g, request
+
+    @app.before_request
+    def start_request_profile():
+        reason = profiler.should_profile(request)
+        if reason:
+            running = profiler.start()
+            if running is not None:
+                g.request_profile = (running, reason, time.perf_counter())
+
+    @app.after_request
+    def finish_request_profile(response):
+        state = g.pop('request_profile', None)
+        if state is not None:
+            running, reason, started = state
+            profile_id = profiler.finish(running, request, response.status_code, time.perf_counter() - started, reason)
+            response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    @app.teardown_request
+    def abandon_request_profile(exc):
+        # after_request doesn't run when a request fails with an unhandled error
+        state = g.pop('request_profile', None)
+        if state is not None:
+            profiler.abandon(state[0])
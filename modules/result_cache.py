@@ -0,0 +1,106 @@
+"""
+In-memory LRU cache for the pure calculation endpoints.
+
+/generate and /calculate_color_system only depend on their inputs, so their
+serialized responses are cached under a canonical key built from those
+inputs (times rounded to 0.01 s, the resolution times are entered at). A
+cache hit returns the stored JSON body without recomputing or re-encoding
+anything.
+"""
+
+import threading
+from collections import OrderedDict
+
+# All caches by name, for the debug endpoints
+_caches = {}
+
+
+def canonical_time(seconds):
+    """Round a time in seconds to the 0.01 s resolution used for cache keys"""
+    return round(float(seconds or 0), 2)
+
+
+def canonical_flag(value):
+    """A boolean request field as a bool; strings like "false" and "0" are False"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1', 'yes', 'on')
+    return bool(value)
+
+
+class ResultCache:
+    """Thread-safe LRU cache with hit/miss counters"""
+
+    def __init__(self, name, maxsize=1024):
+        self.name = name
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _caches[name] = self
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Size, hit/miss counters and hit rate"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+def all_cache_stats():
+    """Stats for every cache created in this process"""
+    return [cache.stats() for cache in _caches.values()]
+
+
+def interval_cache_key(times, goal_percentage, num_reps):
+    """Canonical key for a /generate request"""
+    return (
+        tuple(canonical_time(times[key]) for key in ('t50', 't100', 't200', 't500')),
+        round(float(goal_percentage), 2),
+        int(num_reps)
+    )
+
+
+def color_system_cache_key(test_type, total_seconds, drag_suit):
+    """Canonical key for a /calculate_color_system request (drag_suit already a bool)"""
+    return (test_type, canonical_time(total_seconds), bool(drag_suit))
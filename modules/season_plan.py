@@ -0,0 +1,477 @@
+"""
+Incremental season plans.
+
+A season plan splits a season into phases leading up to the target meet
+(the macrocycle), then plans each week (microcycle): its training volume
+and one workout template per training day. Each week is a pure function of
+its inputs: phase, dates, holidays in the week, training days, the
+templates tagged for its phase, and the previous week's volume (weekly
+volume may only rise 10% over the week before).
+
+A plan linked to a season (season_id) also skips the days the season's
+calendar index marks as holidays or with every pool closed.
+
+Weeks are stored in season_plan_weeks with a hash of their inputs. An edit
+(a holiday, the meet date, a phase override) recomputes only the weeks
+whose inputs hash changed. A recomputed week whose volume comes out the
+same doesn't invalidate the week after it, so a one-week edit only
+rebuilds the weeks up to the end of its training block, not the season.
+Location closures and template edits don't go through the plan, so reading
+a plan re-checks every week's hash too and rebuilds the weeks they changed.
+"""
+
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+
+from modules.database import get_connection
+from modules.template_index import TemplateIndex
+
+# Bump when the planning rules change so stored weeks are rebuilt
+PLAN_VERSION = 1
+
+PHASES = ('Base Training', 'Preparation/Build-up', 'Specific Training', 'Race Preparation', 'Taper', 'Transition')
+
+# Weekly volume as a fraction of the plan's peak volume
+PHASE_VOLUME = {
+    'Base Training': 0.85, 'Preparation/Build-up': 0.95, 'Specific Training': 1.0,
+    'Race Preparation': 0.8, 'Taper': 0.55, 'Transition': 0.45
+}
+
+# Daily focus rotation per phase, matched against template tags
+PHASE_FOCUS = {
+    'Base Training': ('Aerobic Endurance', 'Technique', 'Volume'),
+    'Preparation/Build-up': ('Aerobic Endurance', 'Technique', 'Stroke Development'),
+    'Specific Training': ('Sprint Speed', 'Aerobic Endurance', 'Power'),
+    'Race Preparation': ('Sprint Speed', 'Power', 'Technique'),
+    'Taper': ('Sprint Speed', 'Technique'),
+    'Transition': ('Technique',)
+}
+
+WEEKLY_PROGRESSION = 0.04    # volume added per week of a training block
+DELOAD_EVERY = 4             # every 4th week of a phase is a recovery week
+DELOAD_FACTOR = 0.8
+MAX_WEEKLY_INCREASE = 0.10   # over the previous week's volume
+
+DEFAULT_TRAINING_DAYS = (0, 1, 2, 3, 4, 5)  # Monday to Saturday
+DEFAULT_PEAK_VOLUME = 30000
+MAX_WEEKS = 104
+
+
+def _parse_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _num_weeks(value):
+    try:
+        num_weeks = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"num_weeks must be a whole number, not {value!r}")
+    if not 1 <= num_weeks <= MAX_WEEKS:
+        raise ValueError(f"num_weeks must be between 1 and {MAX_WEEKS}")
+    return num_weeks
+
+
+def _training_days(value):
+    """Sorted distinct weekdays (0 = Monday to 6 = Sunday); None or empty means the default"""
+    if not value:
+        return []
+    if isinstance(value, (str, dict)):
+        raise ValueError('training_days must be a list of weekdays 0-6')
+    try:
+        days = sorted({int(day) for day in value})
+    except (TypeError, ValueError):
+        raise ValueError('training_days must be a list of weekdays 0-6')
+    if days[0] < 0 or days[-1] > 6:
+        raise ValueError('training_days must be a list of weekdays 0-6')
+    return days
+
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Planning (pure functions)
+# ----------------------------------------------------------------------
+
+def phase_layout(num_weeks, meet_week, overrides=None):
+    """Phase of every week: base, build and specific blocks, then race prep and taper up to the meet"""
+    meet_week = max(0, min(meet_week, num_weeks - 1))
+    taper = 2 if meet_week >= 8 else 1
+    race_prep = min(3, max(0, meet_week + 1 - taper))
+    remaining = max(0, meet_week + 1 - taper - race_prep)
+    base = round(remaining * 0.4)
+    build = round(remaining * 0.3)
+    specific = remaining - base - build
+
+    layout = (
+        ['Base Training'] * base + ['Preparation/Build-up'] * build + ['Specific Training'] * specific
+        + ['Race Preparation'] * race_prep + ['Taper'] * taper
+    )
+    layout += ['Transition'] * (num_weeks - len(layout))
+    for week, phase in (overrides or {}).items():
+        if 0 <= int(week) < num_weeks:
+            layout[int(week)] = phase
+    return layout
+
+
+def template_catalog(templates):
+    """{phase: [template, ...]} with each phase's candidates in a stable order"""
+    catalog = {phase: [] for phase in PHASES}
+    for template in sorted(templates, key=lambda t: t['template_id']):
+        phases = template['tags'].get('phase') or []
+        for phase in PHASES:
+            if phase in phases or not phases:
+                catalog[phase].append(template)
+    return catalog
+
+
+def plan_week(inputs, candidates):
+    """Volume and daily workouts for one week from its inputs"""
+    week_start = _parse_date(inputs['start'])
+    holidays = set(inputs['holidays'])
+    phase = inputs['phase']
+
+    # Build for three weeks, recover on the fourth, and start the next block a little higher
+    block, step = divmod(inputs['weeks_into_phase'], DELOAD_EVERY)
+    volume = inputs['peak_volume'] * PHASE_VOLUME.get(phase, 1.0) * (1 + WEEKLY_PROGRESSION * (step + block / 2))
+    if step == DELOAD_EVERY - 1:
+        volume *= DELOAD_FACTOR
+    if inputs['previous_volume']:
+        volume = min(volume, inputs['previous_volume'] * (1 + MAX_WEEKLY_INCREASE))
+
+    days = [week_start + timedelta(days=day) for day in inputs['training_days']]
+    days = [day for day in days if day.isoformat() not in holidays]
+    # Missed days are lost, not squeezed into the rest of the week
+    if inputs['training_days']:
+        volume *= len(days) / len(inputs['training_days'])
+    volume = int(round(volume / 100.0) * 100)
+
+    workouts = []
+    focuses = PHASE_FOCUS.get(phase, ('Technique',))
+    for index, day in enumerate(days):
+        focus = focuses[index % len(focuses)]
+        matching = [t for t in candidates if focus in (t['tags'].get('focus') or [])] or candidates
+        yardage = int(round(volume / max(1, len(days)) / 100.0) * 100)
+        workout = {'date': day.isoformat(), 'focus': focus, 'yardage': yardage, 'template_id': None}
+        if matching:
+            template = matching[(inputs['week'] + index) % len(matching)]
+            low = template.get('total_yardage_min') or yardage
+            high = template.get('total_yardage_max') or yardage
+            workout.update(template_id=template['template_id'], yardage=max(low, min(high, yardage)))
+        workouts.append(workout)
+
+    return {
+        'week': inputs['week'], 'start': week_start.isoformat(), 'phase': phase, 'volume': volume,
+        'holidays': sorted(holidays), 'workouts': workouts
+    }
+
+
+def plan_season(settings, templates, stored=None, blocked_days=()):
+    """
+    Plan every week, reusing stored weeks whose inputs are unchanged.
+
+    stored maps week -> (inputs_hash, week_plan); blocked_days are ISO
+    dates with no training besides the plan's own holidays. Returns (weeks, changed)
+    where weeks maps week -> (inputs_hash, week_plan) and changed lists the
+    weeks that were recomputed.
+    """
+    stored = stored or {}
+    start = _parse_date(settings['start_date'])
+    num_weeks = _num_weeks(settings['num_weeks'])
+    meet_date = _parse_date(settings['meet_date']) if settings.get('meet_date') else None
+    meet_week = (meet_date - start).days // 7 if meet_date else num_weeks - 1
+    layout = phase_layout(num_weeks, meet_week, settings.get('phase_overrides'))
+    holidays = sorted(set(settings.get('holidays') or []) | set(blocked_days))
+    training_days = _training_days(settings.get('training_days')) or list(DEFAULT_TRAINING_DAYS)
+
+    catalog = template_catalog(templates)
+    catalog_hashes = {
+        phase: _digest([(t['template_id'], t['tags'], t.get('total_yardage_min'), t.get('total_yardage_max'))
+                        for t in candidates])
+        for phase, candidates in catalog.items()
+    }
+
+    weeks, changed = {}, []
+    previous_volume = None
+    weeks_into_phase = 0
+    for week in range(num_weeks):
+        week_start = start + timedelta(weeks=week)
+        week_end = (week_start + timedelta(days=7)).isoformat()
+        phase = layout[week]
+        weeks_into_phase = weeks_into_phase + 1 if week and layout[week - 1] == phase else 0
+        inputs = {
+            'version': PLAN_VERSION,
+            'week': week,
+            'start': week_start.isoformat(),
+            'phase': phase,
+            'weeks_into_phase': weeks_into_phase,
+            'holidays': [day for day in holidays if week_start.isoformat() <= day < week_end],
+            'training_days': training_days,
+            'peak_volume': settings.get('peak_volume') or DEFAULT_PEAK_VOLUME,
+            'previous_volume': previous_volume,
+            'templates': catalog_hashes.get(phase)
+        }
+        inputs_hash = _digest(inputs)
+        if week in stored and stored[week][0] == inputs_hash:
+            week_plan = stored[week][1]
+        else:
+            week_plan = plan_week(inputs, catalog.get(phase, []))
+            changed.append(week)
+        weeks[week] = (inputs_hash, week_plan)
+        previous_volume = week_plan['volume']
+    return weeks, changed
+
+
+# ----------------------------------------------------------------------
+# Storage
+# ----------------------------------------------------------------------
+
+SETTING_FIELDS = ('name', 'start_date', 'num_weeks', 'meet_date', 'holidays', 'phase_overrides',
+                  'training_days', 'peak_volume', 'season_id')
+JSON_FIELDS = ('holidays', 'phase_overrides', 'training_days')
+
+
+def _normalize_changes(changes):
+    """Validated setting changes with dates as ISO strings; raises ValueError"""
+    changes = dict(changes)
+    unknown = set(changes) - set(SETTING_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown season plan settings: {', '.join(sorted(unknown))}")
+    if 'start_date' in changes:
+        changes['start_date'] = _parse_date(changes['start_date']).isoformat()
+    if changes.get('meet_date'):
+        changes['meet_date'] = _parse_date(changes['meet_date']).isoformat()
+    for phase in (changes.get('phase_overrides') or {}).values():
+        if phase not in PHASES:
+            raise ValueError(f"Unknown training phase: {phase}")
+    if changes.get('holidays'):
+        changes['holidays'] = sorted({_parse_date(day).isoformat() for day in changes['holidays']})
+    if 'num_weeks' in changes:
+        changes['num_weeks'] = _num_weeks(changes['num_weeks'])
+    if 'training_days' in changes:
+        changes['training_days'] = _training_days(changes['training_days']) or None
+    return changes
+
+
+class SeasonPlanStore:
+    """Season plans stored per week and recomputed incrementally on edits"""
+
+    def __init__(self, calendar_index=None, template_index=None):
+        self.calendar_index = calendar_index
+        # Template edits reach the plan through the index's change tracking
+        self.template_index = template_index or TemplateIndex()
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        """Create the plan tables if needed"""
+        if self._schema_ready:
+            return
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS season_plans (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT,
+                    start_date TEXT NOT NULL,
+                    num_weeks INTEGER NOT NULL,
+                    meet_date TEXT,
+                    holidays TEXT,
+                    phase_overrides TEXT,
+                    training_days TEXT,
+                    peak_volume INTEGER,
+                    season_id INTEGER,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('PRAGMA table_info(season_plans)')
+            if 'season_id' not in {row[1] for row in cursor.fetchall()}:
+                cursor.execute('ALTER TABLE season_plans ADD COLUMN season_id INTEGER')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS season_plan_weeks (
+                    plan_id INTEGER NOT NULL,
+                    week INTEGER NOT NULL,
+                    inputs_hash TEXT NOT NULL,
+                    plan TEXT NOT NULL,
+                    PRIMARY KEY (plan_id, week),
+                    FOREIGN KEY (plan_id) REFERENCES season_plans (id)
+                )
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+        self._schema_ready = True
+
+    def create_plan(self, start_date, num_weeks, **settings):
+        """Create and fully plan a season; returns the plan"""
+        self.ensure_schema()
+        start_date, num_weeks = _parse_date(start_date).isoformat(), _num_weeks(num_weeks)
+        new_plan = dict.fromkeys(SETTING_FIELDS)
+        new_plan.update(start_date=start_date, num_weeks=num_weeks)
+        changes = _normalize_changes(settings)
+        templates, blocked_days = self._planning_inputs({**new_plan, **changes})
+
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('INSERT INTO season_plans (start_date, num_weeks) VALUES (?, ?)', (start_date, num_weeks))
+            plan_id = cursor.lastrowid
+            result = self._update(cursor, plan_id, changes, templates, blocked_days)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def update_plan(self, plan_id, **changes):
+        """
+        Apply setting changes and recompute the affected weeks.
+
+        Returns the plan with 'recomputed' listing the weeks that changed,
+        or None if there is no such plan.
+        """
+        self.ensure_schema()
+        changes = _normalize_changes(changes)
+        conn = get_connection()
+        try:
+            settings = self._settings(conn.cursor(), plan_id)
+        finally:
+            conn.close()
+        if settings is None:
+            return None
+        templates, blocked_days = self._planning_inputs({**settings, **changes})
+
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            result = self._update(cursor, plan_id, changes, templates, blocked_days)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def get_plan(self, plan_id):
+        """
+        The plan, or None.
+
+        Weeks whose closures or templates changed since they were stored are
+        recomputed and saved ('recomputed' lists them); the rest are read back.
+        """
+        self.ensure_schema()
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            settings = self._settings(cursor, plan_id)
+            if settings is None:
+                return None
+            stored = self._stored_weeks(cursor, plan_id)
+        finally:
+            conn.close()
+
+        templates, blocked_days = self._planning_inputs(settings)
+        weeks, changed = plan_season(settings, templates, stored, blocked_days)
+        if changed:
+            # Each row pairs a plan with its own inputs hash, so racing a
+            # concurrent edit can at worst leave a week to rebuild next read
+            conn = get_connection()
+            try:
+                self._save_weeks(conn.cursor(), plan_id, weeks, changed)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+        return self._result(plan_id, settings, {week: item[1] for week, item in weeks.items()}, changed)
+
+    def delete_plan(self, plan_id):
+        self.ensure_schema()
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM season_plan_weeks WHERE plan_id = ?', (plan_id,))
+            cursor.execute('DELETE FROM season_plans WHERE id = ?', (plan_id,))
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def _settings(self, cursor, plan_id):
+        cursor.execute(f"SELECT {', '.join(SETTING_FIELDS)} FROM season_plans WHERE id = ?", (plan_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        settings = dict(zip(SETTING_FIELDS, row))
+        for field in JSON_FIELDS:
+            settings[field] = json.loads(settings[field]) if settings[field] else None
+        return settings
+
+    def _stored_weeks(self, cursor, plan_id):
+        cursor.execute('SELECT week, inputs_hash, plan FROM season_plan_weeks WHERE plan_id = ?', (plan_id,))
+        return {row[0]: (row[1], json.loads(row[2])) for row in cursor.fetchall()}
+
+    def _planning_inputs(self, settings):
+        """
+        The templates and blocked days a plan is computed from.
+
+        Loaded before the plan's write transaction opens: the template index
+        may write its own schema through another connection, which would
+        wait on that transaction until SQLite gives up.
+        """
+        return self.template_index.all(), self._blocked_days(settings)
+
+    def _update(self, cursor, plan_id, changes, templates, blocked_days):
+        settings = self._settings(cursor, plan_id)
+        if settings is None:
+            return None
+        settings.update(changes)
+
+        if changes:
+            assignments = ', '.join(f"{field} = ?" for field in changes)
+            values = [json.dumps(changes[field]) if field in JSON_FIELDS and changes[field] is not None
+                      else changes[field] for field in changes]
+            cursor.execute(f"UPDATE season_plans SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                           values + [plan_id])
+
+        stored = self._stored_weeks(cursor, plan_id)
+        weeks, changed = plan_season(settings, templates, stored, blocked_days)
+
+        self._save_weeks(cursor, plan_id, weeks, changed)
+        cursor.execute('DELETE FROM season_plan_weeks WHERE plan_id = ? AND week >= ?', (plan_id, settings['num_weeks']))
+
+        return self._result(plan_id, settings, {week: item[1] for week, item in weeks.items()}, changed)
+
+    @staticmethod
+    def _save_weeks(cursor, plan_id, weeks, changed):
+        cursor.executemany('''
+            INSERT OR REPLACE INTO season_plan_weeks (plan_id, week, inputs_hash, plan) VALUES (?, ?, ?, ?)
+        ''', [(plan_id, week, weeks[week][0], json.dumps(weeks[week][1])) for week in changed])
+
+    def _blocked_days(self, settings):
+        """Holidays and all-pools-closed days from the linked season's calendar index"""
+        if not settings.get('season_id') or self.calendar_index is None:
+            return []
+        calendar = self.calendar_index.season(settings['season_id'])
+        if calendar is None:
+            return []
+        start = _parse_date(settings['start_date'])
+        end = start + timedelta(weeks=settings['num_weeks'])
+        return [day.isoformat() for day in calendar.no_training_days(start, end)]
+
+    @staticmethod
+    def _result(plan_id, settings, weeks, changed):
+        return {
+            'plan_id': plan_id,
+            'settings': settings,
+            'weeks': [weeks[week] for week in sorted(weeks)],
+            'recomputed': changed
+        }
@@ -0,0 +1,240 @@
+"""
+Lazily created application services.
+
+Factories are registered by name and each service is built (and its heavy
+dependencies imported) on first use, so importing the app or forking a
+worker doesn't pay for selenium, holidays or matplotlib until a request
+actually needs them.
+
+Services are process-local: a forked worker starts with none of its
+parent's instances (pools, sockets and threads don't survive a fork), and
+services that aren't safe to share between threads can be registered
+per_thread, or with a pool_size to share at most that many instances
+between a worker's threads (services.checkout(name) lends one out).
+close_all() tears everything down on worker exit.
+"""
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Seconds a thread waits for a pooled instance before giving up
+POOL_WAIT_SECONDS = 60
+
+
+class ServicePool:
+    """At most size instances of a service, each lent to one caller at a time"""
+
+    def __init__(self, name, factory, size):
+        self.name = name
+        self.size = size
+        self._factory = factory
+        self._instances = []
+        self._idle = []
+        self._reserved = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def checkout(self, timeout=POOL_WAIT_SECONDS):
+        """Borrow an instance, building one if the pool isn't full yet"""
+        with self._condition:
+            while not self._idle and self._reserved >= self.size:
+                if not self._condition.wait(timeout):
+                    raise TimeoutError(f"No {self.name} free after {timeout} seconds")
+            instance = self._idle.pop() if self._idle else None
+            if instance is None:
+                self._reserved += 1
+
+        if instance is None:
+            try:
+                instance = self._factory()
+            except Exception:
+                with self._condition:
+                    self._reserved -= 1
+                    self._condition.notify()
+                raise
+            with self._condition:
+                self._instances.append(instance)
+
+        try:
+            yield instance
+        finally:
+            with self._condition:
+                self._idle.append(instance)
+                self._condition.notify()
+
+    def created(self):
+        return bool(self._instances)
+
+    def drain(self):
+        """Forget every instance and return them for closing"""
+        with self._condition:
+            instances = self._instances
+            self._instances, self._idle, self._reserved = [], [], 0
+        return instances
+
+
+class ServiceRegistry:
+    """Named singletons built on first access: services.plot_renderer"""
+
+    def __init__(self):
+        self._factories = {}
+        self._closers = {}
+        self._per_thread = set()
+        self._pool_sizes = {}
+        self._pools = {}
+        self._instances = {}
+        self._local = threading.local()
+        # Every per-thread instance map, so close_all() can reach them
+        self._thread_maps = []
+        self._lock = threading.RLock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def register(self, name, close=None, per_thread=False, pool_size=None):
+        """
+        Decorator registering a zero-argument factory for a service.
+
+        close(instance) is called by close_all(); per_thread services get
+        one instance per thread instead of one per process, and pooled
+        services (pool_size) are only used through checkout().
+        """
+        def decorator(factory):
+            self._factories[name] = factory
+            if close is not None:
+                self._closers[name] = close
+            if per_thread:
+                self._per_thread.add(name)
+            if pool_size is not None:
+                self._pool_sizes[name] = pool_size
+            return factory
+        return decorator
+
+    def _thread_instances(self):
+        instances = getattr(self._local, 'instances', None)
+        if instances is None:
+            instances = self._local.instances = {}
+            with self._lock:
+                self._thread_maps.append(instances)
+        return instances
+
+    def get(self, name):
+        if name not in self._factories:
+            raise KeyError(f"Unknown service: {name}")
+        if name in self._pool_sizes:
+            raise TypeError(f"{name} is pooled; use services.checkout('{name}')")
+
+        if name in self._per_thread:
+            instances = self._thread_instances()
+            if name not in instances:
+                instances[name] = self._factories[name]()
+            return instances[name]
+
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def pooled(self, name):
+        return name in self._pool_sizes
+
+    def _pool(self, name):
+        pool = self._pools.get(name)
+        if pool is not None:
+            return pool
+        with self._lock:
+            if name not in self._pools:
+                self._pools[name] = ServicePool(name, self._factories[name], self._pool_sizes[name])
+            return self._pools[name]
+
+    def checkout(self, name, timeout=POOL_WAIT_SECONDS):
+        """Context manager lending out one instance of a pooled service"""
+        if name not in self._pool_sizes:
+            raise KeyError(f"Not a pooled service: {name}")
+        return self._pool(name).checkout(timeout)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self.get(name)
+        except KeyError:
+            raise AttributeError(name)
+
+    def created(self, name):
+        """Whether a service has been built yet (in this thread, for per_thread services)"""
+        if name in self._pool_sizes:
+            return name in self._pools and self._pools[name].created()
+        if name in self._per_thread:
+            return name in getattr(self._local, 'instances', {})
+        return name in self._instances
+
+    def proxy(self, name):
+        """Stand-in that builds the service on first attribute access"""
+        return ServiceProxy(self, name)
+
+    def status(self):
+        """{name: created} for every registered service"""
+        return {name: self.created(name) for name in self._factories}
+
+    def close_all(self):
+        """Close every created service (in reverse creation order) and forget them"""
+        with self._lock:
+            created = list(self._instances.items())
+            self._instances.clear()
+            for instances in self._thread_maps:
+                created.extend(instances.items())
+                instances.clear()
+            for name, pool in self._pools.items():
+                created.extend((name, instance) for instance in pool.drain())
+
+        for name, instance in reversed(created):
+            closer = self._closers.get(name)
+            if closer is None:
+                continue
+            try:
+                closer(instance)
+            except Exception as e:
+                logger.warning('Could not close service', extra={'service': name, 'error': str(e)})
+
+    def _after_fork(self):
+        # The parent's pools, sockets and threads are unusable here; start clean
+        self._lock = threading.RLock()
+        self._instances = {}
+        self._pools = {}
+        self._local = threading.local()
+        self._thread_maps = []
+
+
+class ServiceProxy:
+    """Forwards attribute access to a lazily created service"""
+
+    def __init__(self, registry, name):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attribute):
+        if not self._registry.pooled(self._name):
+            return getattr(self._registry.get(self._name), attribute)
+
+        with self._registry.checkout(self._name) as instance:
+            value = getattr(instance, attribute)
+        if not callable(value):
+            # Plain attributes (a scraper's session or driver) pass straight through
+            return value
+
+        # Methods hold an instance only for the duration of each call
+        def call(*args, **kwargs):
+            with self._registry.checkout(self._name) as instance:
+                return getattr(instance, attribute)(*args, **kwargs)
+        return call
+
+    def __repr__(self):
+        state = 'created' if self._registry.created(self._name) else 'not created'
+        return f"<ServiceProxy {self._name} ({state})>"
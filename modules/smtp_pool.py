@@ -0,0 +1,256 @@
+"""
+Pooled SMTP sessions for outgoing email.
+
+One authenticated connection is kept per provider (server, port, sender)
+and reused across messages, so STARTTLS and LOGIN happen once rather than
+per email. A connection found dropped before the message data is sent is
+re-established and the message retried; once DATA has started the server
+may have accepted the message, so it is never sent again.
+send_bulk pipelines many messages over a single session.
+
+SMTP_SERVER, SMTP_PORT and SMTP_USE_TLS override the provider defaults,
+e.g. to point at a local SMTP stand-in during development.
+"""
+
+import os
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# Reconnect attempts per message after a dropped connection
+MAX_RETRIES = 2
+
+# Sessions idle longer than this are checked with NOOP before use, and
+# closed when idle past MAX_IDLE_SECONDS (providers drop them around 5 minutes)
+IDLE_CHECK_SECONDS = 30
+MAX_IDLE_SECONDS = 240
+
+
+class SendResult(tuple):
+    """A (success, message) pair; retryable is False for failures a retry can't fix"""
+
+    def __new__(cls, success, message, retryable=True):
+        result = super().__new__(cls, (success, message))
+        result.retryable = retryable
+        return result
+
+
+def smtp_settings_for(sender_email):
+    """(server, port, use_tls) for a sender address"""
+    if os.environ.get('SMTP_SERVER'):
+        return (
+            os.environ['SMTP_SERVER'],
+            int(os.environ.get('SMTP_PORT', 587)),
+            os.environ.get('SMTP_USE_TLS', 'true').lower() == 'true'
+        )
+
+    if '@gmail.com' in sender_email:
+        return "smtp.gmail.com", 587, True
+    elif '@outlook.com' in sender_email or '@hotmail.com' in sender_email:
+        return "smtp-mail.outlook.com", 587, True
+    elif '@yahoo.com' in sender_email:
+        return "smtp.mail.yahoo.com", 587, True
+    # Default to Gmail settings
+    return "smtp.gmail.com", 587, True
+
+
+def build_message(sender_email, to_email, subject, content):
+    """Plain-text MIME message"""
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(content, 'plain'))
+    return msg
+
+
+class SMTPSession:
+    """One authenticated SMTP connection, used by one thread at a time"""
+
+    def __init__(self, server, port, use_tls, sender_email, sender_password):
+        self.server = server
+        self.port = port
+        self.use_tls = use_tls
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.lock = threading.Lock()
+        self._smtp = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        self.close()
+        smtp = smtplib.SMTP(self.server, self.port, timeout=30)
+        if self.use_tls:
+            smtp.starttls()
+        smtp.login(self.sender_email, self.sender_password)
+        self._smtp = smtp
+
+    def _ensure_connected(self):
+        idle = time.monotonic() - self._last_used
+        if self._smtp is not None and idle > MAX_IDLE_SECONDS:
+            self.close()
+        elif self._smtp is not None and idle > IDLE_CHECK_SECONDS:
+            try:
+                if self._smtp.noop()[0] != 250:
+                    self.close()
+            except smtplib.SMTPException:
+                self.close()
+        if self._smtp is None:
+            self._connect()
+
+    def _start_transaction(self, to_email):
+        """MAIL FROM and RCPT TO; the server has not accepted anything yet"""
+        code, response = self._smtp.mail(self.sender_email)
+        if code != 250:
+            self._smtp.rset()
+            raise smtplib.SMTPSenderRefused(code, response, self.sender_email)
+        code, response = self._smtp.rcpt(to_email)
+        if code not in (250, 251):
+            self._smtp.rset()
+            raise smtplib.SMTPRecipientsRefused({to_email: (code, response)})
+
+    def send(self, msg):
+        """Send a message, reconnecting and retrying if the connection dropped before DATA"""
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                self._ensure_connected()
+                self._start_transaction(msg['To'])
+                break
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError):
+                self.close()
+                if attempt == MAX_RETRIES:
+                    raise
+            except smtplib.SMTPException:
+                # Rejected by the server (auth, sender, recipient); retrying won't help
+                raise
+            except OSError:
+                # Socket-level failure
+                self.close()
+                if attempt == MAX_RETRIES:
+                    raise
+
+        try:
+            code, response = self._smtp.data(msg.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # The message may have reached the server, so it is not retried
+            self.close()
+            raise
+        except smtplib.SMTPException:
+            raise
+        except OSError:
+            self.close()
+            raise
+        if code != 250:
+            self._smtp.rset()
+            raise smtplib.SMTPDataError(code, response)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+class SMTPSessionPool:
+    """Authenticated SMTP sessions keyed by provider and sender"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._credentials = None
+
+    def credentials(self):
+        """Sender address and password, read from the email config once they're available"""
+        if self._credentials is None or not all(self._credentials):
+            from email_config import get_email_config
+            self._credentials = get_email_config()
+        return self._credentials
+
+    def reload_credentials(self):
+        """Forget cached credentials and sessions, e.g. after the secrets change"""
+        self._credentials = None
+        self.close_all()
+
+    def session(self, sender_email, sender_password):
+        server, port, use_tls = smtp_settings_for(sender_email)
+        key = (server, port, sender_email)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None and session.sender_password == sender_password:
+                return session
+            replaced = session
+            session = SMTPSession(server, port, use_tls, sender_email, sender_password)
+            self._sessions[key] = session
+        if replaced is not None:
+            # Logged in with the old password; close it once any send in progress finishes
+            with replaced.lock:
+                replaced.close()
+        return session
+
+    def send_bulk(self, messages, from_email=None, from_password=None, on_result=None):
+        """
+        Send many (to_email, subject, content) messages over one session.
+
+        Returns a list of (success, message) SendResults in the same order.
+        Missing credentials or an authentication failure fail the remaining
+        messages immediately and are marked not retryable. on_result(index,
+        result), if given, is called as soon as each message's result is known.
+        """
+        results = []
+
+        def record(result):
+            if on_result is not None:
+                on_result(len(results), result)
+            results.append(result)
+
+        if from_email and from_password:
+            sender_email, sender_password = from_email, from_password
+        else:
+            sender_email, sender_password = self.credentials()
+
+        if not sender_email or not sender_password:
+            missing = []
+            if not sender_email:
+                missing.append("EMAIL_USER")
+            if not sender_password:
+                missing.append("EMAIL_PASSWORD")
+            error_msg = f"Missing required environment variables: {', '.join(missing)}. Please add them in the Secrets tool."
+            for _ in messages:
+                record(SendResult(False, error_msg, retryable=False))
+            return results
+
+        session = self.session(sender_email, sender_password)
+        with session.lock:
+            for index, (to_email, subject, content) in enumerate(messages):
+                try:
+                    session.send(build_message(sender_email, to_email, subject, content))
+                except smtplib.SMTPAuthenticationError as e:
+                    session.close()
+                    error_msg = f"Authentication failed: {str(e)}. Please check your email and app password."
+                    for _ in messages[index:]:
+                        record(SendResult(False, error_msg, retryable=False))
+                    break
+                except smtplib.SMTPException as e:
+                    record(SendResult(False, f"SMTP error: {str(e)}"))
+                except Exception as e:
+                    record(SendResult(False, f"Unexpected error: {str(e)}"))
+                else:
+                    record(SendResult(True, "Email sent successfully"))
+        return results
+
+    def send(self, to_email, subject, content, from_email=None, from_password=None):
+        """Send one message; returns (success, message)"""
+        return self.send_bulk([(to_email, subject, content)], from_email, from_password)[0]
+
+    def close_all(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            with session.lock:
+                session.close()
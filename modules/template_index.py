@@ -0,0 +1,261 @@
+"""
+In-memory index of workout templates.
+
+Templates are loaded once from workout_templates and indexed by:
+
+- tags: an inverted index from (category, value), e.g. ('phase', 'Base
+  Training') or ('focus', 'Sprint Speed'), to a boolean mask over templates
+- total and main set yardage ranges: template positions sorted by range
+  start and by range end, so "ranges containing Y" or "ranges overlapping
+  [lo, hi]" is two binary searches and a mask intersection
+- difficulty_level: positions sorted by difficulty for range queries
+
+A query intersects the masks of its conditions instead of scanning every
+template. Triggers on workout_templates bump a version number; the index
+checks it at most every CHECK_INTERVAL seconds and rebuilds when another
+process (or this one) changed the templates.
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from modules.database import get_connection
+
+CHECK_INTERVAL = float(os.environ.get('TEMPLATE_INDEX_CHECK_INTERVAL', 1.0))
+
+TAG_CATEGORIES = ('phase', 'focus', 'groups', 'equipment', 'stroke_focus', 'intensity')
+# A template tagged with this group suits every group
+ALL_GROUPS = 'All'
+
+COLUMNS = (
+    'template_id', 'name', 'description', 'total_yardage_min', 'total_yardage_max', 'main_set_yardage_min',
+    'main_set_yardage_max', 'tags', 'warmup_template', 'main_set_template', 'cooldown_template',
+    'coaching_cues', 'difficulty_level', 'created_date'
+)
+
+
+def _tag_values(tags, category):
+    values = tags.get(category)
+    if values is None:
+        return []
+    return values if isinstance(values, list) else [values]
+
+
+class RangeIndex:
+    """Intervals [low, high] sorted by each end for containment and overlap queries"""
+
+    def __init__(self, lows, highs):
+        lows = np.asarray(lows, dtype=float)
+        highs = np.asarray(highs, dtype=float)
+        self.size = len(lows)
+        self.by_low = np.argsort(lows, kind='stable')
+        self.sorted_lows = lows[self.by_low]
+        self.by_high = np.argsort(highs, kind='stable')
+        self.sorted_highs = highs[self.by_high]
+
+    def _low_at_most(self, value):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.by_low[:np.searchsorted(self.sorted_lows, value, side='right')]] = True
+        return mask
+
+    def _high_at_least(self, value):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.by_high[np.searchsorted(self.sorted_highs, value, side='left'):]] = True
+        return mask
+
+    def overlapping(self, low, high):
+        """Mask of intervals sharing at least one point with [low, high]"""
+        return self._low_at_most(high) & self._high_at_least(low)
+
+    def containing(self, value):
+        return self.overlapping(value, value)
+
+
+class TemplateIndex:
+    """Workout templates with tag, yardage and difficulty indexes"""
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._version = None
+        self._checked_at = 0.0
+        self._build([])
+
+    def ensure_schema(self):
+        """Create the version table and the triggers that bump it"""
+        if self._schema_ready:
+            return
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS workout_template_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute('INSERT OR IGNORE INTO workout_template_version (id, version) VALUES (1, 0)')
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS workout_templates_version_{event.lower()}
+                    AFTER {event} ON workout_templates
+                    BEGIN
+                        UPDATE workout_template_version SET version = version + 1 WHERE id = 1;
+                    END
+                ''')
+            conn.commit()
+        finally:
+            conn.close()
+        self._schema_ready = True
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _build(self, templates):
+        """Swap in indexes over a list of template dicts (tags already parsed)"""
+        tag_masks = {}
+        for position, template in enumerate(templates):
+            for category in TAG_CATEGORIES:
+                for value in _tag_values(template['tags'], category):
+                    key = (category, value)
+                    if key not in tag_masks:
+                        tag_masks[key] = np.zeros(len(templates), dtype=bool)
+                    tag_masks[key][position] = True
+
+        def bounds(low_field, high_field):
+            lows = [t.get(low_field) if t.get(low_field) is not None else -np.inf for t in templates]
+            highs = [t.get(high_field) if t.get(high_field) is not None else np.inf for t in templates]
+            return RangeIndex(lows, highs)
+
+        difficulties = [t.get('difficulty_level') if t.get('difficulty_level') is not None else np.nan
+                        for t in templates]
+        state = {
+            'templates': templates,
+            'positions': {t['template_id']: position for position, t in enumerate(templates)},
+            'tags': tag_masks,
+            'total_yardage': bounds('total_yardage_min', 'total_yardage_max'),
+            'main_set_yardage': bounds('main_set_yardage_min', 'main_set_yardage_max'),
+            'difficulty': RangeIndex(difficulties, difficulties)
+        }
+        # Queries read one consistent snapshot
+        self._state = state
+
+    def load(self, templates=None):
+        """Rebuild from the database, or from a list of template dicts (for benchmarks)"""
+        if templates is None:
+            self.ensure_schema()
+            conn = get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT version FROM workout_template_version WHERE id = 1')
+                version = cursor.fetchone()[0]
+                cursor.execute(f"SELECT {', '.join(COLUMNS)} FROM workout_templates")
+                templates = []
+                for row in cursor.fetchall():
+                    template = dict(zip(COLUMNS, row))
+                    try:
+                        template['tags'] = json.loads(template['tags'] or '{}')
+                    except ValueError:
+                        template['tags'] = {}
+                    templates.append(template)
+            finally:
+                conn.close()
+            self._version = version
+        self._build(templates)
+        self._checked_at = time.monotonic()
+
+    def refresh(self, force=False):
+        """Rebuild if the templates changed since the last load (checked at most every check_interval)"""
+        if not force and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if not force and time.monotonic() - self._checked_at < self.check_interval:
+                return
+            self.ensure_schema()
+            conn = get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT version FROM workout_template_version WHERE id = 1')
+                version = cursor.fetchone()[0]
+            finally:
+                conn.close()
+            if force or version != self._version:
+                self.load()
+            else:
+                self._checked_at = time.monotonic()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def all(self):
+        self.refresh()
+        return list(self._state['templates'])
+
+    def get(self, template_id):
+        self.refresh()
+        state = self._state
+        position = state['positions'].get(template_id)
+        return None if position is None else state['templates'][position]
+
+    def _any_of(self, state, category, values):
+        mask = np.zeros(len(state['templates']), dtype=bool)
+        for value in values:
+            tag_mask = state['tags'].get((category, value))
+            if tag_mask is not None:
+                mask |= tag_mask
+        return mask
+
+    def query(self, phase=None, focus=None, group=None, intensity=None, stroke_focus=None,
+              equipment=None, total_yardage=None, main_set_yardage=None, difficulty=None, limit=None):
+        """
+        Templates matching every given condition.
+
+        phase, focus, intensity and stroke_focus take a value or a list (any
+        of them matches). group also matches templates tagged "All".
+        equipment is the equipment available: templates needing anything
+        else are left out. total_yardage and main_set_yardage take a
+        distance the template's range must contain, or a (low, high) range it
+        must overlap; difficulty takes a level or an inclusive (low, high).
+        """
+        self.refresh()
+        state = self._state
+        mask = np.ones(len(state['templates']), dtype=bool)
+
+        for category, values in (('phase', phase), ('focus', focus), ('intensity', intensity),
+                                 ('stroke_focus', stroke_focus)):
+            if values is not None:
+                mask &= self._any_of(state, category, values if isinstance(values, (list, tuple, set)) else [values])
+        if group is not None:
+            mask &= self._any_of(state, 'groups', [group, ALL_GROUPS])
+        if equipment is not None:
+            available = set(equipment)
+            needed_elsewhere = [value for category, value in state['tags']
+                                if category == 'equipment' and value not in available]
+            mask &= ~self._any_of(state, 'equipment', needed_elsewhere)
+
+        for name, value in (('total_yardage', total_yardage), ('main_set_yardage', main_set_yardage),
+                            ('difficulty', difficulty)):
+            if value is None:
+                continue
+            low, high = value if isinstance(value, (list, tuple)) else (value, value)
+            mask &= state[name].overlapping(low, high)
+
+        positions = np.flatnonzero(mask)
+        if limit is not None:
+            positions = positions[:limit]
+        return [state['templates'][position] for position in positions]
+
+    def stats(self):
+        state = self._state
+        return {
+            'templates': len(state['templates']),
+            'tag_keys': len(state['tags']),
+            'version': self._version
+        }
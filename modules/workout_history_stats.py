@@ -0,0 +1,265 @@
+"""
+Incrementally maintained workout history statistics.
+
+Triggers on workout_history keep three per-group aggregates current on
+every insert, update and delete:
+
+- workout_template_usage: when each group last did each template, and how often
+- workout_focus_weeks: workouts per focus per training week (weeks start on Monday)
+- workout_phase_counts: workouts per training phase
+
+HistoryScorer reads a group's aggregates once (a few small indexed
+queries, independent of how long the history is) and then scores each
+candidate template in constant time: recently repeated templates and
+focuses already heavy this week score lower, templates for the current
+phase score higher.
+"""
+
+import math
+from datetime import date, datetime, timedelta
+
+from modules.database import get_connection
+
+# Days after which a repeated template no longer costs anything
+RECENCY_WINDOW_DAYS = 21
+RECENCY_WEIGHT = 1.0
+FOCUS_WEIGHT = 0.6
+PHASE_BONUS = 0.3
+
+_WEEK_START = "date({row}.workout_date, '-6 days', 'weekday 1')"
+
+
+def _add(row):
+    """
+    Trigger statements counting one workout_history row (NEW or OLD) into the aggregates.
+
+    Rows missing a group, template or parseable date are left out of the
+    aggregates they can't be keyed in, as rebuild() leaves them out.
+    """
+    return f'''
+        INSERT INTO workout_template_usage (group_name, template_id, last_used, use_count)
+        SELECT {row}.group_name, {row}.template_id, date({row}.workout_date), 1
+        WHERE {row}.group_name IS NOT NULL AND {row}.template_id IS NOT NULL
+        ON CONFLICT (group_name, template_id) DO UPDATE SET
+            use_count = use_count + 1,
+            last_used = max(coalesce(last_used, ''), coalesce(excluded.last_used, ''));
+        INSERT INTO workout_focus_weeks (group_name, week_start, focus, workouts)
+        SELECT {row}.group_name, {_WEEK_START.format(row=row)}, {row}.focus, 1
+        WHERE {row}.group_name IS NOT NULL AND date({row}.workout_date) IS NOT NULL AND {row}.focus IS NOT NULL
+        ON CONFLICT (group_name, week_start, focus) DO UPDATE SET workouts = workouts + 1;
+        INSERT INTO workout_phase_counts (group_name, phase, workouts)
+        SELECT {row}.group_name, {row}.phase, 1 WHERE {row}.group_name IS NOT NULL AND {row}.phase IS NOT NULL
+        ON CONFLICT (group_name, phase) DO UPDATE SET workouts = workouts + 1;
+    '''
+
+
+def _remove(row):
+    """Trigger statements taking one workout_history row back out of the aggregates"""
+    return f'''
+        UPDATE workout_template_usage SET
+            use_count = use_count - 1,
+            last_used = (
+                SELECT max(date(workout_date)) FROM workout_history
+                WHERE group_name = {row}.group_name AND template_id = {row}.template_id
+            )
+        WHERE group_name = {row}.group_name AND template_id = {row}.template_id;
+        DELETE FROM workout_template_usage WHERE use_count <= 0;
+        UPDATE workout_focus_weeks SET workouts = workouts - 1
+        WHERE group_name = {row}.group_name AND week_start = {_WEEK_START.format(row=row)} AND focus = {row}.focus;
+        DELETE FROM workout_focus_weeks WHERE workouts <= 0;
+        UPDATE workout_phase_counts SET workouts = workouts - 1
+        WHERE group_name = {row}.group_name AND phase = {row}.phase;
+        DELETE FROM workout_phase_counts WHERE workouts <= 0;
+    '''
+
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS workout_template_usage (
+        group_name TEXT NOT NULL,
+        template_id TEXT NOT NULL,
+        last_used TEXT,
+        use_count INTEGER NOT NULL,
+        PRIMARY KEY (group_name, template_id)
+    );
+    CREATE TABLE IF NOT EXISTS workout_focus_weeks (
+        group_name TEXT NOT NULL,
+        week_start TEXT NOT NULL,
+        focus TEXT NOT NULL,
+        workouts INTEGER NOT NULL,
+        PRIMARY KEY (group_name, week_start, focus)
+    );
+    CREATE TABLE IF NOT EXISTS workout_phase_counts (
+        group_name TEXT NOT NULL,
+        phase TEXT NOT NULL,
+        workouts INTEGER NOT NULL,
+        PRIMARY KEY (group_name, phase)
+    );
+    CREATE INDEX IF NOT EXISTS idx_workout_history_group_template_date
+    ON workout_history (group_name, template_id, workout_date);
+'''
+
+TRIGGERS = f'''
+    CREATE TRIGGER IF NOT EXISTS workout_history_stats_insert AFTER INSERT ON workout_history
+    BEGIN {_add('NEW')} END;
+    CREATE TRIGGER IF NOT EXISTS workout_history_stats_delete AFTER DELETE ON workout_history
+    BEGIN {_remove('OLD')} END;
+    CREATE TRIGGER IF NOT EXISTS workout_history_stats_update AFTER UPDATE ON workout_history
+    BEGIN {_remove('OLD')} {_add('NEW')} END;
+'''
+
+
+def _parse_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def week_start(day):
+    day = _parse_date(day)
+    return day - timedelta(days=day.weekday())
+
+
+class WorkoutHistoryStats:
+    """Aggregate tables over workout_history and the triggers that maintain them"""
+
+    def __init__(self):
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        """Create the aggregates and triggers, backfilling from existing history the first time"""
+        if self._schema_ready:
+            return
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'workout_history_stats_insert'")
+            first_time = cursor.fetchone() is None
+            cursor.executescript(SCHEMA + TRIGGERS)
+            if first_time:
+                self._rebuild(cursor)
+            conn.commit()
+        finally:
+            conn.close()
+        self._schema_ready = True
+
+    def rebuild(self):
+        """Recompute every aggregate from workout_history"""
+        self.ensure_schema()
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            self._rebuild(cursor)
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _rebuild(cursor):
+        cursor.execute('DELETE FROM workout_template_usage')
+        cursor.execute('DELETE FROM workout_focus_weeks')
+        cursor.execute('DELETE FROM workout_phase_counts')
+        cursor.execute('''
+            INSERT INTO workout_template_usage (group_name, template_id, last_used, use_count)
+            SELECT group_name, template_id, max(date(workout_date)), COUNT(*)
+            FROM workout_history WHERE group_name IS NOT NULL AND template_id IS NOT NULL
+            GROUP BY group_name, template_id
+        ''')
+        cursor.execute(f'''
+            INSERT INTO workout_focus_weeks (group_name, week_start, focus, workouts)
+            SELECT group_name, {_WEEK_START.format(row='workout_history')}, focus, COUNT(*)
+            FROM workout_history
+            WHERE group_name IS NOT NULL AND date(workout_date) IS NOT NULL AND focus IS NOT NULL
+            GROUP BY 1, 2, 3
+        ''')
+        cursor.execute('''
+            INSERT INTO workout_phase_counts (group_name, phase, workouts)
+            SELECT group_name, phase, COUNT(*) FROM workout_history
+            WHERE group_name IS NOT NULL AND phase IS NOT NULL GROUP BY 1, 2
+        ''')
+
+    def record(self, group_name, template_id, workout_date, phase=None, focus=None):
+        """Add a workout to the history (the triggers update the aggregates); returns its id"""
+        self.ensure_schema()
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO workout_history (group_name, template_id, workout_date, phase, focus, created_date)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (group_name, template_id, _parse_date(workout_date).isoformat(), phase, focus,
+                  datetime.now().isoformat()))
+            conn.commit()
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def group_stats(self, group_name, on_date=None):
+        """One group's aggregates: template usage, this week's focus counts and the phase distribution"""
+        self.ensure_schema()
+        this_week = week_start(on_date or date.today()).isoformat()
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT template_id, last_used, use_count FROM workout_template_usage WHERE group_name = ?
+            ''', (group_name,))
+            usage = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+            cursor.execute('''
+                SELECT focus, workouts FROM workout_focus_weeks WHERE group_name = ? AND week_start = ?
+            ''', (group_name, this_week))
+            focus_counts = dict(cursor.fetchall())
+            cursor.execute('SELECT phase, workouts FROM workout_phase_counts WHERE group_name = ?', (group_name,))
+            phase_counts = dict(cursor.fetchall())
+        finally:
+            conn.close()
+        return {
+            'group_name': group_name,
+            'week_start': this_week,
+            'template_usage': usage,
+            'focus_counts': focus_counts,
+            'phase_counts': phase_counts
+        }
+
+    def scorer(self, group_name, on_date=None, phase=None):
+        return HistoryScorer(self.group_stats(group_name, on_date), on_date or date.today(), phase)
+
+
+class HistoryScorer:
+    """Scores candidate templates for one group and day from its aggregates"""
+
+    def __init__(self, stats, on_date, phase=None):
+        self.stats = stats
+        self.on_date = _parse_date(on_date)
+        self.phase = phase
+        focus_counts = stats['focus_counts']
+        self.week_workouts = sum(focus_counts.values())
+
+    def score(self, template):
+        """Higher is better; 1.0 is a fresh template with no phase preference"""
+        score = 1.0
+        tags = template.get('tags') or {}
+
+        usage = self.stats['template_usage'].get(template['template_id'])
+        if usage and usage[0]:
+            days_ago = (self.on_date - _parse_date(usage[0])).days
+            if 0 <= days_ago < RECENCY_WINDOW_DAYS:
+                score -= RECENCY_WEIGHT * math.exp(-days_ago / (RECENCY_WINDOW_DAYS / 3))
+
+        focuses = tags.get('focus') or []
+        focuses = focuses if isinstance(focuses, list) else [focuses]
+        if focuses and self.week_workouts:
+            # Share of this week's workouts that already had this template's focus
+            share = max(self.stats['focus_counts'].get(focus, 0) for focus in focuses) / self.week_workouts
+            score -= FOCUS_WEIGHT * share
+
+        if self.phase:
+            phases = tags.get('phase') or []
+            if self.phase in (phases if isinstance(phases, list) else [phases]):
+                score += PHASE_BONUS
+        return score
+
+    def rank(self, templates, limit=None):
+        """Templates with their scores, best first"""
+        scored = sorted(((self.score(template), template) for template in templates),
+                        key=lambda item: (-item[0], item[1]['template_id']))
+        return scored[:limit] if limit is not None else scored
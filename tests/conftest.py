@@ -0,0 +1,129 @@
+"""
+Shared fixtures.
+
+Database tests run against a fresh SQLite file per test. Modules bind
+get_connection at import time, so db.use_in(module, ...) points each
+module a test exercises at that file. Email tests send through smtp_server,
+a local aiosmtpd stand-in that the SMTP_* settings point at.
+"""
+
+import socket
+import sqlite3
+import sys
+import types
+
+import pytest
+
+try:
+    import modules.database  # noqa: F401
+except ImportError:
+    # Trees without modules/database.py: the tests only need the name to
+    # import, since every database test repoints it with the db fixture
+    def _no_database(*args, **kwargs):
+        raise RuntimeError('No test database; use the db fixture')
+
+    sys.modules['modules.database'] = types.ModuleType('modules.database')
+    sys.modules['modules.database'].get_connection = _no_database
+
+
+class ScratchDatabase:
+    """A SQLite file standing in for the app database"""
+
+    def __init__(self, path, monkeypatch):
+        self.path = str(path)
+        self._monkeypatch = monkeypatch
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def use_in(self, *modules):
+        for module in modules:
+            self._monkeypatch.setattr(module, 'get_connection', self.connect)
+
+    def execute(self, sql, params=()):
+        """Run one statement in its own committed transaction; returns the fetched rows"""
+        conn = self.connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    database = ScratchDatabase(tmp_path / 'test.db', monkeypatch)
+    monkeypatch.setattr(sys.modules['modules.database'], 'get_connection', database.connect)
+    return database
+
+
+class RecordingHandler:
+    """Counts connections (EHLOs) and keeps every accepted message"""
+
+    def __init__(self):
+        self.ehlos = 0
+        self.messages = []
+        self.drop_after_data = False
+        self.rejected_recipients = set()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.ehlos += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.rejected_recipients:
+            return '451 Try again later'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.mail_from, list(envelope.rcpt_tos)))
+        if self.drop_after_data:
+            # Accept the message but drop the connection before replying
+            server.transport.close()
+        return '250 Message accepted'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class SMTPStandIn:
+    """An aiosmtpd server on a fixed local port that can be restarted"""
+
+    password = 'secret'
+
+    def __init__(self):
+        self.handler = RecordingHandler()
+        self.port = free_port()
+        self.controller = None
+
+    def authenticate(self, server, session, envelope, mechanism, auth_data):
+        from aiosmtpd.smtp import AuthResult, LoginPassword
+        valid = isinstance(auth_data, LoginPassword) and auth_data.password == self.password.encode()
+        return AuthResult(success=valid, handled=False)
+
+    def start(self):
+        from aiosmtpd.controller import Controller
+        self.controller = Controller(self.handler, hostname='127.0.0.1', port=self.port,
+                                     authenticator=self.authenticate, auth_require_tls=False)
+        self.controller.start()
+
+    def stop(self):
+        self.controller.stop()
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    pytest.importorskip('aiosmtpd')
+    server = SMTPStandIn()
+    server.start()
+    monkeypatch.setenv('SMTP_SERVER', '127.0.0.1')
+    monkeypatch.setenv('SMTP_PORT', str(server.port))
+    monkeypatch.setenv('SMTP_USE_TLS', 'false')
+    yield server
+    server.stop()
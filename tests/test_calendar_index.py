@@ -0,0 +1,35 @@
+"""Closures added through CalendarIndex show up in the cached season index"""
+
+from datetime import date
+
+import pytest
+
+pytest.importorskip('numpy')
+from modules.calendar_index import CalendarIndex  # noqa: E402
+
+
+@pytest.fixture
+def calendar_index(db):
+    db.execute('CREATE TABLE seasons (season_id INTEGER PRIMARY KEY, start_date TEXT, num_weeks INTEGER)')
+    db.execute('CREATE TABLE locations (location_id INTEGER PRIMARY KEY)')
+    db.execute("INSERT INTO seasons VALUES (1, '2024-09-02', 4)")
+    db.execute('INSERT INTO locations VALUES (1)')
+    db.execute('INSERT INTO locations VALUES (2)')
+    # No holidays, and a TTL long enough that only invalidation can refresh the index
+    return CalendarIndex(connect=db.connect, country=None, ttl=3600)
+
+
+def test_added_closure_blocks_training(calendar_index):
+    assert calendar_index.season(1).no_training_days() == []
+
+    calendar_index.add_closure('2024-09-10', '2024-09-11', location_id=1, reason='Meet')
+    calendar = calendar_index.season(1)
+    assert calendar.is_closed('2024-09-10', location_id=1)
+    assert calendar.open_locations('2024-09-10') == [2]
+    assert calendar.no_training_days() == []
+
+    closure_id = calendar_index.add_closure('2024-09-11', '2024-09-12', reason='Power outage')
+    assert calendar_index.season(1).no_training_days() == [date(2024, 9, 11), date(2024, 9, 12)]
+
+    assert calendar_index.remove_closure(closure_id)
+    assert calendar_index.season(1).no_training_days() == []
@@ -0,0 +1,114 @@
+"""EmailOutbox delivery against a local aiosmtpd stand-in and a scratch database"""
+
+import time
+
+import pytest
+
+from modules import email_outbox
+from modules.email_outbox import BACKOFF_BASE_SECONDS, SEND_LEASE_SECONDS, EmailOutbox
+from modules.smtp_pool import SMTPSessionPool
+
+SENDER = 'coach@example.com'
+PASSWORD = 'secret'
+
+
+@pytest.fixture
+def outbox(db, smtp_server, monkeypatch, tmp_path):
+    monkeypatch.setenv('EMAIL_USER', SENDER)
+    monkeypatch.setenv('EMAIL_PASSWORD', PASSWORD)
+    monkeypatch.setattr(email_outbox, 'LOCK_PATH', str(tmp_path / 'email_outbox.lock'))
+    db.use_in(email_outbox)
+    pool = SMTPSessionPool()
+    outbox = EmailOutbox(pool)
+    # The tests run process_due themselves instead of the sender thread
+    monkeypatch.setattr(outbox, 'start', lambda: outbox)
+    yield outbox
+    outbox.stop()
+    pool.close_all()
+
+
+def message(to_email):
+    return {'to_email': to_email, 'subject': 'Intervals', 'content': 'Body'}
+
+
+def test_failed_send_backs_off(outbox, smtp_server, db):
+    handler = smtp_server.handler
+    handler.rejected_recipients.add('a@example.com')
+    outbox_id = outbox.enqueue('a@example.com', 'Intervals', 'Body')
+
+    outbox.process_due()
+    status = outbox.status(outbox_id)
+    assert status['status'] == 'queued'
+    assert status['attempts'] == 1
+    assert 'SMTP error' in status['error']
+    assert BACKOFF_BASE_SECONDS - 2 <= status['next_attempt_in'] <= BACKOFF_BASE_SECONDS
+
+    # Not due again until the backoff has passed
+    outbox.process_due()
+    assert outbox.status(outbox_id)['attempts'] == 1
+    assert handler.messages == []
+
+    handler.rejected_recipients.clear()
+    db.execute('UPDATE email_outbox SET next_attempt_at = 0 WHERE id = ?', (outbox_id,))
+    outbox.process_due()
+    status = outbox.status(outbox_id)
+    assert (status['status'], status['attempts'], status['error']) == ('sent', 2, None)
+    assert handler.messages == [(SENDER, ['a@example.com'])]
+
+
+def test_rejected_login_fails_without_retry(outbox, smtp_server, db, monkeypatch):
+    monkeypatch.setenv('EMAIL_PASSWORD', 'wrong')
+    db.execute('CREATE TABLE email_log (id INTEGER PRIMARY KEY, status TEXT, error_message TEXT)')
+
+    def write_logs(cursor):
+        cursor.execute("INSERT INTO email_log (status) VALUES ('queued')")
+        return [cursor.lastrowid]
+
+    outbox_id = outbox.enqueue('a@example.com', 'Intervals', 'Body', log_table='email_log', write_logs=write_logs)
+    outbox.process_due()
+
+    status = outbox.status(outbox_id)
+    assert (status['status'], status['attempts']) == ('failed', 1)
+    assert 'Authentication failed' in status['error']
+    assert db.execute('SELECT status FROM email_log') == [('failed',)]
+    assert smtp_server.handler.messages == []
+
+
+def test_expired_lease_is_requeued_once(outbox, smtp_server, db):
+    expired, held = outbox.enqueue_many([message('a@example.com'), message('b@example.com')])
+    # A sender claimed both and died; only the first lease has run out
+    db.execute("UPDATE email_outbox SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+               (time.time() - 1, expired))
+    db.execute("UPDATE email_outbox SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+               (time.time() + SEND_LEASE_SECONDS, held))
+
+    outbox.process_due()
+    outbox.process_due()
+
+    assert smtp_server.handler.messages == [(SENDER, ['a@example.com'])]
+    assert (outbox.status(expired)['status'], outbox.status(expired)['attempts']) == ('sent', 1)
+    assert outbox.status(held)['status'] == 'sending'
+
+
+def test_rate_limit_holds(outbox, smtp_server, monkeypatch):
+    monkeypatch.setenv('EMAIL_RATE_LIMIT_PER_MINUTE', '3')
+    ids = outbox.enqueue_many([message(f'swimmer{number}@example.com') for number in range(5)])
+
+    delay = outbox.process_due()
+    assert delay > 0
+    outbox.process_due()
+
+    assert len(smtp_server.handler.messages) == 3
+    assert [outbox.status(outbox_id)['status'] for outbox_id in ids] == ['sent'] * 3 + ['queued'] * 2
+
+
+@pytest.mark.skipif(email_outbox.fcntl is None, reason='sender election needs flock')
+def test_only_lock_holder_sends(outbox):
+    other = EmailOutbox(outbox.smtp_pool)
+    try:
+        assert outbox._is_sender()
+        assert not other._is_sender()
+        outbox.stop()
+        assert other._is_sender()
+    finally:
+        other.stop()
@@ -0,0 +1,45 @@
+"""Mail merge fields agree with the rest of the app"""
+
+import json
+
+import pytest
+
+pytest.importorskip('jinja2')
+
+from modules import mail_merge, pulse_trends  # noqa: E402
+from modules.pulse_trends import analyze_trends, load_pulse_tests, pulse_count_sums  # noqa: E402
+
+
+def add_pulse_test(db, swimmer_id, test_date, swim_times, hr_10s, hr_30s, hr_60s):
+    speeds = [100 / time for time in swim_times]
+    db.execute('''
+        INSERT INTO pulse_plot_tests (swimmer_id, test_date, stroke, swim_speeds, sum_heart_rates)
+        VALUES (?, ?, 'freestyle', ?, ?)
+    ''', (swimmer_id, test_date, json.dumps(speeds), json.dumps(pulse_count_sums(hr_10s, hr_30s, hr_60s))))
+
+
+def test_emailed_pulse_line_matches_trends(db):
+    db.use_in(pulse_trends)
+    db.execute('CREATE TABLE swimmers (id INTEGER PRIMARY KEY, name TEXT, training_group_id INTEGER)')
+    db.execute('''
+        CREATE TABLE pulse_plot_tests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, swimmer_id INTEGER, test_date TEXT, stroke TEXT,
+            swim_speeds TEXT, sum_heart_rates TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    db.execute("INSERT INTO swimmers VALUES (1, 'Ana Diaz', 7)")
+    add_pulse_test(db, 1, '2026-09-01', [82, 80, 78, 76, 74, 72, 70, 68],
+                   [18, 19, 20, 21, 22, 24, 25, 27], [16, 17, 18, 19, 20, 21, 23, 24], [13, 14, 15, 16, 17, 18, 19, 21])
+    add_pulse_test(db, 1, '2026-10-01', [81, 79, 77, 75, 73, 71, 69, 67],
+                   [17, 18, 19, 20, 22, 23, 24, 26], [15, 16, 17, 18, 19, 20, 22, 23], [12, 13, 14, 15, 16, 17, 18, 20])
+
+    conn = db.connect()
+    try:
+        emailed = mail_merge._latest_pulse_tests(conn.cursor(), 7)[1]
+    finally:
+        conn.close()
+    latest = analyze_trends(*load_pulse_tests(group_id=7))[0]['tests'][-1]
+
+    assert emailed['test_date'] == latest['test_date'] == '2026-10-01'
+    assert emailed['slope'] == pytest.approx(latest['slope'], abs=0.01)
+    assert emailed['intercept'] == pytest.approx(latest['intercept'], abs=0.01)
@@ -0,0 +1,75 @@
+"""Pooled services stay within their pool size across threads"""
+
+import threading
+import time
+
+import pytest
+
+from modules.services import ServiceRegistry
+
+
+def test_pool_bounds_instances_across_threads():
+    services = ServiceRegistry()
+    built, closed = [], []
+
+    @services.register('scraper', close=closed.append, pool_size=2)
+    def create_scraper():
+        built.append(object())
+        return built[-1]
+
+    lock = threading.Lock()
+    in_use = [0, 0]  # current, peak
+
+    def request():
+        with services.checkout('scraper'):
+            with lock:
+                in_use[0] += 1
+                in_use[1] = max(in_use[1], in_use[0])
+            time.sleep(0.02)
+            with lock:
+                in_use[0] -= 1
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(built) == 2
+    assert in_use[1] == 2
+    with pytest.raises(TypeError):
+        services.scraper
+
+    services.close_all()
+    assert sorted(map(id, closed)) == sorted(map(id, built))
+    assert not services.created('scraper')
+
+
+def test_checkout_times_out_when_pool_is_busy():
+    services = ServiceRegistry()
+    services.register('scraper', pool_size=1)(object)
+
+    with services.checkout('scraper'):
+        with pytest.raises(TimeoutError):
+            with services.checkout('scraper', timeout=0.05):
+                pass
+
+
+def test_pooled_proxy_passes_plain_attributes_through():
+    services = ServiceRegistry()
+
+    class Scraper:
+        def __init__(self):
+            self.session = 'session'
+
+        def search(self, name):
+            return [name]
+
+    services.register('scraper', pool_size=1)(Scraper)
+    scraper = services.proxy('scraper')
+
+    assert scraper.session == 'session'
+    assert scraper.search('Ana') == ['Ana']
+    # The method call returned its instance to the pool
+    with services.checkout('scraper', timeout=0.05):
+        pass
@@ -0,0 +1,68 @@
+"""SMTPSessionPool against a local aiosmtpd stand-in"""
+
+import pytest
+
+from modules.smtp_pool import SMTPSessionPool
+
+SENDER = 'coach@example.com'
+PASSWORD = 'secret'
+
+
+@pytest.fixture
+def pool():
+    pool = SMTPSessionPool()
+    yield pool
+    pool.close_all()
+
+
+def test_messages_reuse_one_session(smtp_server, pool):
+    handler = smtp_server.handler
+    for number in range(3):
+        assert pool.send(f'swimmer{number}@example.com', 'Intervals', 'Body', SENDER, PASSWORD)[0]
+    assert len(handler.messages) == 3
+    assert handler.ehlos == 1
+
+
+def test_bulk_send_uses_one_session(smtp_server, pool):
+    handler = smtp_server.handler
+    messages = [(f'swimmer{number}@example.com', 'Intervals', f'Body {number}') for number in range(20)]
+    results = pool.send_bulk(messages, SENDER, PASSWORD)
+    assert [success for success, _ in results] == [True] * 20
+    assert [rcpts for _, rcpts in handler.messages] == [[to] for to, _, _ in messages]
+    assert handler.ehlos == 1
+
+
+def test_bulk_send_stops_after_auth_failure(smtp_server, pool):
+    handler = smtp_server.handler
+    results = pool.send_bulk([('a@example.com', 'S', 'B'), ('b@example.com', 'S', 'B')], SENDER, 'wrong')
+    assert [success for success, _ in results] == [False, False]
+    assert all('Authentication failed' in message for _, message in results)
+    assert handler.messages == []
+
+
+def test_reconnects_after_server_restart(smtp_server, pool):
+    handler = smtp_server.handler
+    assert pool.send('a@example.com', 'S', 'B', SENDER, PASSWORD)[0]
+    smtp_server.stop()
+    smtp_server.start()
+    assert pool.send('b@example.com', 'S', 'B', SENDER, PASSWORD)[0]
+    assert [rcpts for _, rcpts in handler.messages] == [['a@example.com'], ['b@example.com']]
+    assert handler.ehlos == 2
+
+
+def test_drop_after_data_is_not_resent(smtp_server, pool):
+    handler = smtp_server.handler
+    handler.drop_after_data = True
+    success, _ = pool.send('a@example.com', 'S', 'B', SENDER, PASSWORD)
+    assert not success
+    assert len(handler.messages) == 1
+
+
+def test_password_change_closes_old_session(smtp_server, pool):
+    assert pool.send('a@example.com', 'S', 'B', SENDER, PASSWORD)[0]
+    old = pool.session(SENDER, PASSWORD)
+    assert old._smtp is not None
+    new = pool.session(SENDER, 'rotated password')
+    assert new is not old
+    assert old._smtp is None
+    assert pool.session(SENDER, 'rotated password') is new
@@ -0,0 +1,69 @@
+"""Changes to workout_templates bump the version and reach TemplateIndex queries"""
+
+import json
+
+import pytest
+
+pytest.importorskip('numpy')
+from modules import template_index  # noqa: E402
+from modules.template_index import TemplateIndex  # noqa: E402
+
+
+@pytest.fixture
+def index(db):
+    db.use_in(template_index)
+    db.execute('''
+        CREATE TABLE workout_templates (
+            template_id TEXT PRIMARY KEY,
+            name TEXT,
+            description TEXT,
+            total_yardage_min INTEGER,
+            total_yardage_max INTEGER,
+            main_set_yardage_min INTEGER,
+            main_set_yardage_max INTEGER,
+            tags TEXT,
+            warmup_template TEXT,
+            main_set_template TEXT,
+            cooldown_template TEXT,
+            coaching_cues TEXT,
+            difficulty_level INTEGER,
+            created_date TEXT
+        )
+    ''')
+    add_template(db, 'aerobic', 'Base Training', 4000)
+    index = TemplateIndex(check_interval=0)
+    index.load()
+    return index
+
+
+def add_template(db, template_id, phase, yardage):
+    db.execute('''
+        INSERT INTO workout_templates (template_id, name, total_yardage_min, total_yardage_max, tags)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (template_id, template_id.title(), yardage - 500, yardage + 500, json.dumps({'phase': [phase]})))
+
+
+def ids(templates):
+    return [template['template_id'] for template in templates]
+
+
+def test_update_bumps_version_and_query_reflects_it(index, db):
+    version = index.stats()['version']
+    assert ids(index.query(phase='Base Training')) == ['aerobic']
+
+    # Written on another connection, as another worker would
+    db.execute('UPDATE workout_templates SET tags = ?, total_yardage_max = 6000 WHERE template_id = ?',
+               (json.dumps({'phase': ['Build']}), 'aerobic'))
+
+    assert ids(index.query(phase='Base Training')) == []
+    assert ids(index.query(phase='Build', total_yardage=5500)) == ['aerobic']
+    assert index.stats()['version'] == version + 1
+
+
+def test_insert_and_delete_reach_the_index(index, db):
+    add_template(db, 'threshold', 'Build', 5000)
+    assert ids(index.query(phase=['Base Training', 'Build'])) == ['aerobic', 'threshold']
+
+    db.execute("DELETE FROM workout_templates WHERE template_id = 'aerobic'")
+    assert ids(index.all()) == ['threshold']
+    assert index.get('aerobic') is None
@@ -0,0 +1,76 @@
+"""The workout_history triggers keep the aggregates equal to a full rebuild"""
+
+import pytest
+
+from modules import workout_history_stats
+from modules.workout_history_stats import WorkoutHistoryStats
+
+AGGREGATES = ('workout_template_usage', 'workout_focus_weeks', 'workout_phase_counts')
+
+
+@pytest.fixture
+def stats(db):
+    db.use_in(workout_history_stats)
+    db.execute('''
+        CREATE TABLE workout_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_name TEXT,
+            template_id TEXT,
+            workout_date TEXT,
+            phase TEXT,
+            focus TEXT,
+            created_date TEXT
+        )
+    ''')
+    return WorkoutHistoryStats()
+
+
+def add_history(db, *rows):
+    for row in rows:
+        db.execute('''
+            INSERT INTO workout_history (group_name, template_id, workout_date, phase, focus)
+            VALUES (?, ?, ?, ?, ?)
+        ''', row)
+
+
+def aggregates(db):
+    return {table: sorted(db.execute(f'SELECT * FROM {table}'), key=repr) for table in AGGREGATES}
+
+
+def test_triggers_match_rebuild(stats, db):
+    # Existing history is backfilled the first time the schema is created
+    add_history(db,
+                ('Senior', 't1', '2024-03-04', 'base', 'aerobic'),
+                ('Senior', 't1', '2024-03-06', 'base', 'aerobic'))
+    stats.ensure_schema()
+    assert aggregates(db)['workout_template_usage'] == [('Senior', 't1', '2024-03-06', 2)]
+
+    add_history(db,
+                ('Senior', 't2', '2024-03-07', 'build', 'sprint'),
+                ('Age Group', 't1', '2024-03-05', None, 'aerobic'),
+                (None, 't1', '2024-03-05', 'base', 'aerobic'),
+                (None, 't1', '2024-03-05', 'base', 'aerobic'),
+                ('Senior', None, '2024-03-05', 'base', None),
+                ('Senior', 't3', 'not a date', 'taper', 'kick'))
+    db.execute("UPDATE workout_history SET workout_date = '2024-03-12', focus = 'threshold' WHERE template_id = 't2'")
+    db.execute("UPDATE workout_history SET group_name = NULL WHERE group_name = 'Age Group'")
+    db.execute("UPDATE workout_history SET group_name = 'Age Group' WHERE group_name IS NULL AND id = 5")
+    db.execute("DELETE FROM workout_history WHERE workout_date = '2024-03-06'")
+
+    maintained = aggregates(db)
+    assert maintained['workout_template_usage'] == sorted([
+        ('Senior', 't1', '2024-03-04', 1),
+        ('Senior', 't2', '2024-03-12', 1),
+        ('Senior', 't3', None, 1),
+        ('Age Group', 't1', '2024-03-05', 1),
+    ], key=repr)
+    stats.rebuild()
+    assert aggregates(db) == maintained
+
+
+def test_deleting_all_history_empties_the_aggregates(stats, db):
+    stats.ensure_schema()
+    stats.record('Senior', 't1', '2024-03-04', phase='base', focus='aerobic')
+    stats.record('Senior', 't1', '2024-03-05', phase='base', focus='aerobic')
+    db.execute('DELETE FROM workout_history')
+    assert aggregates(db) == {table: [] for table in AGGREGATES}